@@ -0,0 +1,326 @@
+"""
+SS-BGP Data Tools: Benchmarks
+
+Measures the throughput of the basic-data and inv-cumsum tools over synthetic datasets of
+multiple scales. Each tool is measured end-to-end, by running it in a separate process, and
+stage by stage (select, load, process, and plot), by running each stage in this process.
+
+It also measures the startup time of each tool, by showing its help message, and checks that
+no tool imports plotly at startup: plotting libraries must only be imported when plotting.
+
+For each measurement it reports the wall time, the number of files and rows processed per
+second, and the peak memory (RSS). Results can be saved as a baseline and later runs compared
+against it: measurements that are slower or use more memory than the baseline, beyond the
+tolerance, are flagged as regressions.
+
+Run it from the root of the repository with: python -m benchmarks.run
+
+Usage:
+  benchmarks.run [options]
+  benchmarks.run (-h | --help)
+
+Options:
+  -h --help                Show this screen.
+  --scales=<names>         Comma separated list of scales to run (small, medium, large).
+                           [Default: small,medium]
+  --data-dir=<path>        Directory to store the generated datasets. Datasets that already
+                           exist are reused. By default, a temporary directory is used.
+  -j --jobs=<n>            Number of processes to load data files. [Default: 1]
+  --out=<path>             Write the results to a JSON file.
+  --baseline=<path>        Compare the results against a baseline JSON file and exit with an
+                           error if any regression is found.
+  --save-baseline=<path>   Save the results as a baseline JSON file.
+  --tolerance=<fraction>   Relative tolerance before flagging a regression. [Default: 0.25]
+
+"""
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from importlib.util import find_spec
+from pathlib import Path
+from typing import Dict, NamedTuple, List
+
+from docopt import docopt
+
+from processing.concurrent_file_container import ConcurrentLabeledFileContainer
+from processing.csv_printer import CSVPrinter
+from processing.extension_selector import ExtensionFileSelector
+from processing.file_container import FileContainer
+from processing.labeled_file_collection import LabeledFileCollection
+from processing.scan_directory import ScanDirectory
+from tools.basic_data import BasicDataLoader, BasicDataProcessor, load_data_sets
+from tools.generate_data import generate_datasets
+from tools.inv_cumsum import TerminationTimesLoader, TerminationTimesProcessor
+from tools.utils import print_error
+
+
+class Scale(NamedTuple):
+    datasets: int
+    destinations: int
+    seeds: int
+
+
+SCALES = {
+    "small": Scale(datasets=2, destinations=200, seeds=10),
+    "medium": Scale(datasets=4, destinations=2000, seeds=10),
+    "large": Scale(datasets=4, destinations=10000, seeds=30),
+}
+
+# Measurements that process all data files, for which throughput is reported
+THROUGHPUT_MEASUREMENTS = {"end-to-end", "load"}
+
+# Differences in wall time below this value (in seconds) are considered noise
+MIN_TIME_DIFFERENCE = 0.05
+
+# Tools whose startup time is measured
+STARTUP_TOOLS = ["basic-data", "inv-cumsum", "all-data"]
+
+# Number of times each tool is started, the fastest start is reported
+STARTUP_RUNS = 5
+
+# Modules that must not be imported at startup
+LAZY_MODULES = ["plotly"]
+
+
+def main():
+    args = docopt(__doc__)
+    jobs = int(args['--jobs'])
+    tolerance = float(args['--tolerance'])
+
+    scale_names = args['--scales'].split(',')
+    for name in scale_names:
+        if name not in SCALES:
+            print_error(f"unknown scale: {name}")
+            sys.exit(1)
+
+    eager_modules = check_lazy_imports()
+    for module in eager_modules:
+        print(f"REGRESSION: {module} is imported at startup")
+
+    with tempfile.TemporaryDirectory() as temporary_dir:
+        data_dir = Path(args['--data-dir'] or temporary_dir)
+        output_dir = Path(temporary_dir) / "outputs"
+        output_dir.mkdir(exist_ok=True)
+
+        results = {
+            "python": sys.version.split()[0],
+            "jobs": jobs,
+            "startup": run_startup(),
+            "scales": {name: run_scale(name, data_dir, output_dir, jobs) for name in scale_names}
+        }
+
+    if args['--out']:
+        save_results(Path(args['--out']), results)
+
+    if args['--save-baseline']:
+        save_results(Path(args['--save-baseline']), results)
+
+    if args['--baseline']:
+        with open(args['--baseline']) as file:
+            baseline = json.load(file)
+
+        regressions = compare(results, baseline, tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+
+        if regressions or eager_modules:
+            sys.exit(1)
+
+        print("No regressions found")
+
+    elif eager_modules:
+        sys.exit(1)
+
+
+def check_lazy_imports() -> List[str]:
+    """
+    Imports all tools in a separate process and checks which of the modules in LAZY_MODULES
+    were imported.
+
+    :return: the modules imported at startup which should not have been
+    """
+    modules = [f"tools.{tool.replace('-', '_')}" for tool in STARTUP_TOOLS]
+    code = f"import sys, {', '.join(modules)}; " \
+           f"print(' '.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    output = subprocess.run([sys.executable, "-c", code], stdout=subprocess.PIPE, check=True)
+    return output.stdout.decode().split()
+
+
+def run_startup() -> Dict[str, dict]:
+    """ Measures the time each tool takes to start, by showing its help message """
+    print("Benchmarking startup...")
+    results = {}
+    for tool in STARTUP_TOOLS:
+        command = [sys.executable, "-m", f"tools.{tool.replace('-', '_')}", "--help"]
+        measurements = [run_command(command) for _ in range(STARTUP_RUNS)]
+        results[tool] = min(measurements, key=lambda measurement: measurement["wall_time"])
+        print_measurement(tool, results[tool])
+
+    return results
+
+
+def run_scale(name: str, data_dir: Path, output_dir: Path, jobs: int) -> Dict[str, dict]:
+    scale = SCALES[name]
+    conf_path = data_dir / name / "conf.json"
+    if not conf_path.is_file():
+        print(f"Generating {name} datasets...")
+        conf_path = generate_datasets(data_dir / name, scale.datasets, scale.destinations,
+                                      scale.seeds, non_termination_rates=[0.01, 0.1])
+
+    file_count = scale.datasets * scale.destinations
+    row_count = file_count * scale.seeds
+
+    results = {}
+    tools = ["basic-data", "inv-cumsum"] if find_spec("plotly") else ["basic-data"]
+    for tool in tools:
+        print(f"Benchmarking {tool} at scale {name}...")
+        measurements = {"end-to-end": run_end_to_end(tool, conf_path, output_dir, jobs)}
+        measurements.update(run_stages(tool, conf_path, output_dir, jobs))
+
+        for measurement_name, measurement in measurements.items():
+            if measurement_name in THROUGHPUT_MEASUREMENTS:
+                measurement["files_per_second"] = file_count / measurement["wall_time"]
+                measurement["rows_per_second"] = row_count / measurement["wall_time"]
+
+            print_measurement(measurement_name, measurement)
+
+        results[tool] = measurements
+
+    return results
+
+
+def run_end_to_end(tool: str, conf_path: Path, output_dir: Path, jobs: int) -> dict:
+    """ Runs a tool in a separate process and measures its wall time and peak memory """
+    module = tool.replace('-', '_')
+    command = [sys.executable, "-m", f"tools.{module}", str(conf_path),
+               f"--out={output_dir / tool}", f"--jobs={jobs}", "--no-cache"]
+
+    return run_command(command)
+
+
+def run_command(command: List[str]) -> dict:
+    """ Runs a command and measures its wall time and peak memory """
+    start = time.perf_counter()
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+    _, status, usage = os.wait4(process.pid, 0)
+    wall_time = time.perf_counter() - start
+
+    if not os.WIFEXITED(status) or os.WEXITSTATUS(status) != 0:
+        print_error(f"command failed: {' '.join(command)}")
+        sys.exit(1)
+
+    return {"wall_time": wall_time, "peak_rss_mb": usage.ru_maxrss / 1024}
+
+
+def run_stages(tool: str, conf_path: Path, output_dir: Path, jobs: int) -> Dict[str, dict]:
+    """
+    Runs each stage of a tool in this process. The peak memory of each stage corresponds to
+    the peak memory of this process up to the end of that stage.
+    """
+    container = ConcurrentLabeledFileContainer(
+        containers={label: ScanDirectory(data_dir)
+                    for label, data_dir in load_data_sets(conf_path).items()}
+    )
+    selector = ExtensionFileSelector(extension=".basic.csv")
+
+    if tool == "basic-data":
+        loader = BasicDataLoader()
+        processors = {
+            "process": BasicDataProcessor(printer=CSVPrinter(output_dir / "stages.csv"))
+        }
+    else:
+        # Plotly is imported lazily, when plotting, but its import time is measured at startup
+        import plotly.offline
+        from processing.plotter import Plotter
+
+        loader = TerminationTimesLoader()
+        processors = {
+            "process": TerminationTimesProcessor(printer=CSVPrinter(output_dir / "stages.csv")),
+            "plot": TerminationTimesProcessor(
+                plotter=Plotter(trace_lines={}, output=output_dir / "stages.html"))
+        }
+
+    stages = {}
+    data_files, stages["select"] = measure(lambda: select_all(selector, container))
+    data, stages["load"] = measure(lambda: loader.load(data_files, jobs=jobs))
+    for name, processor in processors.items():
+        _, stages[name] = measure(lambda: processor.process(data))
+
+    return stages
+
+
+def select_all(selector: ExtensionFileSelector,
+               container: FileContainer) -> LabeledFileCollection:
+    """
+    Selects the data files of a container. The selector yields files as the container is listed,
+    so the container is listed to completion here, to measure the select stage on its own.
+    """
+    data_files = selector.select(container)
+    len(data_files)
+    return data_files
+
+
+def measure(function):
+    start = time.perf_counter()
+    result = function()
+    wall_time = time.perf_counter() - start
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    return result, {"wall_time": wall_time, "peak_rss_mb": peak_rss}
+
+
+def print_measurement(name: str, measurement: dict) -> None:
+    line = f"  {name:<12} {measurement['wall_time']:8.3f} s  " \
+           f"{measurement['peak_rss_mb']:8.1f} MB"
+    if "files_per_second" in measurement:
+        line += f"  {measurement['files_per_second']:10.1f} files/s" \
+                f"  {measurement['rows_per_second']:12.1f} rows/s"
+
+    print(line)
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    """
+    Compares the results against a baseline. Only measurements included in both are compared.
+
+    :return: a description of each regression found
+    """
+    pairs = []
+    for tool, measurement in results.get("startup", {}).items():
+        reference = baseline.get("startup", {}).get(tool)
+        if reference:
+            pairs.append((f"{tool} startup", measurement, reference))
+
+    for scale, tools in results["scales"].items():
+        for tool, measurements in tools.items():
+            baseline_measurements = baseline.get("scales", {}).get(scale, {}).get(tool, {})
+            for name, measurement in measurements.items():
+                if name in baseline_measurements:
+                    pairs.append((f"{tool} {name} at scale {scale}", measurement,
+                                  baseline_measurements[name]))
+
+    regressions = []
+    for description, measurement, reference in pairs:
+        for metric in ["wall_time", "peak_rss_mb"]:
+            if metric == "wall_time" and \
+                    measurement[metric] - reference[metric] < MIN_TIME_DIFFERENCE:
+                continue
+
+            if measurement[metric] > reference[metric] * (1 + tolerance):
+                regressions.append(f"{description}: {metric} is {measurement[metric]:.3f} "
+                                   f"(baseline is {reference[metric]:.3f})")
+
+    return regressions
+
+
+def save_results(path: Path, results: dict) -> None:
+    with open(path, 'w') as file:
+        json.dump(results, file, indent=4)
+
+
+if __name__ == '__main__':
+    main()
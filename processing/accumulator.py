@@ -0,0 +1,17 @@
+from abc import ABC, abstractmethod
+
+
+class Accumulator(ABC):
+    """
+    An accumulator summarizes a set of data in constant memory. Accumulators are mergeable:
+    merging the accumulators of two sets of data must be equivalent to accumulating the union
+    of both sets.
+    """
+
+    @abstractmethod
+    def merge(self, other: 'Accumulator') -> None:
+        """
+        Merges the data accumulated by *other* into this accumulator.
+
+        :param other: accumulator of the same type to merge into this one
+        """
@@ -1,30 +1,136 @@
+import cProfile
+from typing import Iterator, List, Optional, Union
+
+from processing.composite import CompositeDataProcessor
 from processing.data_loader import DataLoader
 from processing.data_processor import DataProcessor
+from processing.dataset_processor import DatasetProcessor
 from processing.errors import ProcessingError
+from processing.file_collection import FileCollection
 from processing.file_container import FileContainer
 from processing.file_selector import FileSelector
+from processing.load_listener import LoadListener
+from processing.prefetch import PrefetchSummary
+from processing.profiler import Profiler, profile
+from processing.progress import ProgressLine
+from processing.streaming_file_collection import StreamingFileCollection
 from tools.utils import print_error
 
 
 class Application:
+    """
+    Selects data files from a container, loads their data, and processes it.
+
+    A single selection and load pass may feed multiple processors: given a list of processors,
+    the loader must be a composite loader with one loader for each processor.
+
+    The stages are chained through iterators: data files are loaded as they are selected, and
+    a dataset processor processes each dataset as soon as all of its data files are loaded.
+    Other processors process the data of all datasets once it is all loaded.
 
-    def __init__(self, container: FileContainer, selector: FileSelector,
-                 loader: DataLoader, processor: DataProcessor) -> None:
+    The run can be instrumented: a profiler records the time taken by each stage and the
+    statistics of loading the data files, a progress line shows the progress of the load
+    stage, and the load stage can be profiled with cProfile. When datasets are processed as
+    they are loaded, the time taken to load them is recorded as the load stage, and the whole
+    run of the processor, including loading, as the pipeline stage. Profiling the load stage
+    with cProfile requires loading all datasets before processing any of them.
+    """
+
+    def __init__(self, container: FileContainer, selector: FileSelector, loader: DataLoader,
+                 processor: Union[DataProcessor, List[DataProcessor]], jobs: int = 1,
+                 profiler: Profiler = None, progress: bool = False,
+                 load_profile: str = None, prefetch: int = 0) -> None:
+        """
+        :param profiler:     profiler recording the run, its report is saved at the end
+        :param progress:     show a progress line while loading the data
+        :param load_profile: path to write a cProfile (pstats) file of the load stage. Only
+                             the main process is profiled.
+        :param prefetch:     number of data files read ahead by the loader while it parses
+                             the current one, 0 to disable it
+        """
         self.container = container
         self.selector = selector
         self.loader = loader
-        self.processor = processor
+        self.jobs = jobs
+        self.profiler = profiler
+        self.progress = progress
+        self.load_profile = load_profile
+        self.prefetch = prefetch
+
+        if isinstance(processor, list):
+            self.processor = CompositeDataProcessor(processor)
+        else:
+            self.processor = processor
 
     def run(self) -> None:
+        listeners = []
+        if self.profiler:
+            listeners.append(self.profiler)
+        if self.progress:
+            listeners.append(ProgressLine())
+        if self.prefetch > 0:
+            listeners.append(PrefetchSummary())
+
         try:
             print("Selecting files...")
-            data_files = self.selector.select(self.container)
-            print("Loading data...")
-            data = self.loader.load(data_files)
-            print("Processing...")
-            self.processor.process(data)
+            with profile(self.profiler, "select"):
+                data_files = self.selector.select(self.container)
+
+            listing = None
+            if isinstance(data_files, StreamingFileCollection):
+                listing = data_files.list_ahead(self._listed)
+
+            if isinstance(self.processor, DatasetProcessor) and not self.load_profile:
+                print("Loading and processing data...")
+                datasets = self.loader.load_datasets(data_files, jobs=self.jobs,
+                                                     listeners=listeners, prefetch=self.prefetch)
+                with profile(self.profiler, "pipeline"):
+                    self.processor.process_each(_profiled(datasets, self.profiler, "load"))
+            else:
+                self._run_stages(data_files, listeners)
+
+            if self.profiler:
+                if listing:
+                    listing.join()
+                self.profiler.save()
+
             print("Completed successfully!")
 
         except ProcessingError as e:
             print_error(str(e))
             print("Failed!")
+
+    def _listed(self, seconds: float) -> None:
+        """ Called once all data files are listed, after *seconds* """
+        if self.profiler:
+            self.profiler.record("list", seconds)
+
+    def _run_stages(self, data_files: FileCollection, listeners: List[LoadListener]) -> None:
+        """ Loads the data of all datasets and then processes it """
+        print("Loading data...")
+        with profile(self.profiler, "load"):
+            if self.load_profile:
+                profiler = cProfile.Profile()
+                data = profiler.runcall(self.loader.load, data_files, jobs=self.jobs,
+                                        listeners=listeners, prefetch=self.prefetch)
+                profiler.dump_stats(self.load_profile)
+            else:
+                data = self.loader.load(data_files, jobs=self.jobs, listeners=listeners,
+                                        prefetch=self.prefetch)
+
+        print("Processing...")
+        with profile(self.profiler, "process"):
+            self.processor.process(data)
+
+
+def _profiled(items: Iterator, profiler: Optional[Profiler], stage: str) -> Iterator:
+    """ Yields each item of *items*, recording the time taken to produce it as *stage* """
+    items = iter(items)
+    while True:
+        with profile(profiler, stage):
+            try:
+                item = next(items)
+            except StopIteration:
+                return
+
+        yield item
@@ -0,0 +1,291 @@
+import io
+import os
+import posixpath
+import shutil
+import tarfile
+import tempfile
+import threading
+import time
+import zipfile
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from processing.errors import ProcessingError
+from processing.file_container import FileContainer
+from processing.scan_directory import name_matcher
+from processing.utils import DECOMPRESSORS
+
+# Extensions of the archive formats that are supported, the tar formats may be compressed
+ZIP_EXTENSIONS = (".zip",)
+TAR_EXTENSIONS = (".tar", ".tgz", ".tbz2", ".txz") + tuple(f".tar{compression}"
+                                                          for compression in DECOMPRESSORS)
+
+# Extensions of compressed tar archives that have no '.tar' before the compression extension
+_TAR_SHORT_EXTENSIONS = {".tgz": ".gz", ".tbz2": ".bz2", ".txz": ".xz"}
+
+
+class MemberStat(NamedTuple):
+    """ Subset of the attributes of os.stat_result that apply to archive members """
+    st_size: int
+    st_mtime: float
+    st_mtime_ns: int
+
+
+class ArchiveMember:
+    """
+    A regular file inside an archive. It provides the subset of the interface of Path used by
+    the data loaders: the name of the file, open() to read it, and stat() to obtain its size
+    and modification time. Members are picklable, so they can be loaded by worker processes.
+
+    The members of tar archives are read directly at their offset in the archive. Each process
+    keeps each archive open, so reading a member does not open any file.
+    """
+
+    __slots__ = ("_archive", "_kind", "_member", "_display", "_offset", "_size", "_mtime_ns")
+
+    def __init__(self, archive: str, kind: str, member: str, display: str, offset: int,
+                 size: int, mtime_ns: int) -> None:
+        """
+        :param archive:  path to the archive file members are read from
+        :param kind:     either 'tar' or 'zip'
+        :param member:   name of the member inside the archive
+        :param display:  path of the member shown to the user, also used to identify it
+        :param offset:   offset of the member's data in a tar archive
+        :param size:     size of the member in bytes
+        :param mtime_ns: modification time of the member in nanoseconds
+        """
+        self._archive = archive
+        self._kind = kind
+        self._member = member
+        self._display = display
+        self._offset = offset
+        self._size = size
+        self._mtime_ns = mtime_ns
+
+    def __getstate__(self):
+        return tuple(getattr(self, slot) for slot in self.__slots__)
+
+    def __setstate__(self, state) -> None:
+        for slot, value in zip(self.__slots__, state):
+            setattr(self, slot, value)
+
+    @property
+    def name(self) -> str:
+        """ Name of the file, without the directories containing it """
+        return self._member.rsplit('/', 1)[-1]
+
+    @property
+    def member(self) -> str:
+        """ Full name of the member inside the archive """
+        return self._member
+
+    def open(self, mode: str = 'rb') -> BinaryIO:
+        """ Opens the member for reading. Only binary mode is supported. """
+        if mode != 'rb':
+            raise ValueError(f"archive members can only be opened in 'rb' mode, not '{mode}'")
+
+        if self._kind == 'zip':
+            return _open_zip_file(self._archive).open(self._member)
+        else:
+            data = os.pread(_open_tar_file(self._archive), self._size, self._offset)
+            return io.BytesIO(data)
+
+    def stat(self) -> MemberStat:
+        return MemberStat(self._size, self._mtime_ns / 1e9, self._mtime_ns)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, ArchiveMember) and self._display == other._display
+
+    def __hash__(self) -> int:
+        return hash(self._display)
+
+    def __str__(self) -> str:
+        return self._display
+
+    def __repr__(self) -> str:
+        return f"ArchiveMember({self._display!r})"
+
+
+class ArchiveContainer(FileContainer):
+    """
+    File container based on a tar or zip archive, or on a directory inside one. The archive is
+    indexed only once, even if it backs multiple containers, and its members are read without
+    extracting them.
+
+    Compressed tar archives (e.g. .tar.gz) cannot be read at arbitrary offsets. Thus, they are
+    decompressed once, sequentially, into a single temporary tar file, which is removed at exit.
+
+    Like ScanDirectory, only the members directly inside the directory are included, unless
+    the container is recursive.
+    """
+
+    def __init__(self, archive: Path, directory: str = "", recursive: bool = False) -> None:
+        """
+        :param archive:   path to the archive file
+        :param directory: directory inside the archive, by default its root directory
+        :param recursive: include the members in nested sub-directories of the directory
+        """
+        self._archive = archive
+        self._directory = directory.strip('/')
+        self._recursive = recursive
+
+    @property
+    def path(self) -> Path:
+        """ Path of the container, as it would be given in a configuration file """
+        return self._archive / self._directory if self._directory else self._archive
+
+    @property
+    def archive(self) -> Path:
+        return self._archive
+
+    @property
+    def recursive(self) -> bool:
+        return self._recursive
+
+    def __iter__(self) -> Iterator[ArchiveMember]:
+        return iter(self._members(lambda name: True))
+
+    def glob(self, pattern: str) -> Iterator[ArchiveMember]:
+        return iter(self._members(name_matcher(pattern)))
+
+    def _members(self, matches) -> List[ArchiveMember]:
+        prefix = self._directory + '/' if self._directory else ""
+
+        members = []
+        for member in _index(self._archive):
+            if not member.member.startswith(prefix):
+                continue
+
+            relative_name = member.member[len(prefix):]
+            if (self._recursive or '/' not in relative_name) and matches(member.name):
+                members.append(member)
+
+        # Sorted like the files of a directory, so that both are loaded in the same order
+        members.sort(key=lambda member: member.member)
+        return members
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, ArchiveContainer) and self.path == other.path
+
+    def __hash__(self) -> int:
+        return hash(self.path)
+
+    def __str__(self) -> str:
+        return str(self.path)
+
+    def __repr__(self) -> str:
+        return repr(self.path)
+
+
+def is_archive(path: Path) -> bool:
+    """ Checks whether or not *path* has the extension of a supported archive format """
+    return path.name.endswith(ZIP_EXTENSIONS + TAR_EXTENSIONS)
+
+
+def split_archive_path(path: Path) -> Optional[Tuple[Path, str]]:
+    """
+    Splits a path to a directory inside an archive, such as 'results.tar.gz/data/BGP', into
+    the path to the archive file and the directory inside it. A path to the archive itself
+    corresponds to its root directory.
+
+    :return: the archive path and the directory, or None if the path is not inside an archive
+    """
+    for parent in [path] + list(path.parents):
+        if is_archive(parent) and parent.is_file():
+            return parent, path.relative_to(parent).as_posix() if parent != path else ""
+
+    return None
+
+
+# Members of each archive already indexed, by absolute path of the archive
+_indexes: Dict[str, List[ArchiveMember]] = {}
+_indexes_lock = threading.Lock()
+_index_locks: Dict[str, threading.Lock] = {}
+
+# Temporary directories holding decompressed tar archives, removed at exit
+_temporary_dirs: List[tempfile.TemporaryDirectory] = []
+
+# Archives opened by this process: files opened in another process are never reused, since
+# the state of a file object would be shared with the process that opened it
+_open_files: Dict[Tuple[int, str], object] = {}
+
+
+def _index(archive: Path) -> List[ArchiveMember]:
+    """ Returns the regular file members of *archive*, indexing it the first time """
+    key = os.path.abspath(archive)
+    with _indexes_lock:
+        lock = _index_locks.setdefault(key, threading.Lock())
+
+    # Different archives are indexed concurrently, but each archive is indexed only once
+    with lock:
+        if key not in _indexes:
+            try:
+                if archive.name.endswith(ZIP_EXTENSIONS):
+                    _indexes[key] = _index_zip(key)
+                else:
+                    _indexes[key] = _index_tar(key)
+            except (OSError, EOFError, tarfile.TarError, zipfile.BadZipFile) as e:
+                raise ProcessingError(f"failed to read archive '{archive}': {e}")
+
+        return _indexes[key]
+
+
+def _index_zip(archive: str) -> List[ArchiveMember]:
+    with zipfile.ZipFile(archive) as file:
+        return [
+            ArchiveMember(archive, 'zip', info.filename, os.path.join(archive, info.filename),
+                          offset=0, size=info.file_size,
+                          mtime_ns=int(time.mktime(info.date_time + (0, 0, -1)) * 10 ** 9))
+            for info in file.infolist() if not info.is_dir()
+        ]
+
+
+def _index_tar(archive: str) -> List[ArchiveMember]:
+    readable_archive = archive
+    compression = _tar_compression(archive)
+    if compression:
+        # Decompress the archive into a plain tar file, which can be read at any offset
+        temporary_dir = tempfile.TemporaryDirectory(prefix="ssbgp-archive-")
+        _temporary_dirs.append(temporary_dir)
+        readable_archive = os.path.join(temporary_dir.name, "archive.tar")
+        with open(archive, 'rb') as raw, DECOMPRESSORS[compression](raw) as source, \
+                open(readable_archive, 'wb') as destination:
+            shutil.copyfileobj(source, destination, 1 << 20)
+
+    with tarfile.open(readable_archive, 'r:') as file:
+        return [
+            ArchiveMember(readable_archive, 'tar', name, os.path.join(archive, name),
+                          offset=info.offset_data, size=info.size,
+                          mtime_ns=int(info.mtime) * 10 ** 9)
+            for info, name in ((info, posixpath.normpath(info.name).lstrip('/'))
+                               for info in file if info.isfile())
+        ]
+
+
+def _tar_compression(archive: str) -> Optional[str]:
+    """ Returns the compression extension of a tar archive, or None if it is not compressed """
+    for extension, compression in _TAR_SHORT_EXTENSIONS.items():
+        if archive.endswith(extension):
+            return compression
+
+    for compression in DECOMPRESSORS:
+        if archive.endswith(f".tar{compression}"):
+            return compression
+
+    return None
+
+
+def _open_zip_file(archive: str) -> zipfile.ZipFile:
+    key = (os.getpid(), archive)
+    if key not in _open_files:
+        _open_files[key] = zipfile.ZipFile(archive)
+
+    return _open_files[key]
+
+
+def _open_tar_file(archive: str) -> int:
+    key = (os.getpid(), archive)
+    if key not in _open_files:
+        _open_files[key] = os.open(archive, os.O_RDONLY)
+
+    return _open_files[key]
@@ -0,0 +1,63 @@
+from typing import List, Sequence, Tuple, Union
+
+import numpy as np
+
+# Maximum number of indices drawn at once, which bounds the memory used by a batch of resamples
+_MAX_BATCH_INDICES = 1 << 22
+
+
+def bootstrap_ratio_intervals(totals: Sequence[np.ndarray], counts: np.ndarray, resamples: int,
+                              seed: Union[int, Sequence[int]] = 0,
+                              confidence: float = 0.95) -> List[Tuple[float, float]]:
+    """
+    Computes bootstrap percentile confidence intervals of ratios of the form
+    sum(totals[j]) / sum(counts), such as the mean of the values of all samples, given the sum
+    of the values of the samples of each destination (cluster) and their number.
+
+    Samples of the same cluster are correlated. Thus, whole clusters are resampled with
+    replacement, instead of individual samples, and all ratios are computed over the same
+    resamples. Resamples are drawn in batches, without any loop over resamples: each batch is a
+    matrix of cluster indices, with one row for each resample, which is turned into a matrix
+    with the number of times each cluster is drawn in each resample. The sums of the totals
+    and counts over all resamples of a batch are then a single matrix product. Batches are
+    sized to bound the memory they use.
+
+    :param totals:     for each ratio, the sum of the values of each cluster
+    :param counts:     number of values of each cluster
+    :param resamples:  number of bootstrap resamples
+    :param seed:       seed of the random resamples, the same seed yields the same intervals
+    :param confidence: confidence level of the intervals
+    :return: the lower and upper bounds of the interval of each ratio, NaN if the intervals
+             cannot be estimated
+    """
+    cluster_count = len(counts)
+    if cluster_count < 2 or resamples < 1 or not np.any(counts):
+        return [(float('nan'), float('nan'))] * len(totals)
+
+    # RandomState, unlike the newer generators, is available in all supported versions of NumPy.
+    # It only takes seeds of 32 bits, so each seed is truncated to its lowest 32 bits.
+    seeds = [seed] if isinstance(seed, int) else list(seed)
+    random = np.random.RandomState([value & 0xFFFFFFFF for value in seeds])
+    batch_size = max(1, _MAX_BATCH_INDICES // cluster_count)
+    # Counts and totals of each cluster, one cluster per row, in floating point for the
+    # matrix product: their sums are exact up to 2^53
+    clusters = np.column_stack([counts] + list(totals)).astype(np.float64)
+    sums = np.empty((resamples, clusters.shape[1]))
+
+    for start in range(0, resamples, batch_size):
+        end = min(start + batch_size, resamples)
+        indices = random.randint(0, cluster_count, size=(end - start, cluster_count),
+                                 dtype=np.int64)
+        # Offset the indices of each resample to count the draws of all resamples at once
+        indices += np.arange(end - start)[:, np.newaxis] * cluster_count
+        draws = np.bincount(indices.ravel(), minlength=indices.size)
+        sums[start:end] = draws.reshape(indices.shape).astype(np.float64) @ clusters
+
+    # Resamples without any values have no ratio, they are ignored
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratios = sums[:, 1:] / sums[:, :1]
+
+    tail = (1 - confidence) / 2 * 100
+    bounds = np.nanpercentile(ratios, [tail, 100 - tail], axis=0)
+
+    return [(float(low), float(high)) for low, high in zip(bounds[0], bounds[1])]
@@ -0,0 +1,288 @@
+import importlib.util
+import io
+import json
+import os
+import threading
+import zipfile
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple
+
+import numpy as np
+
+from processing.archive_container import MemberStat
+from processing.errors import ProcessingError
+from processing.file_container import FileContainer
+from processing.scan_directory import name_matcher
+
+# Extensions of the formats of compacted datasets: a NumPy archive, and a Parquet file, which
+# requires pyarrow
+NPZ_EXTENSION = ".npz"
+PARQUET_EXTENSION = ".parquet"
+COMPACT_EXTENSIONS = (NPZ_EXTENSION, PARQUET_EXTENSION)
+
+# Changing the format of compacted datasets requires changing the version
+COMPACT_VERSION = 1
+
+# Key of the metadata of a compacted dataset in the metadata of a Parquet file
+_PARQUET_METADATA_KEY = b"ssbgp-compact"
+
+# Prefix of the arrays holding the sample columns in a NumPy archive
+_NPZ_COLUMN_PREFIX = "column:"
+
+
+class CompactDataset(NamedTuple):
+    """
+    The data files of a dataset, stored in columnar form. The rows of all data files are
+    concatenated in each column. The rows of the i-th data file are stored between positions
+    offsets[i] and offsets[i + 1] of each column. Each data file is identified by the id of
+    its destination, taken from its path relative to the data directory, and *extension* is
+    the extension of the data files.
+    """
+    destinations: List[str]
+    offsets: np.ndarray
+    columns: Dict[str, np.ndarray]
+    extension: str
+
+
+class CompactMember:
+    """
+    A data file stored in a compacted dataset. It provides the subset of the interface of Path
+    used by the data loaders, along with read_columns(), which returns the columns of the data
+    file without parsing anything.
+
+    The compacted dataset is read only once by each process. Thus, members should be loaded by
+    the process that selected them, which already holds their data in memory.
+    """
+
+    __slots__ = ("_path", "_name", "_display", "_start", "_end", "_row_size", "_mtime_ns")
+
+    def __init__(self, path: str, name: str, start: int, end: int, row_size: int,
+                 mtime_ns: int) -> None:
+        """
+        :param path:     absolute path to the compacted dataset
+        :param name:     path of the data file relative to its data directory
+        :param start:    position of the first row of the data file in each column
+        :param end:      position after the last row of the data file in each column
+        :param row_size: size of each row in bytes
+        :param mtime_ns: modification time of the compacted dataset in nanoseconds
+        """
+        self._path = path
+        self._name = name
+        self._display = os.path.join(path, name)
+        self._start = start
+        self._end = end
+        self._row_size = row_size
+        self._mtime_ns = mtime_ns
+
+    def __getstate__(self):
+        return tuple(getattr(self, slot) for slot in self.__slots__)
+
+    def __setstate__(self, state) -> None:
+        for slot, value in zip(self.__slots__, state):
+            setattr(self, slot, value)
+
+    @property
+    def name(self) -> str:
+        """ Path of the data file relative to the data directory it was compacted from """
+        return self._name
+
+    def read_columns(self, columns: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Returns the specified columns of the data file.
+
+        :raise ProcessingError: if the compacted dataset is missing a column
+        """
+        dataset = load_compact(Path(self._path))
+        missing = [column for column in columns if column not in dataset.columns]
+        if missing:
+            raise ProcessingError(f"compacted dataset '{self._path}' is missing columns: "
+                                  f"{', '.join(missing)}")
+
+        return {column: dataset.columns[column][self._start:self._end] for column in columns}
+
+    def stat(self) -> MemberStat:
+        return MemberStat((self._end - self._start) * self._row_size, self._mtime_ns / 1e9,
+                          self._mtime_ns)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, CompactMember) and self._display == other._display
+
+    def __hash__(self) -> int:
+        return hash(self._display)
+
+    def __str__(self) -> str:
+        return self._display
+
+    def __repr__(self) -> str:
+        return f"CompactMember({self._display!r})"
+
+
+class CompactContainer(FileContainer):
+    """
+    File container based on a compacted dataset (see the compact tool). The whole dataset is
+    read sequentially, once, when the container is first listed. Its data files are then
+    served from memory, until the container is released.
+    """
+
+    def __init__(self, path: Path) -> None:
+        """
+        :param path: path to the compacted dataset
+        """
+        self._path = path
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    def __iter__(self) -> Iterator[CompactMember]:
+        return iter(self._members())
+
+    def glob(self, pattern: str) -> Iterator[CompactMember]:
+        matches = name_matcher(pattern)
+        # Only the name of each data file is matched, not the sub-directories it was in
+        return (member for member in self._members()
+                if matches(member.name.rpartition('/')[2]))
+
+    def _members(self) -> List[CompactMember]:
+        path = os.path.abspath(self._path)
+        dataset = load_compact(self._path)
+        mtime_ns = os.stat(path).st_mtime_ns
+        row_size = sum(values.itemsize for values in dataset.columns.values())
+
+        return [CompactMember(path, destination + dataset.extension,
+                              int(dataset.offsets[index]), int(dataset.offsets[index + 1]),
+                              row_size, mtime_ns)
+                for index, destination in enumerate(dataset.destinations)]
+
+    def release(self) -> None:
+        release_compact(self._path)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, CompactContainer) and self._path == other._path
+
+    def __hash__(self) -> int:
+        return hash(self._path)
+
+    def __str__(self) -> str:
+        return str(self._path)
+
+    def __repr__(self) -> str:
+        return repr(self._path)
+
+
+def is_compact(path: Path) -> bool:
+    """ Checks whether or not *path* has the extension of a compacted dataset """
+    return path.name.endswith(COMPACT_EXTENSIONS)
+
+
+def parquet_available() -> bool:
+    """ Checks whether or not compacted datasets can be stored as Parquet files """
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def write_compact(path: Path, dataset: CompactDataset) -> None:
+    """
+    Writes a compacted dataset to *path*. The format is chosen by the extension of the path:
+    either a NumPy archive (.npz) or a Parquet file (.parquet).
+    """
+    # Write to a temporary file first to never leave a partial dataset behind
+    temporary = path.with_name(path.name + ".tmp")
+    if path.name.endswith(PARQUET_EXTENSION):
+        _write_parquet(temporary, dataset)
+    else:
+        with open(temporary, 'wb') as file:
+            np.savez(file, version=np.array(COMPACT_VERSION), extension=dataset.extension,
+                     destinations=np.array(dataset.destinations, dtype=str),
+                     offsets=dataset.offsets,
+                     **{_NPZ_COLUMN_PREFIX + column: values
+                        for column, values in dataset.columns.items()})
+    os.replace(temporary, path)
+
+
+def _write_parquet(path: Path, dataset: CompactDataset) -> None:
+    import pyarrow
+    import pyarrow.parquet
+
+    metadata = {
+        "version": COMPACT_VERSION,
+        "extension": dataset.extension,
+        "destinations": dataset.destinations,
+        "offsets": dataset.offsets.tolist(),
+    }
+
+    table = pyarrow.Table.from_arrays(
+        [pyarrow.array(values) for values in dataset.columns.values()],
+        names=list(dataset.columns)
+    )
+    table = table.replace_schema_metadata({_PARQUET_METADATA_KEY: json.dumps(metadata)})
+    pyarrow.parquet.write_table(table, str(path))
+
+
+# Compacted datasets already read by this process, by absolute path
+_datasets: Dict[str, CompactDataset] = {}
+_datasets_lock = threading.Lock()
+
+
+def load_compact(path: Path) -> CompactDataset:
+    """
+    Returns the compacted dataset at *path*. The dataset is read with a single sequential read
+    the first time, and kept in memory until it is released with release_compact().
+
+    :raise ProcessingError: if the dataset cannot be read
+    """
+    key = os.path.abspath(path)
+    with _datasets_lock:
+        if key not in _datasets:
+            try:
+                with open(key, 'rb') as file:
+                    data = file.read()
+
+                if key.endswith(PARQUET_EXTENSION):
+                    _datasets[key] = _read_parquet(data)
+                else:
+                    _datasets[key] = _read_npz(data)
+            except ImportError:
+                raise ProcessingError(f"reading compacted dataset '{path}' requires pyarrow")
+            except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile) as e:
+                raise ProcessingError(f"failed to read compacted dataset '{path}': {e}")
+
+        return _datasets[key]
+
+
+def release_compact(path: Path) -> None:
+    """ Releases the compacted dataset at *path* from memory, if it was read """
+    with _datasets_lock:
+        _datasets.pop(os.path.abspath(path), None)
+
+
+def _read_npz(data: bytes) -> CompactDataset:
+    with np.load(io.BytesIO(data)) as arrays:
+        _check_version(int(arrays["version"]))
+        return CompactDataset(
+            destinations=arrays["destinations"].tolist(),
+            offsets=arrays["offsets"],
+            columns={name[len(_NPZ_COLUMN_PREFIX):]: arrays[name] for name in arrays.files
+                     if name.startswith(_NPZ_COLUMN_PREFIX)},
+            extension=str(arrays["extension"]),
+        )
+
+
+def _read_parquet(data: bytes) -> CompactDataset:
+    import pyarrow
+    import pyarrow.parquet
+
+    table = pyarrow.parquet.read_table(pyarrow.BufferReader(data))
+    metadata = json.loads(table.schema.metadata[_PARQUET_METADATA_KEY])
+    _check_version(metadata["version"])
+
+    return CompactDataset(
+        destinations=metadata["destinations"],
+        offsets=np.array(metadata["offsets"], dtype=np.int64),
+        columns={name: table.column(name).to_numpy() for name in table.column_names},
+        extension=metadata["extension"],
+    )
+
+
+def _check_version(version: int) -> None:
+    if version != COMPACT_VERSION:
+        raise ValueError(f"unsupported format version {version}, compact the dataset again")
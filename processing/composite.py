@@ -0,0 +1,78 @@
+from collections import defaultdict
+from typing import Any, Dict, Iterator, List, Tuple
+
+import numpy as np
+
+from processing.accumulator import Accumulator
+from processing.data_processor import DataProcessor
+from processing.file_data_loader import FileDataLoader
+from processing.parse_cache import ParseCache
+from processing.streaming_loader import StreamingDataLoader, accumulate
+from processing.types import Label
+
+
+class CompositeDataLoader(FileDataLoader):
+    """
+    Loads the data of multiple file data loaders in a single pass over the data files. Each
+    data file is read only once, with the union of the columns required by all loaders, and
+    its columns are then handed to each loader.
+
+    The loaded data is a list with the data loaded by each loader, in the same order as the
+    loaders. The per-file results of streaming loaders are merged into the accumulator of
+    their label as soon as each data file is loaded, so that they keep using constant memory.
+    The per-file results of the other loaders are kept until all data files are loaded, and
+    then collected by each loader. Loaders that override load() cannot be composed.
+    """
+
+    def __init__(self, loaders: List[FileDataLoader], cache: ParseCache = None) -> None:
+        super().__init__(cache)
+        self.loaders = loaders
+
+        self.columns = []
+        for loader in loaders:
+            self.columns.extend(column for column in loader.columns
+                                if column not in self.columns)
+
+    def load_columns(self, columns: Dict[str, np.ndarray]) -> Tuple[Any, ...]:
+        return tuple(loader.load_columns(columns) for loader in self.loaders)
+
+    def collect(self, results: Iterator[Tuple[Label, Tuple[Any, ...]]]) -> List[Any]:
+        accumulators: Dict[int, Dict[Label, Accumulator]] = {
+            i: {} for i, loader in enumerate(self.loaders)
+            if isinstance(loader, StreamingDataLoader)
+        }
+        loader_results: Dict[int, List[Tuple[Label, Any]]] = defaultdict(list)
+        for label, file_results in results:
+            for i, result in enumerate(file_results):
+                if i in accumulators:
+                    accumulate(accumulators[i], label, result)
+                else:
+                    loader_results[i].append((label, result))
+
+        data = []
+        for i, loader in enumerate(self.loaders):
+            if i in accumulators:
+                data.append(accumulators[i])
+            else:
+                data.append(loader.collect(iter(loader_results.pop(i, []))))
+
+        return data
+
+    def collect_dataset(self, label: Label, results: Iterator[Tuple[Label, Tuple[Any, ...]]]) \
+            -> List[Any]:
+        """ Returns a list with the data of the dataset loaded by each loader """
+        return [loader_data[label] for loader_data in self.collect(results)]
+
+
+class CompositeDataProcessor(DataProcessor):
+    """
+    Feeds the data loaded by a composite data loader to multiple processors. The i-th
+    processor processes the data loaded by the i-th loader.
+    """
+
+    def __init__(self, processors: List[DataProcessor]) -> None:
+        self.processors = processors
+
+    def process(self, data: List[Any]):
+        for processor, processor_data in zip(self.processors, data):
+            processor.process(processor_data)
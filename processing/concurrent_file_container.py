@@ -0,0 +1,44 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, Tuple
+
+from processing.file_container import FileContainer
+from processing.labeled_file_container import LabeledFileContainer
+from processing.types import Label
+
+
+class ConcurrentLabeledFileContainer(LabeledFileContainer):
+    """
+    Labeled file container that lists all of its containers concurrently, using a pool of
+    threads. This hides the latency of listing directories on network file systems.
+
+    Files are still returned grouped by label, in the same order as the containers. The files
+    of each container are returned once that container is fully listed, while the following
+    containers are still being listed.
+    """
+
+    def __init__(self, containers: Dict[Label, FileContainer], max_workers: int = 16) -> None:
+        super().__init__(containers)
+        self._max_workers = max_workers
+
+    def glob(self, pattern: str) -> Iterator[Path]:
+        """ Returns iterator to iterate over each file matching the given *pattern* """
+        return (file for _, file in self.glob_by_label(pattern))
+
+    def glob_by_label(self, pattern: str) -> Iterator[Tuple[Label, Path]]:
+        """
+        Returns iterator to iterate over each file matching the given *pattern* and its
+        corresponding label
+        """
+
+        def iterator() -> Iterator[Tuple[Label, Path]]:
+            workers = max(1, min(self._max_workers, len(self._containers)))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [(label, executor.submit(list, container.glob(pattern)))
+                           for label, container in self._containers.items()]
+
+                for label, future in futures:
+                    for file in future.result():
+                        yield label, file
+
+        return iterator()
@@ -1,6 +1,6 @@
 import csv
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterable, List, Sequence
 
 
 class CSVPrinter:
@@ -9,6 +9,7 @@ class CSVPrinter:
         self._path = path
         self._file = None
         self._writer: csv.DictWriter = None
+        self._row_writer = None
 
     def __enter__(self):
         self._file = open(self._path, 'w', newline='').__enter__()
@@ -20,6 +21,7 @@ class CSVPrinter:
     def set_headers(self, headers: List[str]):
         self._writer = csv.DictWriter(self._file, fieldnames=headers)
         self._writer.writeheader()
+        self._row_writer = csv.writer(self._file)
 
     def print_row(self, row: Dict[str, Any]):
 
@@ -29,4 +31,16 @@ class CSVPrinter:
             # set_headers() was not called before printing a row
             raise ValueError("CSVPrinter: cannot write a row before the headers having been set")
 
+    def flush(self):
+        """ Writes the rows printed so far to the file """
+        self._file.flush()
 
+    def print_rows(self, rows: Iterable[Sequence[Any]]):
+        """
+        Prints multiple rows at once. Unlike print_row(), each row is a sequence with one value
+        for each header, in the same order as the headers.
+        """
+        if self._row_writer is None:
+            raise ValueError("CSVPrinter: cannot write a row before the headers having been set")
+
+        self._row_writer.writerows(rows)
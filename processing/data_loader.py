@@ -1,6 +1,9 @@
 from abc import abstractmethod, ABC
+from typing import Any, Iterator, Sequence, Tuple
 
 from processing.file_collection import FileCollection
+from processing.load_listener import LoadListener
+from processing.types import Label
 
 
 class DataLoader(ABC):
@@ -11,7 +14,8 @@ class DataLoader(ABC):
     """
 
     @abstractmethod
-    def load(self, data_files: FileCollection):
+    def load(self, data_files: FileCollection, jobs: int = 1,
+             listeners: Sequence[LoadListener] = (), prefetch: int = 0):
         """
         Loads data from the specified data files. It returns a data structure
         holding the data. The type of structure returned is completely dependent
@@ -19,5 +23,19 @@ class DataLoader(ABC):
         on disk and just provide an interface to access that data.
 
         :param data_files: list of data files to load data from
+        :param jobs:       number of worker processes the loader may use
+        :param listeners:  listeners notified as data files are loaded
+        :param prefetch:   number of data files the loader may read ahead, 0 to disable it
         :return: a data structure with the loaded data.
         """
+
+    def load_datasets(self, data_files: FileCollection, jobs: int = 1,
+                      listeners: Sequence[LoadListener] = (),
+                      prefetch: int = 0) -> Iterator[Tuple[Label, Any]]:
+        """
+        Loads data from the specified data files, and yields the label and data of each
+        dataset. Loaders that can tell when all data files of a dataset are loaded should
+        yield each dataset as soon as that happens. By default, all datasets are loaded with
+        load(), which must return a dictionary keyed by label, before yielding the first one.
+        """
+        yield from self.load(data_files, jobs, listeners, prefetch).items()
@@ -0,0 +1,29 @@
+from abc import abstractmethod
+from typing import Any, Dict, Iterator, Tuple
+
+from processing.data_processor import DataProcessor
+from processing.types import Label
+
+
+class DatasetProcessor(DataProcessor):
+    """
+    Data processors that process each dataset independently of all others. They can process
+    each dataset as soon as it is loaded, outputting its results before the following datasets
+    are loaded, and without keeping the data of all datasets in memory at once.
+    """
+
+    def process(self, data: Dict[Label, Any]):
+        """
+        Processes the data of all datasets at once.
+
+        :param data: dictionary mapping the label of each dataset to its data
+        """
+        self.process_each(iter(data.items()))
+
+    @abstractmethod
+    def process_each(self, datasets: Iterator[Tuple[Label, Any]]):
+        """
+        Processes each dataset as it is produced by *datasets*.
+
+        :param datasets: iterator over the label and data of each dataset
+        """
@@ -2,24 +2,45 @@ from processing.file_container import FileContainer
 from processing.file_list import FileList
 from processing.file_selector import FileSelector
 from processing.file_collection import FileCollection
-from processing.labeled_file_collection import LabeledFileCollection
 from processing.labeled_file_container import LabeledFileContainer
+from processing.streaming_file_collection import StreamingFileCollection
+from processing.utils import compression_extensions
 
 
 class ExtensionFileSelector(FileSelector):
-    """ Selects only files with the defined extension as data files """
+    """
+    Selects only files with the defined extension as data files. By default, compressed files
+    with that extension followed by the extension of a supported compression format (e.g.
+    .basic.csv.gz) are selected as well.
 
-    def __init__(self, extension: str) -> None:
+    Files are selected from labeled containers as they are listed: the returned collection is
+    filled while it is iterated, so that the files of the first datasets can be loaded before
+    the container is fully listed. Each directory is listed and sorted in full before any of
+    its files are selected, so the files of a dataset are loaded only once its directory is
+    listed.
+    """
+
+    def __init__(self, extension: str, compressed: bool = True) -> None:
+        """
+        :param extension:  extension of the data files
+        :param compressed: select compressed data files as well
+        """
         self.extension = extension
-        self._pattern = f"*{self.extension}"
+        if compressed:
+            # A single listing of each directory selects both plain and compressed files
+            self._pattern = f"*{self.extension}*"
+            self._suffixes = tuple([self.extension] + [self.extension + compression
+                                                       for compression in compression_extensions()])
+        else:
+            self._pattern = f"*{self.extension}"
+            self._suffixes = (self.extension,)
 
     def select(self, files: FileContainer) -> FileCollection:
 
         if isinstance(files, LabeledFileContainer):
-            data_files = LabeledFileCollection()
-            for label, file in files.glob_by_label(self._pattern):
-                data_files.add(file, label)
-
-            return data_files
+            return StreamingFileCollection((label, file) for label, file
+                                           in files.glob_by_label(self._pattern)
+                                           if file.name.endswith(self._suffixes))
         else:
-            return FileList(files.glob(self._pattern))
+            return FileList(file for file in files.glob(self._pattern)
+                            if file.name.endswith(self._suffixes))
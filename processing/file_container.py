@@ -25,3 +25,10 @@ class FileContainer(ABC):
 
         :param pattern: pattern to match files to
         """
+
+    def release(self) -> None:
+        """
+        Releases the resources the container holds for its data files, such as data read into
+        memory, once they are all loaded. The container remains usable, but its resources
+        must be obtained again. By default, containers hold no such resources.
+        """
@@ -0,0 +1,270 @@
+import time
+from abc import abstractmethod
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import groupby, repeat
+from operator import itemgetter
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from processing.compact_container import CompactMember
+from processing.data_loader import DataLoader
+from processing.labeled_file_collection import LabeledFileCollection
+from processing.load_listener import FileStats, LoadListener
+from processing.parse_cache import ParseCache
+from processing.prefetch import Prefetcher
+from processing.types import Label
+from processing.utils import read_columns, file_stat
+
+
+# Maximum number of files in each chunk sent to a worker process
+MAX_CHUNK_SIZE = 64
+
+# Maximum number of chunks in flight for each worker process
+MAX_CHUNKS_PER_JOB = 8
+
+
+class FileDataLoader(DataLoader):
+    """
+    Base class for data loaders that load each data file independently of all others.
+
+    Each data file is loaded into a compact per-file result by load_file(). The results are
+    then collected, in the same order as the files in the collection, into the data structure
+    returned by load(). Since files are independent of each other, they can be loaded by
+    multiple worker processes. When loading in a single process, the next data files can be
+    read ahead by a pool of threads while the current one is parsed (see Prefetcher).
+
+    By default, load_file() reads the columns listed in the *columns* attribute, using the
+    parse cache if one is set, and computes the per-file result with load_columns().
+    """
+
+    # Columns read from each data file
+    columns: List[str] = []
+
+    def __init__(self, cache: ParseCache = None) -> None:
+        self.cache = cache
+        self._rows_read = 0
+
+    def load(self, data_files: LabeledFileCollection, jobs: int = 1,
+             listeners: Sequence[LoadListener] = (), prefetch: int = 0):
+        data = self.collect(self.load_each(data_files, jobs, listeners, prefetch))
+
+        if self.cache:
+            self.cache.trim()
+
+        return data
+
+    def load_datasets(self, data_files: LabeledFileCollection, jobs: int = 1,
+                      listeners: Sequence[LoadListener] = (),
+                      prefetch: int = 0) -> Iterator[Tuple[Label, Any]]:
+        """
+        Loads the data files like load(), but yields the data of each dataset, collected with
+        collect_dataset(), as soon as all of its data files are loaded.
+        """
+        results = self.load_each(data_files, jobs, listeners, prefetch)
+        for label, label_results in groupby(results, key=itemgetter(0)):
+            yield label, self.collect_dataset(label, label_results)
+
+        if self.cache:
+            self.cache.trim()
+
+    def collect_dataset(self, label: Label, results: Iterator[Tuple[Label, Any]]) -> Any:
+        """
+        Collects the results of loading the data files of a single dataset into the data of
+        that dataset. By default, it requires collect() to return a dictionary keyed by label.
+
+        :param label:   label of the dataset
+        :param results: iterator over the label and result of each data file of the dataset
+        :return: the data of the dataset
+        """
+        return self.collect(results)[label]
+
+    def load_each(self, data_files: LabeledFileCollection, jobs: int = 1,
+                  listeners: Sequence[LoadListener] = (),
+                  prefetch: int = 0) -> Iterator[Tuple[Label, Any]]:
+        """
+        Loads each data file with load_file() and yields its label along with the result,
+        in the same order as the files in the collection. If any listeners are given, they
+        are notified after each file is loaded. Files are loaded as the collection produces
+        them, so loading may start before all data files are selected. In that case, listeners
+        are notified of the number of data files as soon as they are all listed.
+
+        If *prefetch* is positive and files are loaded by a single process, up to *prefetch*
+        data files are read ahead, and the listeners are notified of the statistics of reading
+        them ahead. Worker processes already overlap reading with parsing, so
+        files are never read ahead with multiple jobs. Files found in the parse cache are
+        not read ahead either.
+        """
+        labeled_files = data_files.iter_by_label()
+        total = data_files.length_hint()
+        prefetcher = None
+        if prefetch > 0 and jobs <= 1:
+            prefetcher = Prefetcher(prefetch, skip=self.cache.contains if self.cache else None)
+            labeled_files = prefetcher.prefetch(labeled_files)
+
+        if not listeners:
+            yield from load_files(self.load_file, labeled_files, jobs, total)
+        else:
+            for listener in listeners:
+                listener.load_started(total)
+
+            for label, (result, stats) in load_files(self._load_file_with_stats,
+                                                     labeled_files, jobs, total):
+                for listener in listeners:
+                    listener.file_loaded(stats)
+
+                if total is None:
+                    total = data_files.length_hint()
+                    if total is not None:
+                        for listener in listeners:
+                            listener.total_known(total)
+
+                yield label, result
+
+        if prefetcher:
+            stats = prefetcher.stats()
+            for listener in listeners:
+                listener.prefetch_finished(stats)
+
+        for listener in listeners:
+            listener.load_finished()
+
+    def read_columns(self, path: Path, columns: List[str]) -> Dict[str, np.ndarray]:
+        """ Reads the specified columns from a data file, using the cache if one is set """
+        if isinstance(path, CompactMember):
+            # Compacted datasets are already stored in columnar form, they are never cached
+            data = path.read_columns(columns)
+        elif self.cache:
+            data = self.cache.read_columns(path, columns)
+        else:
+            data = read_columns(path, columns)
+
+        if data:
+            self._rows_read += len(next(iter(data.values())))
+
+        return data
+
+    def load_file(self, path: Path) -> Any:
+        """
+        Loads a single data file. This method may be called from a worker process. Thus,
+        the returned result must be picklable and should be as compact as possible.
+
+        :param path: path to the data file to load
+        :return: the result of loading the file
+        """
+        return self.load_columns(self.read_columns(path, self.columns))
+
+    def _load_file_with_stats(self, path: Path) -> Tuple[Any, FileStats]:
+        """ Loads a single data file with load_file() and measures how long it takes """
+        self._rows_read = 0
+        start = time.perf_counter()
+        result = self.load_file(path)
+        seconds = time.perf_counter() - start
+
+        return result, FileStats(str(path), file_stat(path).st_size, self._rows_read, seconds)
+
+    @abstractmethod
+    def load_columns(self, columns: Dict[str, np.ndarray]) -> Any:
+        """
+        Computes the result of loading a single data file from its columns.
+
+        :param columns: dictionary mapping each name in *columns* to the column's values
+        :return: the result of loading the file
+        """
+
+    @abstractmethod
+    def collect(self, results: Iterator[Tuple[Label, Any]]):
+        """
+        Collects the results of loading each data file into a single data structure.
+
+        :param results: iterator over the label and result of each data file, in order
+        :return: a data structure with the loaded data.
+        """
+
+
+def load_files(function: Callable[[Path], Any], labeled_files: Iterator[Tuple[Label, Path]],
+               jobs: int = 1, total: int = None) -> Iterator[Tuple[Label, Any]]:
+    """
+    Applies *function* to each file in *labeled_files* and yields the label of each file along
+    with the result. Results are always yielded in the same order as the files, independently
+    of the number of jobs. Members of compacted datasets are always loaded by this process.
+
+    With multiple jobs, files are sent to the worker processes in chunks, as soon as they are
+    produced by *labeled_files*. If the number of files is not known in advance, chunks start
+    small, to keep all workers busy with few files, and grow up to MAX_CHUNK_SIZE files. The
+    number of chunks in flight is bounded, which bounds the memory holding results that cannot
+    be yielded yet.
+
+    :param function:      function to load a single file, must be picklable if jobs > 1
+    :param labeled_files: iterator over pairs of label and file
+    :param jobs:          number of worker processes to use
+    :param total:         number of files, if known in advance, used to size the chunks
+    """
+    if jobs <= 1:
+        for label, file in labeled_files:
+            yield label, function(file)
+        return
+
+    if total is None:
+        chunk_sizes = _growing_sizes(1, MAX_CHUNK_SIZE)
+    else:
+        # Large chunks reduce the communication overhead, but too large chunks leave workers
+        # idle at the end of the run
+        chunk_sizes = repeat(max(1, min(MAX_CHUNK_SIZE, total // (jobs * 4))))
+
+    pending: Deque[Tuple[List[Tuple[Label, Path]], Optional[Future]]] = deque()
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        for chunk in _chunks(labeled_files, chunk_sizes):
+            # Members of compacted datasets are already in the memory of this process: loading
+            # them in workers would only add the cost of reading each compacted dataset again
+            remote_files = [file for _, file in chunk if not isinstance(file, CompactMember)]
+            future = executor.submit(_load_chunk, function, remote_files) if remote_files \
+                else None
+            pending.append((chunk, future))
+
+            while pending and (pending[0][1] is None or pending[0][1].done() or
+                               len(pending) > jobs * MAX_CHUNKS_PER_JOB):
+                yield from _chunk_results(function, *pending.popleft())
+
+        while pending:
+            yield from _chunk_results(function, *pending.popleft())
+
+
+def _chunks(labeled_files: Iterator[Tuple[Label, Path]],
+            sizes: Iterator[int]) -> Iterator[List[Tuple[Label, Path]]]:
+    """ Splits *labeled_files* into chunks, the size of each chunk is taken from *sizes* """
+    chunk = []
+    size = next(sizes)
+    for labeled_file in labeled_files:
+        chunk.append(labeled_file)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+            size = next(sizes)
+
+    if chunk:
+        yield chunk
+
+
+def _growing_sizes(first: int, maximum: int) -> Iterator[int]:
+    """ Yields sizes starting at *first* and doubling up to *maximum* """
+    size = first
+    while True:
+        yield size
+        size = min(size * 2, maximum)
+
+
+def _load_chunk(function: Callable[[Path], Any], files: List[Path]) -> List[Any]:
+    return [function(file) for file in files]
+
+
+def _chunk_results(function: Callable[[Path], Any], chunk: List[Tuple[Label, Path]],
+                   future: Optional[Future]) -> Iterator[Tuple[Label, Any]]:
+    remote_results = iter(future.result() if future else [])
+    for label, file in chunk:
+        if isinstance(file, CompactMember):
+            yield label, function(file)
+        else:
+            yield label, next(remote_results)
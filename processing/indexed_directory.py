@@ -0,0 +1,106 @@
+import os
+import sys
+from pathlib import Path
+from typing import BinaryIO, Callable, List, Optional, Tuple, Union
+
+from processing.archive_container import MemberStat
+from processing.manifest_index import ManifestIndex
+from processing.scan_directory import ScanDirectory
+
+
+class IndexedFile:
+    """
+    A file taken from a manifest index. It provides the subset of the interface of Path used
+    by the data loaders, along with the size and modification time recorded in the index: its
+    stat() does not access the file system. Its path is only built from the path of its
+    directory, which is shared by all files of the directory, and its name when it is needed.
+    Files are picklable, so they can be loaded by worker processes.
+    """
+
+    __slots__ = ("_directory", "_name", "_size", "_mtime_ns")
+
+    def __init__(self, directory: str, name: str, size: Optional[int],
+                 mtime_ns: Optional[int]) -> None:
+        """
+        :param directory: absolute path to the directory of the file
+        :param name:      name of the file
+        :param size:      size of the file in bytes, None if it is not known
+        :param mtime_ns:  modification time of the file in nanoseconds, None if it is not known
+        """
+        self._directory = directory
+        self._name = name
+        self._size = size
+        self._mtime_ns = mtime_ns
+
+    def __getstate__(self):
+        return tuple(getattr(self, slot) for slot in self.__slots__)
+
+    def __setstate__(self, state) -> None:
+        for slot, value in zip(self.__slots__, state):
+            setattr(self, slot, value)
+
+    @property
+    def name(self) -> str:
+        """ Name of the file, without the directories containing it """
+        return self._name
+
+    def open(self, mode: str = 'rb') -> BinaryIO:
+        """ Opens the file for reading. Only binary mode is supported. """
+        if mode != 'rb':
+            raise ValueError(f"indexed files can only be opened in 'rb' mode, not '{mode}'")
+
+        return open(str(self), 'rb')
+
+    def stat(self) -> Union[MemberStat, os.stat_result]:
+        if self._size is None or self._mtime_ns is None:
+            return os.stat(str(self))
+
+        return MemberStat(self._size, self._mtime_ns / 1e9, self._mtime_ns)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, IndexedFile) and self._directory == other._directory and \
+            self._name == other._name
+
+    def __hash__(self) -> int:
+        return hash((self._directory, self._name))
+
+    def __str__(self) -> str:
+        return os.path.join(self._directory, self._name)
+
+    def __repr__(self) -> str:
+        return f"IndexedFile({str(self)!r})"
+
+
+class IndexedDirectory(ScanDirectory):
+    """
+    File container based on a single directory, whose entries are taken from a manifest index
+    whenever the directory did not change since it was indexed. Only the directories that
+    changed are listed again. Files are returned in the same order as ScanDirectory returns
+    them, as IndexedFile objects carrying the size and modification time recorded in the
+    index, and identified by their absolute path.
+
+    Optionally, the files in all nested sub-directories are included as well, each
+    sub-directory being validated against the index on its own.
+    """
+
+    def __init__(self, directory: Path, index: ManifestIndex, recursive: bool = False) -> None:
+        super().__init__(directory, recursive)
+        self._index = index
+
+    def _scan(self, matches: Callable[[str], bool]) -> List[IndexedFile]:
+        entries: List[Tuple[str, str, Optional[int], Optional[int]]] = []
+        directories = [str(self._path)]
+        while directories:
+            directory = directories.pop()
+            # All files of the directory share the same string for its path
+            prefix = sys.intern(os.path.abspath(directory))
+            for name, is_dir, size, mtime_ns in self._index.entries(directory):
+                if matches(name):
+                    entries.append((prefix, name, size, mtime_ns))
+
+                if self._recursive and is_dir:
+                    directories.append(os.path.join(directory, name))
+
+        # Same order as ScanDirectory: by directory and then by name
+        entries.sort()
+        return [IndexedFile(*entry) for entry in entries]
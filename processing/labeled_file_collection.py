@@ -1,5 +1,5 @@
 from pathlib import Path
-from typing import Dict, List, Iterator, Tuple
+from typing import Dict, List, Iterator, Optional, Tuple
 
 from collections import defaultdict
 
@@ -28,6 +28,10 @@ class LabeledFileCollection(FileCollection):
 
         return count
 
+    def length_hint(self) -> Optional[int]:
+        """ Returns the number of files, or None if it is not known yet """
+        return len(self)
+
     def __iter__(self) -> Iterator[Path]:
         """ Returns iterator to iterate over all files in the collection """
 
@@ -25,6 +25,10 @@ class LabeledFileContainer(FileContainer):
 
         return iterator()
 
+    def container(self, label: Label) -> FileContainer:
+        """ Returns the container associated with *label* """
+        return self._containers[label]
+
     def iter_by_label(self) -> Iterator[Tuple[Label, Path]]:
         """ Returns iterator to iterate over each file and its corresponding label """
 
@@ -0,0 +1,64 @@
+from typing import NamedTuple, Optional
+
+
+class FileStats(NamedTuple):
+    """ Statistics of loading a single data file """
+    path: str
+    size: int
+    rows: int
+    seconds: float
+
+
+class PrefetchStats(NamedTuple):
+    """ Statistics of reading data files ahead of loading them """
+    window: int
+    files: int
+    prefetched_files: int
+    prefetched_bytes: int
+    # Number of files that were still being read when the loader needed them, and the total
+    # time the loader waited for them
+    stalls: int
+    stall_seconds: float
+    # Number of files already read ahead each time the loader needed a file
+    mean_queue_depth: float
+    max_queue_depth: int
+
+
+class LoadListener:
+    """
+    Load listeners are notified as data files are loaded. They are used to monitor the
+    progress and performance of loading the data. All methods are called from the main
+    process, even if data files are loaded by worker processes.
+    """
+
+    def load_started(self, total: Optional[int]) -> None:
+        """
+        Called before loading the first data file.
+
+        :param total: number of data files to load, or None if it is not known in advance
+        """
+
+    def total_known(self, total: int) -> None:
+        """
+        Called once the number of data files to load becomes known, if it was not known when
+        loading started, which happens when data files are loaded while they are listed.
+
+        :param total: number of data files to load
+        """
+
+    def file_loaded(self, stats: FileStats) -> None:
+        """
+        Called after each data file is loaded.
+
+        :param stats: statistics of loading the data file
+        """
+
+    def prefetch_finished(self, stats: PrefetchStats) -> None:
+        """
+        Called after all data files are loaded, if they were read ahead.
+
+        :param stats: statistics of reading the data files ahead
+        """
+
+    def load_finished(self) -> None:
+        """ Called after all data files are loaded """
@@ -0,0 +1,203 @@
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+# Changing the schema of the index requires changing the version, which discards the index
+INDEX_VERSION = 3
+
+# Name of the index file in the cache directory
+INDEX_FILENAME = "manifest.sqlite"
+
+# Directories modified less than this many seconds before they are listed may still change
+# within the same modification time, if the file system has a coarse timestamp resolution
+_RACY_SECONDS = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS directories (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    mtime_ns INTEGER
+);
+CREATE TABLE IF NOT EXISTS files (
+    directory INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    is_dir INTEGER NOT NULL,
+    size INTEGER,
+    mtime_ns INTEGER,
+    PRIMARY KEY (directory, name)
+) WITHOUT ROWID;
+"""
+
+# Entry of a directory: its name, whether or not it is a sub-directory, and the size and
+# modification time (in nanoseconds) of files, which are None for sub-directories and for
+# files that could not be stat'ed
+Entry = Tuple[str, bool, Optional[int], Optional[int]]
+
+
+class ManifestIndex:
+    """
+    Persistent index of the entries of data directories, stored in a SQLite database. For each
+    directory, it records the name of each entry, whether or not it is a sub-directory, and
+    the size and modification time of each file, along with the modification time of the
+    directory itself. The sizes and modification times are handed to the loaders with the
+    files, so files taken from the index are never stat'ed again.
+
+    Creating, removing, or renaming an entry changes the modification time of its directory.
+    Thus, an indexed directory whose modification time is unchanged has the same entries, and
+    they are taken from the index, at the cost of a single stat of the directory, instead of
+    listing it again. Directories whose modification time changed are listed again, and their
+    entries replace those in the index. Directories modified right before being listed are not
+    trusted on the next run, since they may change again within the same modification time,
+    and neither are directories with files modified right before being listed, since these
+    may still be being written.
+
+    Modifying a file in place does not change the modification time of its directory. Thus,
+    the size and modification time of a file taken from the index are those of the last time
+    its directory was listed. Data files are expected to be written once, or replaced (which
+    changes the modification time of the directory), not modified in place.
+
+    Each entry is stored only with the id of its directory, so the path of each directory is
+    stored only once. The index is only a shortcut: if the database cannot be used, directories
+    are always listed.
+    """
+
+    def __init__(self, path: Path) -> None:
+        """
+        :param path: path to the SQLite database of the index
+        """
+        self._path = path
+        self._connection: Optional[sqlite3.Connection] = None
+        self._failed = False
+        # The connection is shared by the threads listing directories concurrently
+        self._lock = threading.Lock()
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    def entries(self, directory: str) -> List[Entry]:
+        """
+        Returns the entries of *directory*, taken from the index if the directory did not
+        change since it was indexed, or listed and indexed otherwise.
+
+        :raise OSError: if the directory cannot be listed
+        """
+        mtime_ns = os.stat(directory).st_mtime_ns
+        key = os.path.abspath(directory)
+
+        entries = self._lookup(key, mtime_ns)
+        if entries is not None:
+            return entries
+
+        listed_at = time.time_ns() if hasattr(time, 'time_ns') else int(time.time() * 1e9)
+        rows = []
+        latest_ns = mtime_ns
+        with os.scandir(directory) as iterator:
+            for entry in iterator:
+                if entry.is_dir(follow_symlinks=False):
+                    rows.append((entry.name, True, None, None))
+                    continue
+
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    # Such as a broken symbolic link: the file is stat'ed when it is loaded
+                    rows.append((entry.name, False, None, None))
+                    continue
+
+                rows.append((entry.name, False, stat.st_size, stat.st_mtime_ns))
+                latest_ns = max(latest_ns, stat.st_mtime_ns)
+
+        # A directory modified right before being listed, or with files modified right before,
+        # must be listed again next time
+        racy = listed_at - latest_ns < _RACY_SECONDS * 1_000_000_000
+        self._store(key, None if racy else mtime_ns, rows)
+
+        return rows
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def _lookup(self, key: str, mtime_ns: int) -> Optional[List[Entry]]:
+        with self._lock:
+            connection = self._connect()
+            if connection is None:
+                return None
+
+            try:
+                row = connection.execute("SELECT id, mtime_ns FROM directories WHERE path = ?",
+                                         (key,)).fetchone()
+                if row is None or row[1] != mtime_ns:
+                    return None
+
+                return [(name, bool(is_dir), size, mtime) for name, is_dir, size, mtime in
+                        connection.execute("SELECT name, is_dir, size, mtime_ns FROM files "
+                                           "WHERE directory = ?", (row[0],))]
+            except sqlite3.Error:
+                return None
+
+    def _store(self, key: str, mtime_ns: Optional[int], rows: List[Entry]) -> None:
+        with self._lock:
+            connection = self._connect()
+            if connection is None:
+                return
+
+            try:
+                with connection:
+                    connection.execute("INSERT OR IGNORE INTO directories (path) VALUES (?)",
+                                       (key,))
+                    connection.execute("UPDATE directories SET mtime_ns = ? WHERE path = ?",
+                                       (mtime_ns, key))
+                    directory_id = connection.execute(
+                        "SELECT id FROM directories WHERE path = ?", (key,)).fetchone()[0]
+
+                    # Sub-directories that were removed are no longer needed either
+                    removed = set(name for name, in connection.execute(
+                        "SELECT name FROM files WHERE directory = ? AND is_dir", (directory_id,)))
+                    removed.difference_update(row[0] for row in rows if row[1])
+                    self._remove_directories([os.path.join(key, name) for name in removed])
+
+                    connection.execute("DELETE FROM files WHERE directory = ?", (directory_id,))
+                    connection.executemany(
+                        "INSERT INTO files VALUES (?, ?, ?, ?, ?)",
+                        ((directory_id, name, int(is_dir), size, mtime)
+                         for name, is_dir, size, mtime in rows))
+            except sqlite3.Error:
+                # Failing to store the entries only means the directory is listed next time
+                pass
+
+    def _remove_directories(self, keys: List[str]) -> None:
+        for key in keys:
+            row = self._connection.execute("SELECT id FROM directories WHERE path = ?",
+                                           (key,)).fetchone()
+            if row is not None:
+                self._connection.execute("DELETE FROM files WHERE directory = ?", row)
+                self._connection.execute("DELETE FROM directories WHERE id = ?", row)
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        """ Opens the database on first use, returns None if it cannot be used """
+        if self._connection is not None or self._failed:
+            return self._connection
+
+        try:
+            self._path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(str(self._path), timeout=30, check_same_thread=False)
+            version = connection.execute("PRAGMA user_version").fetchone()[0]
+            if version != INDEX_VERSION:
+                with connection:
+                    connection.execute("DROP TABLE IF EXISTS files")
+                    connection.execute("DROP TABLE IF EXISTS directories")
+                    connection.execute(f"PRAGMA user_version = {INDEX_VERSION}")
+            connection.executescript(_SCHEMA)
+        except (OSError, sqlite3.Error):
+            self._failed = True
+            return None
+
+        self._connection = connection
+        return connection
@@ -0,0 +1,147 @@
+import hashlib
+import os
+import zipfile
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+from processing.utils import read_columns, open_binary, file_stat, file_id
+
+# Changing the format of the cache entries requires changing the version to invalidate all
+# entries stored using a previous format
+CACHE_VERSION = 1
+
+
+class ParseCache:
+    """
+    On-disk cache of the columns parsed from data files.
+
+    Each data file is identified by its path, size, and modification time, or, optionally, by
+    the hash of its content. The columns parsed from a data file are stored in a single binary
+    (.npz) file, which can be loaded much faster than parsing the original data file again.
+
+    The total size of the cache is bounded. When that size is exceeded, the least recently used
+    entries are evicted. A cache directory that cannot be written, such as a read-only cache
+    shared by multiple users, is only read from.
+    """
+
+    def __init__(self, directory: Path, max_size: int, content_hash: bool = False,
+                 rebuild: bool = False) -> None:
+        """
+        :param directory:    directory where the cache entries are stored
+        :param max_size:     maximum total size of the cache entries in bytes
+        :param content_hash: identify data files by the hash of their content
+        :param rebuild:      ignore existing entries and replace them with newly parsed data
+        """
+        self._directory = directory
+        self._max_size = max_size
+        self._content_hash = content_hash
+        self._rebuild = rebuild
+
+    @property
+    def directory(self) -> Path:
+        return self._directory
+
+    def read_columns(self, path: Path, columns: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Returns the specified columns of the data file at *path*. The columns are taken from
+        the cache when available. Otherwise, they are parsed from the data file and stored in
+        the cache. Columns cached before for the same data file are kept in the new entry.
+        """
+        entry = self._entry_path(path)
+
+        cached: Dict[str, np.ndarray] = {}
+        if not self._rebuild:
+            cached = self._load(entry)
+            if all(column in cached for column in columns):
+                # Update the entry's modification time to keep track of its last use. A cache
+                # that cannot be written, such as a shared read-only cache, is still read.
+                try:
+                    os.utime(entry)
+                except OSError:
+                    pass
+                return {column: cached[column] for column in columns}
+
+        wanted = list(columns) + [column for column in cached if column not in columns]
+        parsed = read_columns(path, wanted)
+        self._store(entry, parsed)
+
+        return {column: parsed[column] for column in columns}
+
+    def contains(self, path: Path) -> bool:
+        """
+        Checks whether or not the cache holds an entry for the data file at *path*, without
+        reading the data file. The entry may still lack some columns. Always returns False when
+        data files are identified by their content or when the cache is being rebuilt.
+        """
+        if self._content_hash or self._rebuild:
+            return False
+
+        return self._entry_path(path).is_file()
+
+    def trim(self) -> None:
+        """ Evicts the least recently used entries until the cache fits its maximum size """
+        entries = []
+        total_size = 0
+        for entry in self._directory.glob("*/*.npz"):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                # Another process evicted the entry
+                continue
+
+            entries.append((stat.st_mtime, stat.st_size, entry))
+            total_size += stat.st_size
+
+        entries.sort()
+        for _, size, entry in entries:
+            if total_size <= self._max_size:
+                break
+
+            try:
+                entry.unlink()
+            except OSError:
+                # Another process evicted the entry, or the cache cannot be written
+                pass
+            total_size -= size
+
+    def _entry_path(self, path: Path) -> Path:
+        key = hashlib.sha1(f"{CACHE_VERSION}".encode())
+        if self._content_hash:
+            with open_binary(path) as file:
+                for block in iter(lambda: file.read(1 << 20), b''):
+                    key.update(block)
+        else:
+            stat = file_stat(path)
+            key.update(f"{file_id(path)}\0{stat.st_size}\0{stat.st_mtime_ns}".encode())
+
+        digest = key.hexdigest()
+        return self._directory / digest[:2] / f"{digest}.npz"
+
+    @staticmethod
+    def _load(entry: Path) -> Dict[str, np.ndarray]:
+        try:
+            with np.load(str(entry)) as arrays:
+                return {column: arrays[column] for column in arrays.files}
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError, EOFError, zipfile.BadZipFile):
+            # A corrupted entry is the same as a missing entry: it will be replaced
+            return {}
+
+    @staticmethod
+    def _store(entry: Path, columns: Dict[str, np.ndarray]) -> None:
+        # Write to a temporary file first to ensure other processes never see partial entries
+        temporary = entry.with_name(f"{entry.name}.{os.getpid()}.tmp")
+        try:
+            entry.parent.mkdir(parents=True, exist_ok=True)
+            with open(temporary, 'wb') as file:
+                np.savez(file, **columns)
+            os.replace(temporary, entry)
+        except OSError:
+            # Failing to store an entry only means the file will be parsed again next time
+            try:
+                temporary.unlink()
+            except OSError:
+                pass
@@ -0,0 +1,117 @@
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+from processing.errors import ProcessingError
+from processing.shard import Shard
+from processing.types import Label
+
+# Changing the format of partial result files requires changing the version
+PARTIAL_VERSION = 3
+
+# Extension of partial result files
+PARTIAL_EXTENSION = ".json"
+
+
+def partial_path(output: str, shard: Shard) -> Path:
+    """ Returns the path of the partial result of *shard* for the output path *output* """
+    return Path(f"{output}.shard-{shard.index}-of-{shard.count}{PARTIAL_EXTENSION}")
+
+
+def write_partial(path: Path, tool: str, shard: Shard, datasets: Dict[Label, dict]) -> None:
+    """
+    Writes the partial result of a run over a single shard of the data files. Merging the
+    partial results of all shards yields the output of a single run over all data files.
+
+    A partial result file is a JSON file with a single object, holding the tool that wrote it,
+    the shard it covers, and an entry for each dataset, in the order the datasets were listed.
+    The entry of each dataset holds the number of data files of the dataset, in all shards,
+    under 'files', along with the results of the tool.
+
+    :param path:     path to the partial result file
+    :param tool:     name of the tool producing the partial result
+    :param shard:    shard of the data files covered by the partial result
+    :param datasets: dictionary mapping the label of each dataset to its entry
+    """
+    partial = {
+        "version": PARTIAL_VERSION,
+        "tool": tool,
+        "shard": [shard.index, shard.count],
+        "datasets": datasets,
+    }
+
+    # Write to a temporary file first to never leave a partial result file half written
+    temporary = path.with_name(path.name + ".tmp")
+    with open(temporary, 'w') as file:
+        json.dump(partial, file)
+    os.replace(temporary, path)
+
+
+def load_partials(paths: Sequence[Path]) -> List[dict]:
+    """
+    Loads the partial result files of all shards of a run, sorted by shard.
+
+    :raise ProcessingError: if a file cannot be read, or if the files were not written by the
+                            same tool or do not cover each shard exactly once
+    """
+    partials = []
+    for path in paths:
+        try:
+            with open(path) as file:
+                partial = json.load(file)
+        except OSError as error:
+            raise ProcessingError(f"failed to read partial result {path}: {error.strerror}")
+        except ValueError:
+            raise ProcessingError(f"invalid partial result: {path}")
+
+        if not isinstance(partial, dict) or partial.get("version") != PARTIAL_VERSION:
+            raise ProcessingError(f"unsupported partial result: {path}")
+
+        partial["path"] = str(path)
+        partials.append(partial)
+
+    if not partials:
+        raise ProcessingError("no partial results to merge")
+
+    tools = {partial["tool"] for partial in partials}
+    if len(tools) > 1:
+        raise ProcessingError(f"partial results of different tools: {', '.join(sorted(tools))}")
+
+    counts = {partial["shard"][1] for partial in partials}
+    if len(counts) > 1:
+        raise ProcessingError("partial results split the data files into different numbers of "
+                              f"shards: {', '.join(str(count) for count in sorted(counts))}")
+
+    count = counts.pop()
+    shards: Dict[int, str] = {}
+    for partial in partials:
+        index = partial["shard"][0]
+        if index in shards:
+            raise ProcessingError(f"shard {index}/{count} is in both {shards[index]} "
+                                  f"and {partial['path']}")
+        shards[index] = partial["path"]
+
+    missing = [str(Shard(index, count)) for index in range(1, count + 1) if index not in shards]
+    if missing:
+        raise ProcessingError(f"missing partial results of shards {', '.join(missing)}")
+
+    return sorted(partials, key=lambda partial: partial["shard"][0])
+
+
+def file_counts(partials: List[dict]) -> Dict[Label, int]:
+    """
+    Returns the number of data files of each dataset, in the order the datasets were listed.
+
+    :raise ProcessingError: if the partial results do not agree on the datasets or their
+                            number of data files, which happens when data files are added or
+                            removed while shards are processed
+    """
+    counts = {label: entry["files"] for label, entry in partials[0]["datasets"].items()}
+    for partial in partials[1:]:
+        other = {label: entry["files"] for label, entry in partial["datasets"].items()}
+        if other != counts:
+            raise ProcessingError(f"partial results {partials[0]['path']} and "
+                                  f"{partial['path']} were computed over different data files")
+
+    return counts
@@ -1,36 +1,165 @@
 from pathlib import Path
-from typing import NewType, Dict, Union, NamedTuple, List
+from typing import NewType, Dict, Union, NamedTuple, List, Sequence, Tuple
 
-import plotly.offline as plotly
-from plotly.exceptions import PlotlyDictKeyError
-from plotly.graph_objs import Scatter
+import numpy as np
 
 from processing.errors import ProcessingError
 
 TraceLine = NewType('TraceLine', Dict[str, Union[str, int]])
 
+# Name of the plotly.js file shared by multiple plots
+PLOTLYJS_FILENAME = "plotly.min.js"
+
+# Lowest maximum number of points of a decimated trace: the first, last, minimum and maximum
+# points are always kept
+MIN_MAX_POINTS = 4
+
 
 class TraceData(NamedTuple):
     label: str
-    x: List[int]
-    y: List[float]
+    x: Sequence[int]
+    y: Sequence[float]
+    # Lower and upper bounds of the confidence band of the trace, if it has one
+    low: Sequence[float] = None
+    high: Sequence[float] = None
 
 
 class Plotter:
+    """
+    Plots traces to an HTML file.
+
+    Traces are decimated before being plotted: points in the middle of a run of points with
+    the same y value are dropped, which does not change the plotted lines. Optionally, each
+    trace can be further reduced to a maximum number of points, keeping the first, last,
+    minimum and maximum points of each group of consecutive points.
 
-    def __init__(self, trace_lines: Dict[str, TraceLine], output: Path):
+    Traces may be rendered with WebGL, which handles many traces with many points better than
+    SVG. Traces with a confidence band are plotted over a shaded area between the bounds of
+    their band, which share the color of the trace if it is configured in its line. The
+    plotly.js library may be written to a separate file, shared by all plots in the
+    same directory, instead of being included in each HTML file.
+
+    Importing plotly takes longer than everything else the tools do for small datasets. Thus,
+    it is only imported when plotting.
+    """
+
+    def __init__(self, trace_lines: Dict[str, TraceLine], output: Path, webgl: bool = False,
+                 shared_plotlyjs: bool = False, max_points: int = None):
         self._trace_lines = trace_lines
         self._output_file = output
+        self._webgl = webgl
+        self._shared_plotlyjs = shared_plotlyjs
+        self._max_points = max_points
 
     def plot(self, traces: List[TraceData]):
-        scatters: List[Scatter] = []
+        import plotly.offline as plotly
+        from plotly.exceptions import PlotlyDictKeyError
+        from plotly.graph_objs import Scatter, Scattergl
+
+        scatter_type = Scattergl if self._webgl else Scatter
+
+        scatters = []
         for trace in traces:
+            x, y = decimate(np.asarray(trace.x), np.asarray(trace.y), self._max_points)
             try:
                 line = self._trace_lines.get(trace.label, {})
-                scatters.append(Scatter(x=trace.x, y=trace.y, name=trace.label, line=line))
+                if trace.low is not None and trace.high is not None:
+                    scatters.extend(self._band(scatter_type, trace, line))
+                scatters.append(scatter_type(x=x.tolist(), y=y.tolist(), name=trace.label,
+                                             line=line, legendgroup=trace.label))
             except PlotlyDictKeyError as e:
                 # Only the first line in the error message is relevant
                 error_code = str(e).splitlines()[0]
                 raise ProcessingError(f"trace configuration error: {error_code}")
 
-        plotly.plot(scatters, filename=str(self._output_file), auto_open=False)
+        if self._shared_plotlyjs:
+            self._plot_with_shared_plotlyjs(scatters)
+        else:
+            plotly.plot(scatters, filename=str(self._output_file), auto_open=False)
+
+    def _band(self, scatter_type, trace: TraceData, line: TraceLine) -> list:
+        """
+        Returns the scatters of the confidence band of *trace*: the upper bound followed by
+        the lower bound, which is filled up to the upper bound
+        """
+        band_line = {'width': 0}
+        if 'color' in line:
+            band_line['color'] = line['color']
+
+        scatters = []
+        for bound, fill in [(trace.high, 'none'), (trace.low, 'tonexty')]:
+            x, y = decimate(np.asarray(trace.x), np.asarray(bound), self._max_points)
+            scatters.append(scatter_type(x=x.tolist(), y=y.tolist(), name=trace.label,
+                                         line=band_line, fill=fill, opacity=0.3,
+                                         legendgroup=trace.label, showlegend=False,
+                                         hoverinfo='skip'))
+
+        return scatters
+
+    def _plot_with_shared_plotlyjs(self, scatters: list):
+        import plotly.offline as plotly
+        from plotly.offline.offline import get_plotlyjs
+
+        plotlyjs_path = self._output_file.parent / PLOTLYJS_FILENAME
+        plotlyjs = get_plotlyjs().encode('utf-8')
+        if not plotlyjs_path.is_file() or plotlyjs_path.stat().st_size != len(plotlyjs):
+            with open(plotlyjs_path, 'wb') as file:
+                file.write(plotlyjs)
+
+        div = plotly.plot(scatters, output_type='div', include_plotlyjs=False)
+        with open(self._output_file, 'w') as file:
+            file.write(''.join([
+                '<html>',
+                '<head><meta charset="utf-8" /></head>',
+                '<body>',
+                f'<script type="text/javascript" src="{PLOTLYJS_FILENAME}"></script>',
+                div,
+                '</body>',
+                '</html>'
+            ]))
+
+
+def decimate(x: np.ndarray, y: np.ndarray, max_points: int = None) \
+        -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Reduces the number of points of a trace, preserving its shape.
+
+    Points in the middle of a run of consecutive points with the same y value are dropped,
+    since the line through the first and last points of the run is the same. If the trace
+    still has more than *max_points* points, the points are split into groups of consecutive
+    points and only the first, last, minimum and maximum points of each group are kept.
+
+    :raise ValueError: if *max_points* is lower than MIN_MAX_POINTS
+    """
+    if max_points is not None and max_points < MIN_MAX_POINTS:
+        raise ValueError(f"traces cannot be reduced to less than {MIN_MAX_POINTS} points: "
+                         f"{max_points}")
+
+    count = min(len(x), len(y))
+    x, y = x[:count], y[:count]
+    if count <= 2:
+        return x, y
+
+    # Keep the first and last points of each run of points with the same y value
+    changes = y[1:] != y[:-1]
+    keep = np.ones(count, dtype=bool)
+    keep[1:-1] = changes[:-1] | changes[1:]
+    x, y = x[keep], y[keep]
+
+    if max_points is None or len(y) <= max_points:
+        return x, y
+
+    # Each group contributes up to 4 points
+    group_count = max(1, max_points // 4)
+    groups = np.arange(len(y)) * group_count // len(y)
+    group_starts = np.searchsorted(groups, np.arange(group_count))
+    group_ends = np.append(group_starts[1:], len(y)) - 1
+
+    # Sorting by group and then by y value places the minimum and maximum of each group at
+    # the start and end of the group
+    order = np.lexsort((y, groups))
+    indices = np.unique(np.concatenate([
+        group_starts, group_ends, order[group_starts], order[group_ends]
+    ]))
+
+    return x[indices], y[indices]
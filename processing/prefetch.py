@@ -0,0 +1,173 @@
+import io
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Iterator, Optional, Tuple
+
+from processing.compact_container import CompactMember
+from processing.load_listener import LoadListener, PrefetchStats
+from processing.types import Label
+from processing.utils import file_id, file_stat, open_binary
+
+
+class PrefetchedFile:
+    """
+    A data file whose content was read ahead into memory. It provides the subset of the
+    interface of Path used by the data loaders, reading from memory. Its string form is the
+    identifier of the original file (see file_id()), so it is cached like the original file.
+    """
+
+    __slots__ = "_id", "_name", "_data", "_stat"
+
+    def __init__(self, path, data: bytes, stat) -> None:
+        """
+        :param path: path to the original data file, or an archive member
+        :param data: content of the data file
+        :param stat: stat result of the data file
+        """
+        self._id = file_id(path)
+        self._name = path.name
+        self._data = data
+        self._stat = stat
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    def open(self, mode: str = 'rb') -> io.BytesIO:
+        """ Opens the content of the file for reading. Only binary mode is supported. """
+        if mode != 'rb':
+            raise ValueError(f"prefetched files can only be opened in 'rb' mode, not '{mode}'")
+
+        return io.BytesIO(self._data)
+
+    def stat(self):
+        return self._stat
+
+    def __str__(self) -> str:
+        return self._id
+
+    def __repr__(self) -> str:
+        return f"PrefetchedFile({self._id!r})"
+
+
+class Prefetcher:
+    """
+    Reads the next data files ahead, in a pool of threads, while the current data file is
+    loaded. This overlaps the latency of opening and reading files, which is high on network
+    file systems, with parsing.
+
+    At most *window* files are read ahead at any time, which bounds the memory holding their
+    content. The prefetcher records how often, and for how long, the loader had to wait for a
+    file that was not read yet (a stall), and how many files were ready each time.
+    """
+
+    def __init__(self, window: int, skip: Callable[[Any], bool] = None) -> None:
+        """
+        :param window: maximum number of files read ahead
+        :param skip:   predicate telling which files do not need to be read, such as files
+                       whose data is found in the parse cache
+        """
+        self.window = window
+        self._skip = skip
+        self._files = 0
+        self._prefetched_files = 0
+        self._prefetched_bytes = 0
+        self._stalls = 0
+        self._stall_seconds = 0.0
+        self._total_depth = 0
+        self._max_depth = 0
+
+    def prefetch(self, labeled_files: Iterator[Tuple[Label, Any]]) \
+            -> Iterator[Tuple[Label, Any]]:
+        """
+        Yields each file in *labeled_files*, in the same order, along with its label. Files are
+        replaced with prefetched files holding their content, except for the files that are
+        skipped, which are yielded unchanged.
+        """
+        labeled_files = iter(labeled_files)
+        queue: Deque[Tuple[Label, Future]] = deque()
+
+        with ThreadPoolExecutor(max_workers=self.window) as executor:
+            def fill() -> None:
+                while len(queue) < self.window:
+                    try:
+                        label, file = next(labeled_files)
+                    except StopIteration:
+                        return
+                    if isinstance(file, CompactMember):
+                        # Members of compacted datasets are already in memory
+                        future = Future()
+                        future.set_result(file)
+                    else:
+                        future = executor.submit(self._read, file)
+                    queue.append((label, future))
+
+            fill()
+            while queue:
+                label, future = queue.popleft()
+
+                depth = int(future.done()) + sum(1 for _, other in queue if other.done())
+                self._files += 1
+                self._total_depth += depth
+                self._max_depth = max(self._max_depth, depth)
+
+                if not future.done():
+                    self._stalls += 1
+                    start = time.perf_counter()
+                    file = future.result()
+                    self._stall_seconds += time.perf_counter() - start
+                else:
+                    file = future.result()
+
+                if isinstance(file, PrefetchedFile):
+                    self._prefetched_files += 1
+                    self._prefetched_bytes += file.stat().st_size
+
+                # Start reading the next file before this one is loaded
+                fill()
+                yield label, file
+
+    def _read(self, file):
+        if self._skip and self._skip(file):
+            return file
+
+        stat = file_stat(file)
+        with open_binary(file) as raw:
+            data = raw.read()
+
+        return PrefetchedFile(file, data, stat)
+
+    def stats(self) -> PrefetchStats:
+        """ Returns the statistics of all files prefetched so far """
+        return PrefetchStats(
+            window=self.window,
+            files=self._files,
+            prefetched_files=self._prefetched_files,
+            prefetched_bytes=self._prefetched_bytes,
+            stalls=self._stalls,
+            stall_seconds=self._stall_seconds,
+            mean_queue_depth=self._total_depth / self._files if self._files else 0.0,
+            max_queue_depth=self._max_depth,
+        )
+
+
+class PrefetchSummary(LoadListener):
+    """ Prints a summary of the statistics of reading data files ahead, once they are loaded """
+
+    def __init__(self) -> None:
+        self._stats: Optional[PrefetchStats] = None
+
+    def prefetch_finished(self, stats: PrefetchStats) -> None:
+        self._stats = stats
+
+    def load_finished(self) -> None:
+        # Printed last, after the progress line is done
+        stats = self._stats
+        if stats is None:
+            return
+
+        self._stats = None
+        print(f"Read ahead {stats.prefetched_files} of {stats.files} data files "
+              f"(window of {stats.window}): waited {stats.stall_seconds:.2f} s for "
+              f"{stats.stalls} files, {stats.mean_queue_depth:.1f} files ready on average")
@@ -0,0 +1,119 @@
+import heapq
+import json
+import resource
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from processing.load_listener import FileStats, LoadListener, PrefetchStats
+
+
+class Profiler(LoadListener):
+    """
+    Records a profile of a run: the wall and CPU time taken by each stage, the number of files,
+    bytes and rows loaded, the peak memory, and the data files that took the longest to load.
+    If data files are read ahead, it also records the statistics of prefetching them.
+
+    CPU time includes the time of worker processes that finished during the stage. Stages run
+    in the background, such as listing data files while they are loaded, overlap other stages
+    and only record their wall time.
+    """
+
+    def __init__(self, output: Path, slowest_count: int = 10) -> None:
+        """
+        :param output:        path to the JSON report
+        :param slowest_count: number of slowest data files included in the report
+        """
+        self._output = output
+        self._slowest_count = slowest_count
+        self._stages: Dict[str, Dict[str, float]] = {}
+        self._files = 0
+        self._bytes = 0
+        self._rows = 0
+        self._slowest: List[tuple] = []
+        self._prefetch: Optional[PrefetchStats] = None
+
+    @contextmanager
+    def stage(self, name: str):
+        """ Context manager that records the wall and CPU time of the stage *name* """
+        start_wall = time.perf_counter()
+        start_cpu = _cpu_time()
+        try:
+            yield
+        finally:
+            stage = self._stages.setdefault(name, {"wall_time": 0.0, "cpu_time": 0.0})
+            stage["wall_time"] += time.perf_counter() - start_wall
+            stage["cpu_time"] += _cpu_time() - start_cpu
+
+    def record(self, name: str, wall_time: float) -> None:
+        """ Records the wall time of the stage *name*, which ran in the background """
+        stage = self._stages.setdefault(name, {"wall_time": 0.0})
+        stage["wall_time"] += wall_time
+
+    def file_loaded(self, stats: FileStats) -> None:
+        self._files += 1
+        self._bytes += stats.size
+        self._rows += stats.rows
+
+        # Keep the slowest files in a min-heap
+        entry = (stats.seconds, stats.path, stats.size, stats.rows)
+        if len(self._slowest) < self._slowest_count:
+            heapq.heappush(self._slowest, entry)
+        elif self._slowest and entry > self._slowest[0]:
+            heapq.heapreplace(self._slowest, entry)
+
+    def prefetch_finished(self, stats: PrefetchStats) -> None:
+        self._prefetch = stats
+
+    def report(self) -> dict:
+        """ Returns the profile as a dictionary """
+        report = {
+            "stages": self._stages,
+            "files": self._files,
+            "bytes": self._bytes,
+            "rows": self._rows,
+            "peak_rss_mb": {
+                "main": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+                "workers": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+            },
+            "slowest_files": [
+                {"path": path, "seconds": seconds, "bytes": size, "rows": rows}
+                for seconds, path, size, rows in sorted(self._slowest, reverse=True)
+            ]
+        }
+
+        load_time = self._stages.get("load", {}).get("wall_time")
+        if load_time:
+            report["load_throughput"] = {
+                "files_per_second": self._files / load_time,
+                "bytes_per_second": self._bytes / load_time,
+                "rows_per_second": self._rows / load_time,
+            }
+
+        if self._prefetch:
+            report["prefetch"] = self._prefetch._asdict()
+
+        return report
+
+    def save(self) -> None:
+        """ Writes the report to the output file """
+        with open(self._output, 'w') as file:
+            json.dump(self.report(), file, indent=4)
+
+
+@contextmanager
+def profile(profiler: Optional[Profiler], stage: str):
+    """ Records the stage *stage* with *profiler*, if it is not None """
+    if profiler is None:
+        yield
+    else:
+        with profiler.stage(stage):
+            yield
+
+
+def _cpu_time() -> float:
+    """ Returns the CPU time used by this process and all of its terminated children """
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
@@ -0,0 +1,72 @@
+import sys
+import time
+from typing import Optional, TextIO
+
+from processing.load_listener import FileStats, LoadListener
+
+
+class ProgressLine(LoadListener):
+    """
+    Shows a progress line while data files are loaded. The line includes the number of files
+    loaded so far, the throughput, and the estimated time to finish, and it is rewritten in
+    place at most a few times per second.
+    """
+
+    def __init__(self, stream: TextIO = None, interval: float = 0.25) -> None:
+        """
+        :param stream:   stream to write the line to, by default stderr
+        :param interval: minimum time (in seconds) between updates of the line
+        """
+        self._stream = stream or sys.stderr
+        self._interval = interval
+        self._total: Optional[int] = None
+        self._files = 0
+        self._bytes = 0
+        self._start = 0.0
+        self._last_update = 0.0
+
+    def load_started(self, total: Optional[int]) -> None:
+        self._total = total
+        self._files = 0
+        self._bytes = 0
+        self._start = time.perf_counter()
+        self._last_update = 0.0
+
+    def total_known(self, total: int) -> None:
+        self._total = total
+
+    def file_loaded(self, stats: FileStats) -> None:
+        self._files += 1
+        self._bytes += stats.size
+
+        now = time.perf_counter()
+        if now - self._last_update >= self._interval:
+            self._last_update = now
+            self._write(now)
+
+    def load_finished(self) -> None:
+        self._write(time.perf_counter())
+        self._stream.write("\n")
+        self._stream.flush()
+
+    def _write(self, now: float) -> None:
+        elapsed = max(now - self._start, 1e-9)
+        rate = self._files / elapsed
+        line = f"{self._files}"
+        if self._total is not None:
+            line += f"/{self._total} files ({100 * self._files / max(self._total, 1):.0f}%)"
+        else:
+            line += " files"
+
+        line += f", {rate:.0f} files/s, {self._bytes / elapsed / 2 ** 20:.1f} MB/s"
+        if self._total is not None and rate > 0:
+            line += f", ETA {_format_duration((self._total - self._files) / rate)}"
+
+        self._stream.write(f"\r{line}\033[K")
+        self._stream.flush()
+
+
+def _format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:d}:{minutes:02d}:{seconds:02d}"
@@ -0,0 +1,178 @@
+import math
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from processing.accumulator import Accumulator
+
+# Number of values added to a sketch at once, which bounds the memory used to add many values
+_UPDATE_CHUNK_SIZE = 1 << 16
+
+
+class QuantileSketch(Accumulator):
+    """
+    Mergeable streaming sketch of the quantiles of a set of integer values, based on the KLL
+    sketch (Karnin, Lang, and Liberty, "Optimal Quantile Approximation in Streams", 2016).
+
+    Values are kept in a hierarchy of compactors: each value at level h stands for 2^h of the
+    original values. When the sketch grows beyond its capacity, a full level is sorted and
+    every other value is promoted to the next level, halving its size. The memory used is
+    proportional to *k*, regardless of the number of values, and the rank error decreases
+    with *k*. Until the first compaction, all values are kept and quantiles are exact.
+
+    Compactors alternate between promoting the values at even and odd positions, instead of
+    choosing at random, so the same sequence of updates and merges always yields the same
+    sketch. The number of values and the maximum are always exact.
+    """
+    __slots__ = "k", "count", "maximum", "_levels", "_offsets", "_size"
+
+    # Default size parameter, for a rank error below 1% of the number of values
+    DEFAULT_K = 400
+
+    def __init__(self, k: int = DEFAULT_K) -> None:
+        """
+        :param k: size parameter of the sketch, larger sizes are more accurate
+        """
+        self.k = k
+        self.count = 0
+        self.maximum: Optional[int] = None
+        self._levels: List[np.ndarray] = [np.empty(0, dtype=np.int64)]
+        self._offsets: List[int] = [0]
+        # Number of values kept in all levels
+        self._size = 0
+
+    @staticmethod
+    def of(values: np.ndarray, k: int = DEFAULT_K) -> 'QuantileSketch':
+        """ Creates the sketch of an array of integer values """
+        sketch = QuantileSketch(k)
+        sketch.update(values)
+        return sketch
+
+    def update(self, values: np.ndarray) -> None:
+        """ Adds an array of integer values to the sketch """
+        if len(values) == 0:
+            return
+
+        values = values.astype(np.int64, copy=False)
+        maximum = int(values.max())
+        self.maximum = maximum if self.maximum is None else max(self.maximum, maximum)
+        self.count += len(values)
+
+        for start in range(0, len(values), _UPDATE_CHUNK_SIZE):
+            chunk = values[start:start + _UPDATE_CHUNK_SIZE]
+            self._levels[0] = np.concatenate((self._levels[0], chunk))
+            self._size += len(chunk)
+            self._compress()
+
+    def merge(self, other: 'QuantileSketch') -> None:
+        """ Merges the values summarized by *other* into this sketch """
+        if other.count == 0:
+            return
+
+        while len(self._levels) < len(other._levels):
+            self._levels.append(np.empty(0, dtype=np.int64))
+            self._offsets.append(0)
+
+        for level, values in enumerate(other._levels):
+            self._levels[level] = np.concatenate((self._levels[level], values))
+
+        self.count += other.count
+        self._size += other._size
+        self.maximum = other.maximum if self.maximum is None else max(self.maximum, other.maximum)
+        self._compress()
+
+    def quantile(self, q: float) -> float:
+        """
+        Returns an estimate of the *q*-quantile of the values, following the nearest-rank
+        definition: the smallest value such that at least a fraction *q* of the values are
+        smaller than or equal to it. Returns NaN if there are no values.
+        """
+        if self.count == 0:
+            return float('nan')
+
+        values = np.concatenate(self._levels)
+        weights = np.concatenate([np.full(len(level), 2 ** height, dtype=np.int64)
+                                  for height, level in enumerate(self._levels)])
+
+        order = np.argsort(values, kind='stable')
+        ranks = np.cumsum(weights[order])
+        index = np.searchsorted(ranks, nearest_rank(q, self.count))
+        return int(values[order[min(index, len(order) - 1)]])
+
+    def _compress(self) -> None:
+        capacities, total_capacity = _capacities(self.k, len(self._levels))
+        while self._size > total_capacity:
+            height = next(height for height, level in enumerate(self._levels)
+                          if len(level) >= capacities[height])
+            self._compact(height)
+            capacities, total_capacity = _capacities(self.k, len(self._levels))
+
+    def _compact(self, height: int) -> None:
+        """ Promotes every other value of a level to the next level """
+        values = np.sort(self._levels[height])
+
+        # With an odd number of values, one of them stays at the same level
+        leftover = values[:len(values) % 2]
+        values = values[len(values) % 2:]
+
+        if height + 1 == len(self._levels):
+            self._levels.append(np.empty(0, dtype=np.int64))
+            self._offsets.append(0)
+
+        offset = self._offsets[height]
+        self._levels[height + 1] = np.concatenate((self._levels[height + 1], values[offset::2]))
+        self._levels[height] = leftover
+        self._offsets[height] = 1 - offset
+        self._size -= len(values) // 2
+
+    def to_list(self) -> list:
+        """ Returns a list representation of the sketch, which can be stored as JSON """
+        return [self.k, self.count, self.maximum, list(self._offsets),
+                [level.tolist() for level in self._levels]]
+
+    @staticmethod
+    def from_list(values: list) -> 'QuantileSketch':
+        """ Creates a sketch from a list obtained with to_list() """
+        k, count, maximum, offsets, levels = values
+        sketch = QuantileSketch(k)
+        sketch.count = count
+        sketch.maximum = maximum
+        sketch._offsets = list(offsets)
+        sketch._levels = [np.array(level, dtype=np.int64) for level in levels]
+        sketch._size = sum(len(level) for level in sketch._levels)
+        return sketch
+
+    def __repr__(self) -> str:
+        return f"QuantileSketch(k={self.k}, count={self.count}, maximum={self.maximum})"
+
+
+@lru_cache(maxsize=None)
+def _capacities(k: int, depth: int) -> Tuple[Tuple[int, ...], int]:
+    """
+    Returns the capacity of each level of a sketch with *depth* levels, and their sum. Lower
+    levels have geometrically smaller capacities than the top level.
+    """
+    capacities = tuple(max(2, int(math.ceil(k * (2 / 3) ** (depth - 1 - height))))
+                       for height in range(depth))
+    return capacities, sum(capacities)
+
+
+def nearest_rank(q: float, count: int) -> int:
+    """
+    Returns the rank (starting at 1) of the *q*-quantile of *count* values, following the
+    nearest-rank definition.
+    """
+    # The tolerance avoids rounding up ranks that are integers up to floating point errors
+    return min(count, max(1, int(math.ceil(q * count - 1e-9))))
+
+
+def exact_quantile(sorted_values: np.ndarray, q: float) -> float:
+    """
+    Returns the exact *q*-quantile of an array of sorted values, following the same nearest-rank
+    definition as QuantileSketch.quantile(). Returns NaN if the array is empty.
+    """
+    if len(sorted_values) == 0:
+        return float('nan')
+
+    return int(sorted_values[nearest_rank(q, len(sorted_values)) - 1])
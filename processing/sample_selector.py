@@ -0,0 +1,82 @@
+import hashlib
+import heapq
+import math
+from itertools import groupby
+from operator import itemgetter
+from pathlib import Path
+from typing import Dict, Iterator, Tuple, Union
+
+from processing.errors import ProcessingError
+from processing.file_container import FileContainer
+from processing.file_selector import FileSelector
+from processing.labeled_file_collection import LabeledFileCollection
+from processing.labeled_file_container import LabeledFileContainer
+from processing.streaming_file_collection import StreamingFileCollection
+from processing.types import Label
+from processing.utils import relative_path
+
+
+class SampleFileSelector(FileSelector):
+    """
+    Selects a simple random sample of the data files of each dataset, among the files selected
+    by another selector. The size of the sample is either a fraction of the data files of each
+    dataset (a float) or a number of data files (an integer).
+
+    The sample is reproducible: each data file is ranked by a hash of its path relative to its
+    data directory, keyed with the seed, and the files with the lowest ranks are selected. The
+    same seed selects the same data files on every run, independently of the order they are
+    listed in, and a larger sample includes all data files of a smaller sample with the same
+    seed. Selected files keep the order they are listed in.
+
+    All data files of a dataset are listed before its sample is selected. The number of data
+    files of each dataset, which estimates need to extrapolate from the sample, is recorded in
+    *file_counts* before any data file of the dataset is selected.
+    """
+
+    def __init__(self, selector: FileSelector, size: Union[int, float], seed: int = 0) -> None:
+        """
+        :param selector: selector of all data files
+        :param size:     fraction of the data files of each dataset, between 0 and 1, or number
+                         of data files of each dataset to select
+        :param seed:     seed of the random sample
+        """
+        self.selector = selector
+        self.size = size
+        self.seed = seed
+        # Number of data files of each dataset, including the data files not selected
+        self.file_counts: Dict[Label, int] = {}
+
+    def select(self, container: FileContainer) -> LabeledFileCollection:
+        files = self.selector.select(container)
+        if not isinstance(container, LabeledFileContainer) or \
+                not isinstance(files, LabeledFileCollection):
+            raise ProcessingError("only datasets with labeled data files can be sampled")
+
+        return StreamingFileCollection(self._sample(container, files.iter_by_label()))
+
+    def sample_size(self, count: int) -> int:
+        """ Returns the number of data files selected from a dataset with *count* data files """
+        if isinstance(self.size, float):
+            return min(count, max(1, math.ceil(self.size * count)))
+
+        return min(count, self.size)
+
+    def _sample(self, container: LabeledFileContainer,
+                labeled_files: Iterator[Tuple[Label, Path]]) -> Iterator[Tuple[Label, Path]]:
+        for label, group in groupby(labeled_files, key=itemgetter(0)):
+            files = [file for _, file in group]
+            self.file_counts[label] = len(files)
+
+            directory = container.container(label).path
+            ranks = [self._rank(relative_path(file, directory)) for file in files]
+            selected = set(heapq.nsmallest(self.sample_size(len(files)), range(len(files)),
+                                           key=ranks.__getitem__))
+
+            for index, file in enumerate(files):
+                if index in selected:
+                    yield label, file
+
+    def _rank(self, path: str) -> int:
+        digest = hashlib.blake2b(path.encode(), digest_size=8,
+                                 key=str(self.seed).encode()).digest()
+        return int.from_bytes(digest, 'big')
@@ -0,0 +1,67 @@
+import os
+from fnmatch import fnmatchcase
+from pathlib import Path
+from typing import Callable, Iterator, List, Tuple
+
+from processing.directory import Directory
+
+
+class ScanDirectory(Directory):
+    """
+    File container based on a single directory, which is listed with os.scandir(). Files are
+    matched against the pattern while the directory is being listed, without any additional
+    system calls for each file, and they are returned sorted by directory and then by name.
+    Estimated percentiles depend on the order data files are loaded in, so every copy of a
+    directory, on any file system, must list its files in the same order.
+
+    Optionally, the files in all nested sub-directories are included as well.
+    """
+
+    def __init__(self, directory: Path, recursive: bool = False) -> None:
+        super().__init__(directory)
+        self._recursive = recursive
+
+    @property
+    def recursive(self) -> bool:
+        return self._recursive
+
+    def __iter__(self) -> Iterator[Path]:
+        return iter(self._scan(lambda name: True))
+
+    def glob(self, pattern: str) -> Iterator[Path]:
+        return iter(self._scan(name_matcher(pattern)))
+
+    def _scan(self, matches: Callable[[str], bool]) -> List[Path]:
+        files: List[Tuple[str, str]] = []
+        directories = [str(self._path)]
+        while directories:
+            directory = directories.pop()
+            with os.scandir(directory) as iterator:
+                for entry in iterator:
+                    if matches(entry.name):
+                        files.append((directory, entry.name))
+
+                    if self._recursive and entry.is_dir(follow_symlinks=False):
+                        directories.append(entry.path)
+
+        files.sort()
+        return [Path(directory, name) for directory, name in files]
+
+
+def name_matcher(pattern: str) -> Callable[[str], bool]:
+    """
+    Returns a function that checks whether or not a file name matches a glob *pattern*.
+    Patterns of the form '*<suffix>' and '*<infix>*', which are the most common, are matched
+    by looking for the suffix or infix in the name, which is faster than matching the full
+    pattern.
+    """
+    suffix = pattern[1:]
+    if pattern.startswith('*') and not any(char in suffix for char in '*?['):
+        return lambda name: name.endswith(suffix)
+
+    infix = pattern[1:-1]
+    if len(pattern) > 1 and pattern.startswith('*') and pattern.endswith('*') \
+            and not any(char in infix for char in '*?['):
+        return lambda name: infix in name
+
+    return lambda name: fnmatchcase(name, pattern)
@@ -0,0 +1,50 @@
+import re
+import zlib
+from pathlib import Path
+from typing import NamedTuple
+
+from processing.utils import relative_path
+
+# Format of the specification of a shard, such as "2/8"
+_SHARD_PATTERN = re.compile(r"^(\d+)/(\d+)$")
+
+
+class Shard(NamedTuple):
+    """
+    One of *count* disjoint subsets of the data files of each dataset, numbered from 1 to
+    *count*. Each data file belongs to a single shard, chosen by a checksum of its path relative
+    to its data directory. Thus, the shard of a data file is the same on any machine, on any
+    copy of the data, and on any run, regardless of the order the data files are listed in, and
+    processing every shard of a dataset processes each of its data files exactly once.
+    """
+    index: int
+    count: int
+
+    @staticmethod
+    def parse(text: str) -> 'Shard':
+        """
+        Parses the specification of a shard of the form 'i/N', where 1 <= i <= N.
+
+        :raise ValueError: if *text* is not a valid specification
+        """
+        match = _SHARD_PATTERN.match(text.strip())
+        if not match:
+            raise ValueError(f"shard must be of the form i/N: {text}")
+
+        index, count = int(match.group(1)), int(match.group(2))
+        if not 1 <= index <= count:
+            raise ValueError(f"shard index must be between 1 and {count}: {text}")
+
+        return Shard(index, count)
+
+    def contains(self, file, directory: Path) -> bool:
+        """
+        Checks whether or not *file* (a path or data file) belongs to this shard.
+
+        :param file:      data file
+        :param directory: path of the data directory (or archive) the data file is in
+        """
+        return zlib.crc32(relative_path(file, directory).encode()) % self.count == self.index - 1
+
+    def __str__(self) -> str:
+        return f"{self.index}/{self.count}"
@@ -0,0 +1,50 @@
+from pathlib import Path
+from typing import Dict, Iterator, Tuple
+
+from processing.errors import ProcessingError
+from processing.file_container import FileContainer
+from processing.file_selector import FileSelector
+from processing.labeled_file_collection import LabeledFileCollection
+from processing.labeled_file_container import LabeledFileContainer
+from processing.shard import Shard
+from processing.streaming_file_collection import StreamingFileCollection
+from processing.types import Label
+
+
+class ShardFileSelector(FileSelector):
+    """
+    Selects the data files of a single shard, among the files selected by another selector.
+    The shard of each data file depends only on its path relative to its data directory, so
+    every node selects the same data files for a shard, whatever order it lists them in.
+
+    All files of each dataset are still listed, to record the number of data files of each
+    dataset. These are stored in partial results, to check that the partial results of all
+    shards cover the same data files. They are only complete once the returned collection is
+    iterated to the end.
+    """
+
+    def __init__(self, selector: FileSelector, shard: Shard) -> None:
+        """
+        :param selector: selector of all data files
+        :param shard:    shard of the data files to select
+        """
+        self.selector = selector
+        self.shard = shard
+        # Number of data files of each dataset, in all shards, in the order they are listed
+        self.file_counts: Dict[Label, int] = {}
+
+    def select(self, container: FileContainer) -> LabeledFileCollection:
+        files = self.selector.select(container)
+        if not isinstance(container, LabeledFileContainer) or \
+                not isinstance(files, LabeledFileCollection):
+            raise ProcessingError("only datasets with labeled data files can be sharded")
+
+        return StreamingFileCollection(self._filter(container, files.iter_by_label()))
+
+    def _filter(self, container: LabeledFileContainer,
+                labeled_files: Iterator[Tuple[Label, Path]]) -> Iterator[Tuple[Label, Path]]:
+        for label, file in labeled_files:
+            self.file_counts[label] = self.file_counts.get(label, 0) + 1
+
+            if self.shard.contains(file, container.container(label).path):
+                yield label, file
@@ -0,0 +1,160 @@
+import math
+from typing import List, Tuple
+
+import numpy as np
+
+from processing.accumulator import Accumulator
+
+# Maximum value of a 64-bit integer
+_INT64_MAX = 2 ** 63 - 1
+
+# Quantile of the standard normal distribution for 95% confidence intervals
+Z_95 = 1.959963984540054
+
+
+class RunningStats(Accumulator):
+    """
+    Mergeable statistics of a set of integer values. It keeps the number of values, their sum,
+    and the sum of their squares. Both sums are kept as exact integers. Thus, merging the
+    statistics of multiple sets of values yields exactly the same statistics as computing them
+    over the union of those sets, in any order, and the variance does not suffer from the
+    cancellation errors of floating point arithmetic.
+    """
+    __slots__ = "count", "total", "total_squares"
+
+    def __init__(self, count: int = 0, total: int = 0, total_squares: int = 0) -> None:
+        self.count = count
+        self.total = total
+        self.total_squares = total_squares
+
+    @staticmethod
+    def of(values: np.ndarray) -> 'RunningStats':
+        """ Computes the statistics of an array of integer values """
+        return RunningStats(count=len(values), total=int(values.sum()),
+                            total_squares=_sum_of_squares(values))
+
+    def merge(self, other: 'RunningStats') -> None:
+        """ Merges the statistics of *other* into these statistics """
+        self.count += other.count
+        self.total += other.total
+        self.total_squares += other.total_squares
+
+    @property
+    def mean(self) -> float:
+        """ Average of the values, or NaN if there are no values """
+        if self.count == 0:
+            return float('nan')
+
+        return self.total / self.count
+
+    @property
+    def std(self) -> float:
+        """ Sample standard deviation of the values, or NaN if there are less than 2 values """
+        if self.count < 2:
+            return float('nan')
+
+        # The variance is computed with exact integer arithmetic and rounded only once
+        numerator = self.count * self.total_squares - self.total * self.total
+        return math.sqrt(numerator / (self.count * (self.count - 1)))
+
+    def to_list(self) -> List[int]:
+        """ Returns a list representation of the statistics, which can be stored as JSON """
+        return [self.count, self.total, self.total_squares]
+
+    @staticmethod
+    def from_list(values: List[int]) -> 'RunningStats':
+        """ Creates the statistics from a list obtained with to_list() """
+        count, total, total_squares = values
+        return RunningStats(count, total, total_squares)
+
+    def __repr__(self) -> str:
+        return f"RunningStats(count={self.count}, total={self.total}, " \
+               f"total_squares={self.total_squares})"
+
+
+def proportion_interval(proportions: np.ndarray, sample_size: int, population: int,
+                        z: float = Z_95) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Computes the Wilson score confidence interval of each proportion in *proportions*, each
+    estimated from the same simple random sample, drawn without replacement from a finite
+    population. Unlike the normal approximation, the interval stays within [0, 1] and does
+    not collapse for proportions close to 0 or 1, such as those in the tail of a distribution.
+
+    :param proportions: proportions observed in the sample
+    :param sample_size: number of units in the sample
+    :param population:  number of units in the population
+    :param z:           quantile of the standard normal distribution for the confidence level
+    :return: the lower and upper bounds of the interval of each proportion
+    """
+    proportions = np.asarray(proportions, dtype=float)
+    correction = _finite_population_correction(sample_size, population)
+    if sample_size == 0:
+        return np.zeros_like(proportions), np.ones_like(proportions)
+    if correction == 0:
+        return proportions.copy(), proportions.copy()
+
+    # The finite population correction shrinks the variance as would a larger sample
+    n = sample_size / correction
+    denominator = 1 + z * z / n
+    center = (proportions + z * z / (2 * n)) / denominator
+    half_width = z / denominator * np.sqrt(proportions * (1 - proportions) / n +
+                                           z * z / (4 * n * n))
+
+    return np.clip(center - half_width, 0, 1), np.clip(center + half_width, 0, 1)
+
+
+def ratio_interval(totals: np.ndarray, counts: np.ndarray, population: int,
+                   z: float = Z_95) -> Tuple[float, float]:
+    """
+    Computes the confidence interval of the ratio sum(totals) / sum(counts) estimated from a
+    simple random sample of clusters, drawn without replacement from a finite population of
+    clusters, such as the mean of the values of all samples estimated from a sample of
+    destinations. The variance of the ratio is estimated by linearization, which accounts for
+    the correlation between values of the same cluster.
+
+    :param totals:     sum of the values of each sampled cluster
+    :param counts:     number of values of each sampled cluster
+    :param population: number of clusters in the population
+    :param z:          quantile of the standard normal distribution for the confidence level
+    :return: the lower and upper bounds of the interval, NaN if it cannot be estimated
+    """
+    sample_size = len(counts)
+    count_sum = int(np.sum(counts))
+    if sample_size < 2 or count_sum == 0:
+        return float('nan'), float('nan')
+
+    ratio = float(np.sum(totals)) / count_sum
+    residuals = np.asarray(totals, dtype=float) - ratio * np.asarray(counts, dtype=float)
+    mean_count = count_sum / sample_size
+    variance = _finite_population_correction(sample_size, population) * \
+        float(np.dot(residuals, residuals)) / (sample_size - 1) / \
+        (sample_size * mean_count * mean_count)
+
+    half_width = z * math.sqrt(variance)
+    return ratio - half_width, ratio + half_width
+
+
+def _finite_population_correction(sample_size: int, population: int) -> float:
+    """ Returns the factor by which sampling without replacement reduces the variance """
+    if population <= 1:
+        return 0.0
+
+    return max(0.0, (population - sample_size) / (population - 1))
+
+
+def _sum_of_squares(values: np.ndarray) -> int:
+    """
+    Computes the exact sum of the squares of an array of integer values. The values are summed
+    in chunks small enough to ensure the sum of each chunk fits in a 64-bit integer.
+    """
+    if len(values) == 0:
+        return 0
+
+    max_square = int(np.abs(values).max()) ** 2
+    if max_square > _INT64_MAX:
+        return sum(int(value) ** 2 for value in values)
+
+    chunk_size = _INT64_MAX // max(max_square, 1)
+    values = values.astype(np.int64, copy=False)
+    return sum(int(np.dot(values[i:i + chunk_size], values[i:i + chunk_size]))
+               for i in range(0, len(values), chunk_size))
@@ -0,0 +1,133 @@
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from processing.labeled_file_collection import LabeledFileCollection
+from processing.types import Label
+
+
+class StreamingFileCollection(LabeledFileCollection):
+    """
+    Labeled file collection filled from an iterator of labeled files, such as the files of a
+    container as it is listed. The files can be iterated while the iterator is still producing
+    them, so that loading the files of the first datasets does not wait for the last datasets
+    to be listed.
+
+    Files produced so far are kept, so the collection can be iterated multiple times. Files are
+    iterated in the order they are produced, which must group them by label, as labeled file
+    containers do. Operations that require all files, such as obtaining the number of files or
+    the list of labels, consume the iterator to the end.
+
+    The files can also be produced by a background thread (see list_ahead()), so that the
+    number of files is known as soon as they are all listed, while they are still iterated.
+    """
+
+    def __init__(self, labeled_files: Iterator[Tuple[Label, Path]]) -> None:
+        super().__init__()
+        self._pending: Optional[Iterator[Tuple[Label, Path]]] = iter(labeled_files)
+        self._labeled_files: List[Tuple[Label, Path]] = []
+        # Only one thread at a time may take files from the iterator
+        self._lock = threading.Lock()
+        # Error raised by the iterator in the background thread, raised again when iterating
+        self._error: Optional[BaseException] = None
+
+    def add(self, file: Path, label: Label) -> None:
+        """ Adds a new file to the collection with the specified label """
+        super().add(file, label)
+        self._labeled_files.append((label, file))
+
+    @property
+    def complete(self) -> bool:
+        """ True once the iterator has produced all files """
+        return self._pending is None
+
+    def length_hint(self) -> Optional[int]:
+        """ Returns the number of files, or None if not all files were produced yet """
+        return len(self) if self.complete and self._error is None else None
+
+    def list_ahead(self, listed: Callable[[float], None] = None) -> threading.Thread:
+        """
+        Starts producing all files in a background thread. Files can still be iterated as they
+        are produced, but the number of files becomes known as soon as they are all produced,
+        instead of once they are all iterated.
+
+        :param listed: function called, from the background thread, with the time (in
+                       seconds) it took to produce all files
+        :return: the background thread, which can be joined to wait for all files
+        """
+
+        def list_all() -> None:
+            start = time.perf_counter()
+            try:
+                self._fetch_all()
+            except BaseException as error:
+                self._error = error
+                return
+
+            if listed:
+                listed(time.perf_counter() - start)
+
+        thread = threading.Thread(target=list_all, name="list-ahead", daemon=True)
+        thread.start()
+        return thread
+
+    def __len__(self) -> int:
+        """ Returns the number of files in the collection """
+        self._fetch_all()
+        return super().__len__()
+
+    def __iter__(self) -> Iterator[Path]:
+        """ Returns iterator to iterate over all files in the collection """
+        return (file for _, file in self.iter_by_label())
+
+    def __getitem__(self, label: Label) -> List[Path]:
+        """ Returns a list of files with the specified label """
+        self._fetch_all()
+        return super().__getitem__(label)
+
+    def labels(self) -> List[Label]:
+        """ Returns list with all labels available """
+        self._fetch_all()
+        return super().labels()
+
+    def iter_by_label(self) -> Iterator[Tuple[Label, Path]]:
+        """
+        Returns iterator to iterate over all files and its corresponding label, including the
+        files that were not produced yet
+        """
+
+        def iterator() -> Iterator[Tuple[Label, Path]]:
+            index = 0
+            while True:
+                if index < len(self._labeled_files):
+                    yield self._labeled_files[index]
+                    index += 1
+                elif not self._fetch() and index == len(self._labeled_files):
+                    # The background thread may have produced the last files since their
+                    # number was checked
+                    return
+
+        return iterator()
+
+    def _fetch(self) -> bool:
+        """ Fetches the next file from the iterator, returns False if there are no more files """
+        with self._lock:
+            if self._error is not None:
+                raise self._error
+
+            if self._pending is None:
+                return False
+
+            try:
+                label, file = next(self._pending)
+            except StopIteration:
+                self._pending = None
+                return False
+
+            self.add(file, label)
+            return True
+
+    def _fetch_all(self) -> None:
+        while self._fetch():
+            pass
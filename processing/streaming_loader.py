@@ -0,0 +1,32 @@
+from typing import Dict, Iterator, Tuple
+
+from processing.accumulator import Accumulator
+from processing.file_data_loader import FileDataLoader
+from processing.types import Label
+
+
+class StreamingDataLoader(FileDataLoader):
+    """
+    Base class for data loaders that keep only a constant amount of data in memory for each
+    label, independently of the number of data files.
+
+    The load_file() method of a streaming loader must load each data file into an accumulator.
+    That accumulator is merged into the accumulator of its label as soon as the data file is
+    loaded. Thus, the data of each data file can be discarded right after loading it.
+    """
+
+    def collect(self, results: Iterator[Tuple[Label, Accumulator]]) -> Dict[Label, Accumulator]:
+        accumulators: Dict[Label, Accumulator] = {}
+        for label, accumulator in results:
+            accumulate(accumulators, label, accumulator)
+
+        return accumulators
+
+
+def accumulate(accumulators: Dict[Label, Accumulator], label: Label,
+               accumulator: Accumulator) -> None:
+    """ Merges the *accumulator* of a data file into the accumulator of its *label* """
+    if label in accumulators:
+        accumulators[label].merge(accumulator)
+    else:
+        accumulators[label] = accumulator
@@ -1,9 +1,305 @@
+import bz2
 import csv
-from contextlib import contextmanager
+import gzip
+import io
+import lzma
+import mmap
+import os
+from operator import itemgetter
 from os import PathLike
+from pathlib import PurePath
+from typing import Callable, Dict, IO, List, Optional, Union
 
+import numpy as np
 
-@contextmanager
-def open_csv(path: PathLike):
-    with open(path) as file:
-        yield csv.DictReader(file, delimiter=";")
+from processing.errors import ProcessingError
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Columns holding "Yes"/"No" values, which are decoded to booleans
+BOOLEAN_COLUMNS = {"Terminated"}
+
+# Uncompressed data files of at least this size (in bytes) are parsed in bulk, from a memory
+# map, instead of line by line
+BULK_PARSE_THRESHOLD = 32 * 1024
+
+# Number of rows converted at once by the bulk parser, which bounds its memory overhead
+BULK_PARSE_ROWS = 1 << 16
+
+
+def _open_zstd(file: IO[bytes]) -> IO[bytes]:
+    return zstandard.ZstdDecompressor().stream_reader(file)
+
+
+# Functions to decompress a file, opened in binary mode, as it is read, by extension
+DECOMPRESSORS: Dict[str, Callable[[IO[bytes]], IO[bytes]]] = {
+    ".gz": gzip.open,
+    ".bz2": bz2.open,
+    ".xz": lzma.open,
+}
+
+# Errors raised when reading corrupted compressed files
+DECOMPRESSION_ERRORS = (OSError, EOFError, lzma.LZMAError)
+
+if zstandard is not None:
+    DECOMPRESSORS[".zst"] = _open_zstd
+    DECOMPRESSION_ERRORS += (zstandard.ZstdError,)
+
+
+def compression_extensions() -> List[str]:
+    """ Returns the extensions of the compressed files that can be read """
+    return list(DECOMPRESSORS)
+
+
+def open_binary(path) -> IO[bytes]:
+    """
+    Opens a data file for reading in binary mode. Data files are usually paths, but may also
+    be objects providing an open() method, such as the members of an archive.
+    """
+    if isinstance(path, (str, PathLike)):
+        return open(path, 'rb')
+
+    return path.open('rb')
+
+
+def file_stat(path):
+    """ Returns the stat result (size and modification time) of a data file """
+    if isinstance(path, (str, PathLike)):
+        return os.stat(path)
+
+    return path.stat()
+
+
+def file_id(path) -> str:
+    """ Returns a string identifying a data file: its absolute path """
+    if isinstance(path, (str, PathLike)):
+        return os.path.abspath(path)
+
+    return str(path)
+
+
+def relative_path(path, directory) -> str:
+    """
+    Returns the path of a data file relative to the data directory (or archive or compacted
+    dataset) it is in, with '/' as separator. Unlike the name of a data file, it is unique
+    within its data directory, even with nested sub-directories, and it is the same on any copy
+    of the data directory.
+    """
+    return PurePath(os.path.relpath(str(path), str(directory))).as_posix()
+
+
+def text_reader(file: IO[bytes], name: str) -> IO[str]:
+    """
+    Returns a text stream reading from a file opened in binary mode. If *name* has the
+    extension of a supported compression format, the file is decompressed as it is read,
+    without ever holding the whole file in memory.
+    """
+    decompressor = DECOMPRESSORS.get(_extension(name))
+    if decompressor is not None:
+        file = decompressor(file)
+
+    return io.TextIOWrapper(file, newline='')
+
+
+def _extension(name: str) -> str:
+    dot = name.rfind('.')
+    return name[dot:] if dot >= 0 else ""
+
+
+def read_columns(path, columns: List[str]) -> Dict[str, np.ndarray]:
+    """
+    Reads the specified columns from a ';' separated CSV file. The header is resolved only once
+    and only the requested columns are converted. Columns in BOOLEAN_COLUMNS are decoded to
+    boolean arrays and all other columns are decoded to integer arrays. Compressed files are
+    supported (see text_reader()).
+
+    Uncompressed files larger than BULK_PARSE_THRESHOLD are memory-mapped and parsed in bulk,
+    without creating Python objects for each row. Files already held in memory, such as
+    prefetched files, are parsed in bulk as well. Files with an unexpected format for the bulk
+    parser, such as quoted fields or empty lines, are parsed line by line instead.
+
+    :param path:    path to the CSV file to read, or an archive member
+    :param columns: names of the columns to read
+    :return: dictionary mapping each column name to a numpy array with its values
+    :raise ProcessingError: if the file is missing a column or includes an invalid value
+    """
+    compressed = _extension(str(path)) in DECOMPRESSORS
+    try:
+        with open_binary(path) as raw:
+            data = None
+            if isinstance(raw, io.BufferedReader) and not compressed and \
+                    os.fstat(raw.fileno()).st_size >= BULK_PARSE_THRESHOLD:
+                data = _read_columns_mapped(raw, columns)
+            elif isinstance(raw, io.BytesIO) and not compressed and \
+                    raw.getbuffer().nbytes >= BULK_PARSE_THRESHOLD:
+                data = _parse_mapped(raw.getvalue(), columns)
+
+            if data is not None:
+                return data
+
+            with text_reader(raw, str(path)) as file:
+                values = _read_fields(file, path, columns)
+    except DECOMPRESSION_ERRORS as e:
+        if not compressed:
+            raise
+        raise ProcessingError(f"data file '{path}' could not be decompressed: {e}")
+
+    try:
+        return {column: _decode(column, column_values)
+                for column, column_values in zip(columns, values)}
+    except ValueError as e:
+        raise ProcessingError(f"data file '{path}' includes an invalid value: {e}")
+
+
+def _read_fields(file: IO[str], path, columns: List[str]) -> List[list]:
+    """ Reads the fields of the specified columns from an open CSV file, one list per column """
+    reader = csv.reader(file, delimiter=';')
+    header = next(reader, None)
+    if header is None:
+        # Empty files have no samples
+        return [[] for _ in columns]
+
+    try:
+        indices = [header.index(column) for column in columns]
+    except ValueError:
+        missing = [column for column in columns if column not in header]
+        raise ProcessingError(f"data file '{path}' is missing columns: {', '.join(missing)}")
+
+    try:
+        if len(indices) == 1:
+            index = indices[0]
+            return [[row[index] for row in filter(None, reader)]]
+
+        # Skip empty lines and transpose the selected fields into one tuple per column
+        values = list(zip(*map(itemgetter(*indices), filter(None, reader))))
+        return values or [[] for _ in columns]
+    except IndexError:
+        raise ProcessingError(f"data file '{path}' includes a row with missing fields")
+
+
+def _read_columns_mapped(file: IO[bytes], columns: List[str]) -> Optional[Dict[str, np.ndarray]]:
+    """
+    Reads the specified columns from a memory map of *file*. All fields are located at once
+    and converted with vectorized operations.
+
+    :return: the columns read, or None if the file does not have the simple format expected
+    """
+    mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        return _parse_mapped(mapped, columns)
+    finally:
+        try:
+            mapped.close()
+        except BufferError:
+            # A view of the map is still referenced, it is closed when the view is collected
+            pass
+
+
+def _parse_mapped(mapped: Union[mmap.mmap, bytes],
+                  columns: List[str]) -> Optional[Dict[str, np.ndarray]]:
+    # Quoted fields and Windows line endings require the CSV reader
+    if mapped.find(b'"') >= 0 or mapped.find(b'\r') >= 0:
+        return None
+
+    header_end = mapped.find(b'\n')
+    if header_end < 0:
+        return None
+
+    header = mapped[:header_end].decode().split(';')
+    if any(column not in header for column in columns):
+        return None
+
+    # Ignore trailing new lines
+    end = len(mapped)
+    while end > header_end + 1 and mapped[end - 1] == ord('\n'):
+        end -= 1
+
+    body = np.frombuffer(mapped, dtype=np.uint8, offset=header_end + 1, count=end - header_end - 1)
+    if len(body) == 0:
+        return {column: _decode(column, []) for column in columns}
+
+    # Positions of the separator after each field: every row must have all fields
+    separators = np.flatnonzero((body == ord(';')) | (body == ord('\n')))
+    separators = np.append(separators, len(body))
+    field_count = len(header)
+    if len(separators) % field_count != 0:
+        return None
+
+    separators = separators.reshape(-1, field_count)
+    if not (body[separators[:, :-1]] == ord(';')).all() or \
+            not (body[separators[:-1, -1]] == ord('\n')).all():
+        return None
+
+    row_starts = np.concatenate(([0], separators[:-1, -1] + 1))
+    data = {}
+    for column in columns:
+        index = header.index(column)
+        starts = row_starts if index == 0 else separators[:, index - 1] + 1
+        ends = separators[:, index]
+
+        if column in BOOLEAN_COLUMNS:
+            data[column] = _parse_yes(body, starts, ends)
+        else:
+            values = _parse_integers(body, starts, ends)
+            if values is None:
+                return None
+            data[column] = values
+
+    return data
+
+
+def _parse_yes(body: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """ Returns which of the fields between *starts* and *ends* are equal to 'Yes' """
+    last = len(body) - 1
+    return (ends - starts == 3) & (body[starts] == ord('Y')) & \
+        (body[np.minimum(starts + 1, last)] == ord('e')) & \
+        (body[np.minimum(starts + 2, last)] == ord('s'))
+
+
+def _parse_integers(body: np.ndarray, starts: np.ndarray,
+                    ends: np.ndarray) -> Optional[np.ndarray]:
+    """
+    Converts the fields between *starts* and *ends* to integers. Each field is right-aligned
+    in a matrix of digits, which is then multiplied by the powers of 10.
+
+    :return: the integer values, or None if any field is not a valid integer
+    """
+    if (ends - starts).min() < 1:
+        return None
+
+    negative = body[starts] == ord('-')
+    starts = starts + negative
+    lengths = ends - starts
+    if lengths.min() < 1 or lengths.max() > 18:
+        # Empty fields and values that may overflow are left to the CSV reader
+        return None
+
+    width = int(lengths.max())
+    offsets = np.arange(-width, 0)
+    powers = 10 ** np.arange(width - 1, -1, -1, dtype=np.int64)
+
+    values = np.empty(len(starts), dtype=np.int64)
+    for first in range(0, len(starts), BULK_PARSE_ROWS):
+        rows = slice(first, first + BULK_PARSE_ROWS)
+        positions = ends[rows, None] + offsets
+        in_field = positions >= starts[rows, None]
+
+        digits = body[np.where(in_field, positions, 0)].astype(np.int64) - ord('0')
+        digits[~in_field] = 0
+        if ((digits < 0) | (digits > 9)).any():
+            return None
+
+        values[rows] = digits @ powers
+
+    values[negative] *= -1
+    return values
+
+
+def _decode(column: str, values) -> np.ndarray:
+    if column in BOOLEAN_COLUMNS:
+        return np.array(values, dtype=str) == "Yes"
+    else:
+        return np.array(values, dtype=np.int64)
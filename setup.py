@@ -10,12 +10,17 @@ setup(
     author='David Fialho',
     author_email='fialho.david@protonmail.com',
 
-    packages=find_packages(),
+    packages=find_packages(exclude=['benchmarks']),
 
     entry_points={
         'console_scripts': [
             'inv-cumsum=tools.inv_cumsum:main',
             'basic-data=tools.basic_data:main',
+            'all-data=tools.all_data:main',
+            'generate-data=tools.generate_data:main',
+            'compact=tools.compact:main',
+            'merge=tools.merge:main',
+            'batch=tools.batch:main',
         ],
     }
 )
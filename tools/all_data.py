@@ -0,0 +1,136 @@
+"""
+SS-BGP Data Tools: All Data
+
+Computes the outputs of both the basic-data and the inv-cumsum tools in a single pass over the
+data files. Each data file is listed and read only once.
+
+The configuration file follows the format of the inv-cumsum tool. The data directory of each
+dataset may also be specified as in the basic-data tool.
+
+Usage:
+  all-data <conf-file> [options]
+  all-data (-h | --help)
+
+Options:
+  -h --help               Show this screen.
+  --basic-out=<path>      Output path of the basic-data output. [Default: basic-data]
+  --cumsum-out=<path>     Output path of the inv-cumsum outputs. [Default: inv-cumsum]
+  --bin-width=<n>         Width of each bin of the inverse cumulative sum. [Default: 100]
+  --max-time=<n>          Maximum termination time covered by the bins. By default, the bins
+                          cover all termination times.
+  --exact                 Compute the inverse cumulative sum at each distinct termination time,
+                          and exact percentiles. Cannot be used with --streaming.
+  --webgl                 Render the plot with WebGL, which handles large plots better.
+  --shared-plotlyjs       Write the plotly.js library to a separate file, shared by all plots in
+                          the same directory, instead of including it in the HTML file.
+  --max-points=<n>        Maximum number of points of each trace in the plot, at least 4.
+  --no-plot               Output only the CSV table, without plotting. Plotting libraries are
+                          never loaded, which makes the tool start faster.
+  --recursive             Include data files in nested sub-directories of each data directory.
+  -j --jobs=<n>           Number of processes to load data files (0 to use all CPUs). [Default: 1]
+  --prefetch=<n>          Number of data files read ahead, by threads, while a single process
+                          loads data files, to hide the latency of the storage. [Default: 0]
+  --cache-dir=<path>      Directory to cache parsed data files. [Default: ~/.cache/ssbgp-data-tools]
+  --cache-size=<MB>       Maximum size of the cache in megabytes. [Default: 1024]
+  --cache-hash            Identify cached data files by their content instead of their size and
+                          modification time.
+  --no-cache              Do not use the cache. By default, parsed data files are cached.
+  --rebuild-cache         Parse all data files, replacing their cached data.
+  --no-index              Always list the data directories, instead of taking their files from
+                          the manifest index, stored in the cache directory, when they did not
+                          change since they were last listed.
+  --profile=<path>        Write a JSON report with the wall and CPU time of each stage, the
+                          number of files, bytes, and rows loaded, the peak memory, and the
+                          slowest data files.
+  --profile-top=<n>       Number of slowest data files in the profile report. [Default: 10]
+  --profile-load=<path>   Write a cProfile (pstats) file of the load stage. Only the main process
+                          is profiled: use --jobs=1 to include the parsing of data files.
+  --no-progress           Do not show a progress line while loading data files.
+  --streaming             Keep only the aggregates of each dataset in memory for basic-data.
+
+"""
+import sys
+from pathlib import Path
+
+from docopt import docopt
+
+from processing.application import Application
+from processing.composite import CompositeDataLoader
+from processing.concurrent_file_container import ConcurrentLabeledFileContainer
+from processing.csv_printer import CSVPrinter
+from processing.extension_selector import ExtensionFileSelector
+from processing.plotter import Plotter
+from tools.basic_data import BasicDataLoader, BasicDataProcessor, StreamingBasicDataLoader
+from tools.inv_cumsum import load_traces, TerminationTimesLoader, TerminationTimesProcessor
+from tools.utils import print_error, data_dir_exists, get_jobs, get_cache, get_index, \
+    get_max_points, get_positive_int, get_prefetch, get_profiler, show_progress
+
+
+def main():
+    args = docopt(__doc__)
+    basic_output_path = Path(args['--basic-out'] + ".csv")
+    cumsum_output_path = args['--cumsum-out']
+    jobs = get_jobs(args)
+    cache = get_cache(args)
+    profiler = get_profiler(args)
+
+    max_points = get_max_points(args)
+
+    traces = load_traces(args['<conf-file>'], recursive=args['--recursive'],
+                         index=get_index(args))
+
+    # Check if all data directories actually exist
+    for trace in traces:
+        if not data_dir_exists(trace.data_dir.path):
+            print_error(f"data directory not found: {str(trace.data_dir)}")
+            sys.exit(1)
+
+    if args['--exact'] and args['--streaming']:
+        print_error("--exact cannot be used with --streaming")
+        sys.exit(1)
+
+    if args['--streaming']:
+        basic_loader = StreamingBasicDataLoader()
+    else:
+        basic_loader = BasicDataLoader()
+
+    plotter = None
+    if not args['--no-plot']:
+        plotter = Plotter(
+            trace_lines={trace.label: trace.line for trace in traces},
+            output=Path(cumsum_output_path + '.html'),
+            webgl=args['--webgl'],
+            shared_plotlyjs=args['--shared-plotlyjs'],
+            max_points=max_points
+        )
+
+    # Setup the application
+    app = Application(
+        container=ConcurrentLabeledFileContainer(
+            containers={trace.label: trace.data_dir for trace in traces}
+        ),
+        selector=ExtensionFileSelector(extension=".basic.csv"),
+        loader=CompositeDataLoader([basic_loader, TerminationTimesLoader()], cache=cache),
+        processor=[
+            BasicDataProcessor(printer=CSVPrinter(basic_output_path), exact=args['--exact']),
+            TerminationTimesProcessor(
+                plotter=plotter,
+                printer=CSVPrinter(Path(cumsum_output_path + '.csv')),
+                bin_width=get_positive_int(args, '--bin-width'),
+                max_time=get_positive_int(args, '--max-time') if args['--max-time'] else None,
+                exact=args['--exact'],
+                profiler=profiler
+            ),
+        ],
+        jobs=jobs,
+        profiler=profiler,
+        progress=show_progress(args),
+        load_profile=args['--profile-load'],
+        prefetch=get_prefetch(args)
+    )
+
+    return app.run()
+
+
+if __name__ == '__main__':
+    main()
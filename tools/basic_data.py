@@ -10,12 +10,41 @@ For each dataset it computes:
 - Average of termination times
 - Average of message counts
 - Average of deactivation counts
+- Standard deviation of termination times, message counts, and deactivation counts
+- Median, 90th and 99th percentiles, and maximum of termination times and message counts
 
 A destination is considered to have not terminated if at least one of its samples did not terminate.
 The averages are computes over all samples, excluding only those which did not terminate.
 
+Percentiles are estimated with mergeable quantile sketches, which use a bounded amount of memory
+for each dataset. The maximum is always exact. Use --exact to compute exact percentiles.
+
+With --shard=i/N, only the i-th of N disjoint shards of the data files of each dataset is
+processed, and the aggregates of each dataset in the shard are written to a partial result
+file, <out>.shard-i-of-N.json, instead of the table. The merge tool combines the partial
+results of all shards into the table of a single run over all data files. Only the estimated
+percentiles may differ slightly, within the error of the sketches.
+
+With --sample, only a random sample of the destinations (data files) of each dataset is
+processed, for a quick preview. The statistics of all destinations are estimated from the
+sample, and the table includes the 95% confidence intervals of the number of terminated
+destinations and of the averages. The sample is reproducible: the same seed always selects the
+same data files.
+
+With --bootstrap, the table includes the 95% confidence intervals of the averages, computed
+from bootstrap resamples of the destinations of each dataset. Destinations are resampled as a
+whole, since the samples of the same destination are correlated. The intervals are
+reproducible: the same seed always yields the same intervals. In sampled mode, they replace
+the intervals estimated from the sample.
+
+With --incremental, the contribution of each data file to the aggregates of its dataset is kept
+in a state file, <out>.state.json, and only the data files that were added or changed since the
+last run are parsed. The aggregates are exact, so the table is always the same as if all data
+files were parsed. Percentiles cannot be updated exactly this way: the table includes only the
+maximum termination times and message counts.
+
 Usage:
-  basic-data <conf-file> [ --ignore-non-existing ] [ --out=<path> ]
+  basic-data <conf-file> [options]
   basic-data (-h | --help)
   basic-data (-V | --version)
 
@@ -24,34 +53,94 @@ Options:
   -V --version            Show version.
   --ignore-non-existing   Ignore data directories specified in conf file that do not exist
   --out=<path>            Specify a custom output path. [Default: basic-data]
+  --recursive             Include data files in nested sub-directories of each data directory.
+  -j --jobs=<n>           Number of processes to load data files (0 to use all CPUs). [Default: 1]
+  --prefetch=<n>          Number of data files read ahead, by threads, while a single process
+                          loads data files, to hide the latency of the storage. [Default: 0]
+  --cache-dir=<path>      Directory to cache parsed data files. [Default: ~/.cache/ssbgp-data-tools]
+  --cache-size=<MB>       Maximum size of the cache in megabytes. [Default: 1024]
+  --cache-hash            Identify cached data files by their content instead of their size and
+                          modification time.
+  --no-cache              Do not use the cache. By default, parsed data files are cached.
+  --rebuild-cache         Parse all data files, replacing their cached data.
+  --no-index              Always list the data directories, instead of taking their files from
+                          the manifest index, stored in the cache directory, when they did not
+                          change since they were last listed.
+  --profile=<path>        Write a JSON report with the wall and CPU time of each stage, the
+                          number of files, bytes, and rows loaded, the peak memory, and the
+                          slowest data files.
+  --profile-top=<n>       Number of slowest data files in the profile report. [Default: 10]
+  --profile-load=<path>   Write a cProfile (pstats) file of the load stage. Only the main process
+                          is profiled: use --jobs=1 to include the parsing of data files.
+  --no-progress           Do not show a progress line while loading data files.
+  --incremental           Parse only data files that were added or changed since the last run
+                          with the same output path. The table is the same as with --full,
+                          but it has no percentiles, only the maximum values.
+  --full                  Parse all data files in incremental mode, rebuilding its state.
+  --streaming             Keep only the aggregates of each dataset in memory, instead of all
+                          samples. Memory usage no longer grows with the number of samples.
+  --exact                 Compute exact percentiles. Requires the values of all samples, so it
+                          cannot be used with --streaming or --incremental.
+  --shard=<i/N>           Process only the i-th of N shards of the data files of each dataset,
+                          writing a partial result to be combined with the merge tool.
+  --sample=<size>         Process only a random sample of the data files of each dataset: a
+                          fraction, such as 0.05, or a number of data files, such as 500.
+  --bootstrap=<n>         Compute the confidence intervals of the averages from n bootstrap
+                          resamples of the destinations of each dataset, such as 10000.
+  --seed=<n>              Seed of the random sample and of the bootstrap resamples. [Default: 0]
 
 """
 import json
+import os
 import sys
+import zlib
+from concurrent.futures import Future, ProcessPoolExecutor
 from pathlib import Path
-from typing import Dict, List
+from typing import Deque, Dict, Iterator, List, Optional, Sequence, Tuple, Union
 
 import numpy as np
-from collections import defaultdict
+from collections import defaultdict, deque
 from docopt import docopt
 
 from processing.application import Application
+from processing.accumulator import Accumulator
+from processing.bootstrap import bootstrap_ratio_intervals
+from processing.concurrent_file_container import ConcurrentLabeledFileContainer
 from processing.csv_printer import CSVPrinter
-from processing.data_loader import DataLoader
 from processing.data_processor import DataProcessor
-from processing.directory import Directory
+from processing.dataset_processor import DatasetProcessor
+from processing.errors import ProcessingError
 from processing.extension_selector import ExtensionFileSelector
+from processing.file_data_loader import FileDataLoader
 from processing.labeled_file_collection import LabeledFileCollection
-from processing.labeled_file_container import LabeledFileContainer
+from processing.load_listener import LoadListener
+from processing.partial_result import file_counts, partial_path, write_partial
+from processing.quantile_sketch import QuantileSketch, exact_quantile
+from processing.sample_selector import SampleFileSelector
+from processing.shard_selector import ShardFileSelector
+from processing.statistics import RunningStats, proportion_interval, ratio_interval
+from processing.streaming_loader import StreamingDataLoader
 from processing.types import Label
-from processing.utils import open_csv
-from tools.utils import print_error
+from processing.utils import file_id, file_stat
+from tools.utils import print_error, data_dir_exists, get_container, get_jobs, get_cache, \
+    get_index, get_positive_int, get_prefetch, get_profiler, get_sample, get_seed, get_shard, \
+    show_progress
+
+# Name of the tool, stored in its partial results
+TOOL_NAME = "basic-data"
 
 
 def main():
     args = docopt(__doc__, version="Basic Data v0.1")
     conf_path = Path(args['<conf-file>'])
     output_path = Path(args['--out'] + ".csv")
+    jobs = get_jobs(args)
+    cache = get_cache(args)
+    index = get_index(args)
+    profiler = get_profiler(args)
+    shard = get_shard(args)
+    sample = get_sample(args)
+    seed = get_seed(args)
 
     if not conf_path.is_file():
         print_error(f"Configuration file was not found: {str(conf_path)}")
@@ -62,18 +151,67 @@ def main():
     if not args['--ignore-non-existing']:
         # Make sure all data directories exist - If one does not, then exit
         for label, directory in data_sets.items():
-            if not directory.is_dir():
+            if not data_dir_exists(directory):
                 print_error(f"Data directory not found: {str(directory)}")
                 sys.exit(1)
 
+    if args['--exact'] and (args['--streaming'] or args['--incremental']):
+        print_error("--exact cannot be used with --streaming or --incremental")
+        sys.exit(1)
+
+    if shard and (args['--exact'] or args['--incremental']):
+        print_error("--shard cannot be used with --exact or --incremental")
+        sys.exit(1)
+
+    if sample and (shard or args['--streaming'] or args['--incremental']):
+        print_error("--sample cannot be used with --shard, --streaming, or --incremental")
+        sys.exit(1)
+
+    bootstrap = get_positive_int(args, '--bootstrap') if args['--bootstrap'] else 0
+    if bootstrap and (shard or args['--streaming'] or args['--incremental']):
+        print_error("--bootstrap cannot be used with --shard, --streaming, or --incremental")
+        sys.exit(1)
+
+    selector = ExtensionFileSelector(extension=".basic.csv")
+    sampler = None
+    if sample:
+        selector = sampler = SampleFileSelector(selector, sample, seed=seed)
+
+    processor = BasicDataProcessor(printer=CSVPrinter(output_path), exact=args['--exact'],
+                                   sampler=sampler, bootstrap=bootstrap, seed=seed,
+                                   jobs=jobs, percentiles=not args['--incremental'])
+
+    if shard:
+        # The summary of each dataset in this shard is merged with the other shards by the
+        # merge tool
+        selector = ShardFileSelector(selector, shard)
+        loader = StreamingBasicDataLoader(cache=cache)
+        processor = BasicDataPartialWriter(partial_path(args['--out'], shard), selector)
+    elif args['--incremental']:
+        loader = IncrementalBasicDataLoader(
+            state_path=Path(args['--out'] + ".state.json"),
+            full=args['--full'],
+            cache=cache
+        )
+    elif args['--streaming']:
+        loader = StreamingBasicDataLoader(cache=cache)
+    else:
+        loader = BasicDataLoader(cache=cache)
+
     # Setup the application
     app = Application(
-        container=LabeledFileContainer(
-            containers={label: Directory(data_dir) for label, data_dir in data_sets.items()}
+        container=ConcurrentLabeledFileContainer(
+            containers={label: get_container(data_dir, recursive=args['--recursive'], index=index)
+                        for label, data_dir in data_sets.items()}
         ),
-        selector=ExtensionFileSelector(extension=".basic.csv"),
-        loader=BasicDataLoader(),
-        processor=BasicDataProcessor(printer=CSVPrinter(output_path))
+        selector=selector,
+        loader=loader,
+        processor=processor,
+        jobs=jobs,
+        profiler=profiler,
+        progress=show_progress(args),
+        load_profile=args['--profile-load'],
+        prefetch=get_prefetch(args)
     )
 
     return app.run()
@@ -85,7 +223,8 @@ def load_data_sets(conf_path: Path) -> Dict[Label, Path]:
 
     The configuration file is a JSON formatted file with a single object. Each pair of key and
     value corresponds to a data set. The key corresponds to the data set's label and the value to
-    the data directory containing the files to load the data from.
+    the data directory containing the files to load the data from. The data directory may also
+    be a tar or zip archive, or a directory inside one, such as "/path/to/results.tar.gz/bgp".
 
     Example of a configuration file with two data sets:
 
@@ -101,49 +240,508 @@ def load_data_sets(conf_path: Path) -> Dict[Label, Path]:
 
 
 class DestinationData:
-    __slots__ = "sample_count", "terminations", "termination_times", "messages", "deactivations"
+    """
+    Data loaded from the data file of a single destination. It includes the number of samples,
+    whether or not all samples terminated, and the values of each terminated sample.
+    """
+    __slots__ = "sample_count", "terminated", "termination_times", "messages", "deactivations"
 
-    def __init__(self):
-        self.sample_count: int = 0
-        self.terminations: List[bool] = []
-        self.termination_times: List[int] = []
-        self.messages: List[int] = []
-        self.deactivations: List[int] = []
+    def __init__(self, sample_count: int, terminated: bool, termination_times: np.ndarray,
+                 messages: np.ndarray, deactivations: np.ndarray):
+        self.sample_count = sample_count
+        self.terminated = terminated
+        self.termination_times = termination_times
+        self.messages = messages
+        self.deactivations = deactivations
 
 
-class BasicDataLoader(DataLoader):
+class BasicDataset:
+    """
+    Columnar store holding the data of all destinations of a dataset.
 
-    def load(self, data_files: LabeledFileCollection) -> Dict[Label, List[DestinationData]]:
+    The termination times, message counts, and deactivation counts of the terminated samples of
+    all destinations are stored in flat contiguous arrays. The values of the i-th destination
+    are stored between positions offsets[i] and offsets[i + 1] of each of these arrays. The
+    number of samples of each destination and whether or not all of them terminated are stored
+    in arrays with one entry per destination.
+    """
+    __slots__ = "sample_counts", "terminated", "offsets", \
+                "termination_times", "messages", "deactivations"
+
+    def __init__(self, sample_counts: np.ndarray, terminated: np.ndarray, offsets: np.ndarray,
+                 termination_times: np.ndarray, messages: np.ndarray,
+                 deactivations: np.ndarray) -> None:
+        self.sample_counts = sample_counts
+        self.terminated = terminated
+        self.offsets = offsets
+        self.termination_times = termination_times
+        self.messages = messages
+        self.deactivations = deactivations
+
+    @staticmethod
+    def from_destinations(destinations: List[DestinationData]) -> 'BasicDataset':
+        """ Builds a dataset from the data of each of its destinations """
+
+        def concatenate(values: List[np.ndarray]) -> np.ndarray:
+            return np.concatenate(values) if values else np.empty(0, dtype=np.int64)
+
+        value_counts = [len(dst.termination_times) for dst in destinations]
+        offsets = np.zeros(len(destinations) + 1, dtype=np.int64)
+        np.cumsum(value_counts, out=offsets[1:])
+
+        return BasicDataset(
+            sample_counts=np.array([dst.sample_count for dst in destinations], dtype=np.int64),
+            terminated=np.array([dst.terminated for dst in destinations], dtype=bool),
+            offsets=offsets,
+            termination_times=concatenate([dst.termination_times for dst in destinations]),
+            messages=concatenate([dst.messages for dst in destinations]),
+            deactivations=concatenate([dst.deactivations for dst in destinations]),
+        )
+
+    def __len__(self) -> int:
+        """ Returns the number of destinations in the dataset """
+        return len(self.terminated)
+
+
+class BasicDataLoader(FileDataLoader):
+
+    columns = ["Terminated", "Termination Time (Total)", "Message Count", "Detection Count"]
+
+    def load_columns(self, columns: Dict[str, np.ndarray]) -> DestinationData:
+        terminations = columns["Terminated"]
+        return DestinationData(
+            sample_count=len(terminations),
+            terminated=bool(terminations.all()),
+            termination_times=columns["Termination Time (Total)"][terminations],
+            messages=columns["Message Count"][terminations],
+            deactivations=columns["Detection Count"][terminations],
+        )
+
+    def collect(self, results: Iterator[Tuple[Label, DestinationData]]) \
+            -> Dict[Label, BasicDataset]:
+
+        destinations: Dict[Label, List[DestinationData]] = defaultdict(list)
+        for label, data in results:
+            destinations[label].append(data)
+
+        return {label: BasicDataset.from_destinations(data)
+                for label, data in destinations.items()}
+
+
+class BasicSummary(Accumulator):
+    """
+    Mergeable aggregates of a set of destinations: the number of samples, destinations, and
+    terminated destinations, the statistics of the values of all terminated samples, and
+    quantile sketches of their termination times and message counts.
 
-        datasets: Dict[Label, List[DestinationData]] = defaultdict(list)
-        for label, path in data_files.iter_by_label():
-            data = DestinationData()
-            with open_csv(path) as file:
-                for row in file:
-                    data.sample_count += 1
+    Merging the summaries of two sets of destinations yields exactly the same counts and
+    statistics as computing them over the union of both sets. The quantile sketches are
+    approximate once they outgrow their capacity, except for the maximum, which is exact.
+    """
+    __slots__ = "samples", "destinations", "terminated", \
+                "termination_times", "messages", "deactivations", \
+                "termination_time_quantiles", "message_quantiles"
+
+    def __init__(self, samples: int = 0, destinations: int = 0, terminated: int = 0,
+                 termination_times: RunningStats = None, messages: RunningStats = None,
+                 deactivations: RunningStats = None,
+                 termination_time_quantiles: QuantileSketch = None,
+                 message_quantiles: QuantileSketch = None) -> None:
+        self.samples = samples
+        self.destinations = destinations
+        self.terminated = terminated
+        self.termination_times = termination_times or RunningStats()
+        self.messages = messages or RunningStats()
+        self.deactivations = deactivations or RunningStats()
+        self.termination_time_quantiles = termination_time_quantiles or QuantileSketch()
+        self.message_quantiles = message_quantiles or QuantileSketch()
+
+    @staticmethod
+    def of_destination(data: DestinationData) -> 'BasicSummary':
+        """ Computes the summary of a single destination """
+        return BasicSummary(
+            samples=data.sample_count,
+            destinations=1,
+            terminated=int(data.terminated),
+            termination_times=RunningStats.of(data.termination_times),
+            messages=RunningStats.of(data.messages),
+            deactivations=RunningStats.of(data.deactivations),
+            termination_time_quantiles=QuantileSketch.of(data.termination_times),
+            message_quantiles=QuantileSketch.of(data.messages),
+        )
+
+    @staticmethod
+    def of_dataset(dataset: BasicDataset) -> 'BasicSummary':
+        """ Computes the summary of all destinations in a dataset """
+        return BasicSummary(
+            samples=int(dataset.sample_counts.sum()),
+            destinations=len(dataset),
+            terminated=int(np.count_nonzero(dataset.terminated)),
+            termination_times=RunningStats.of(dataset.termination_times),
+            messages=RunningStats.of(dataset.messages),
+            deactivations=RunningStats.of(dataset.deactivations),
+            termination_time_quantiles=QuantileSketch.of(dataset.termination_times),
+            message_quantiles=QuantileSketch.of(dataset.messages),
+        )
+
+    def merge(self, other: 'BasicSummary') -> None:
+        """ Merges the summary of *other* into this summary """
+        self.samples += other.samples
+        self.destinations += other.destinations
+        self.terminated += other.terminated
+        self.termination_times.merge(other.termination_times)
+        self.messages.merge(other.messages)
+        self.deactivations.merge(other.deactivations)
+        self.termination_time_quantiles.merge(other.termination_time_quantiles)
+        self.message_quantiles.merge(other.message_quantiles)
+
+    def to_list(self) -> list:
+        """ Returns a list representation of the summary, which can be stored as JSON """
+        return [self.samples, self.destinations, self.terminated,
+                self.termination_times.to_list(), self.messages.to_list(),
+                self.deactivations.to_list(), self.termination_time_quantiles.to_list(),
+                self.message_quantiles.to_list()]
+
+    @staticmethod
+    def from_list(values: list) -> 'BasicSummary':
+        """ Creates a summary from a list obtained with to_list() """
+        samples, destinations, terminated, termination_times, messages, deactivations, \
+            termination_time_quantiles, message_quantiles = values
+        return BasicSummary(
+            samples, destinations, terminated,
+            termination_times=RunningStats.from_list(termination_times),
+            messages=RunningStats.from_list(messages),
+            deactivations=RunningStats.from_list(deactivations),
+            termination_time_quantiles=QuantileSketch.from_list(termination_time_quantiles),
+            message_quantiles=QuantileSketch.from_list(message_quantiles),
+        )
+
+
+class BasicTotals(Accumulator):
+    """
+    Exact aggregates of a set of destinations: the number of samples, destinations, and
+    terminated destinations, the statistics of the values of all terminated samples, and the
+    maximum termination time and message count. Unlike BasicSummary, they hold no quantile
+    sketches. Thus, merging the totals of multiple sets of destinations yields exactly the same
+    totals as computing them over the union of those sets, in any order.
+    """
+    __slots__ = "samples", "destinations", "terminated", \
+                "termination_times", "messages", "deactivations", \
+                "max_termination_time", "max_messages"
+
+    def __init__(self, samples: int = 0, destinations: int = 0, terminated: int = 0,
+                 termination_times: RunningStats = None, messages: RunningStats = None,
+                 deactivations: RunningStats = None, max_termination_time: int = None,
+                 max_messages: int = None) -> None:
+        self.samples = samples
+        self.destinations = destinations
+        self.terminated = terminated
+        self.termination_times = termination_times or RunningStats()
+        self.messages = messages or RunningStats()
+        self.deactivations = deactivations or RunningStats()
+        self.max_termination_time = max_termination_time
+        self.max_messages = max_messages
+
+    @staticmethod
+    def of_destination(data: DestinationData) -> 'BasicTotals':
+        """ Computes the totals of a single destination """
+        return BasicTotals(
+            samples=data.sample_count,
+            destinations=1,
+            terminated=int(data.terminated),
+            termination_times=RunningStats.of(data.termination_times),
+            messages=RunningStats.of(data.messages),
+            deactivations=RunningStats.of(data.deactivations),
+            max_termination_time=_maximum(data.termination_times),
+            max_messages=_maximum(data.messages),
+        )
+
+    def merge(self, other: 'BasicTotals') -> None:
+        """ Merges the totals of *other* into these totals """
+        self.samples += other.samples
+        self.destinations += other.destinations
+        self.terminated += other.terminated
+        self.termination_times.merge(other.termination_times)
+        self.messages.merge(other.messages)
+        self.deactivations.merge(other.deactivations)
+        self.max_termination_time = _max(self.max_termination_time, other.max_termination_time)
+        self.max_messages = _max(self.max_messages, other.max_messages)
+
+    def to_list(self) -> list:
+        """ Returns a list representation of the totals, which can be stored as JSON """
+        return [self.samples, self.destinations, self.terminated,
+                self.termination_times.to_list(), self.messages.to_list(),
+                self.deactivations.to_list(), self.max_termination_time, self.max_messages]
+
+    @staticmethod
+    def from_list(values: list) -> 'BasicTotals':
+        """ Creates the totals from a list obtained with to_list() """
+        samples, destinations, terminated, termination_times, messages, deactivations, \
+            max_termination_time, max_messages = values
+        return BasicTotals(
+            samples, destinations, terminated,
+            termination_times=RunningStats.from_list(termination_times),
+            messages=RunningStats.from_list(messages),
+            deactivations=RunningStats.from_list(deactivations),
+            max_termination_time=max_termination_time,
+            max_messages=max_messages,
+        )
+
+
+def _maximum(values: np.ndarray) -> Optional[int]:
+    """ Returns the maximum of *values*, or None if there are no values """
+    return int(values.max()) if len(values) else None
+
+
+def _max(first: Optional[int], second: Optional[int]) -> Optional[int]:
+    """ Returns the maximum of two values, either of which may be None """
+    if first is None:
+        return second
+    if second is None:
+        return first
+    return max(first, second)
+
+
+class StreamingBasicDataLoader(StreamingDataLoader, BasicDataLoader):
+    """
+    Loads the summary of each dataset, merging the summary of each data file into the summary
+    of its dataset as soon as the file is loaded. Memory usage is proportional to the number
+    of datasets, instead of the number of samples.
+    """
 
-                    terminated = True if row["Terminated"] == "Yes" else False
-                    data.terminations.append(terminated)
+    def load_columns(self, columns: Dict[str, np.ndarray]) -> BasicSummary:
+        return BasicSummary.of_destination(super().load_columns(columns))
 
-                    if terminated:
-                        data.termination_times.append(int(row["Termination Time (Total)"]))
-                        data.messages.append(int(row["Message Count"]))
-                        data.deactivations.append(int(row["Detection Count"]))
 
-            datasets[label].append(data)
+class IncrementalBasicDataLoader(BasicDataLoader):
+    """
+    Loads the totals of each dataset, parsing only the data files that were added or changed
+    since the last run.
+
+    The contribution of each data file to the totals of its dataset is kept in a state file,
+    along with its path, size, and modification time. Only the data files that were added or
+    whose size or modification time changed are parsed, the contributions of removed data files
+    are dropped, and the totals of each dataset are merged again from the contributions of all
+    its current data files. Since the totals are exact, they are always the same as if all data
+    files were parsed. Percentiles cannot be computed from the totals: only the maximum values
+    are available.
+    """
+
+    # Changing the format of the state file requires changing the version
+    STATE_VERSION = 5
+
+    def __init__(self, state_path: Path, full: bool = False, cache=None) -> None:
+        """
+        :param state_path: path to the state file
+        :param full:       ignore the existing state, parsing all data files
+        :param cache:      parse cache used to read data files
+        """
+        super().__init__(cache)
+        self.state_path = state_path
+        self.full = full
+
+    def load_columns(self, columns: Dict[str, np.ndarray]) -> BasicTotals:
+        return BasicTotals.of_destination(super().load_columns(columns))
+
+    def load(self, data_files: LabeledFileCollection, jobs: int = 1,
+             listeners: Sequence[LoadListener] = (),
+             prefetch: int = 0) -> Dict[Label, BasicTotals]:
+        previous = {} if self.full else self._load_state()
+
+        # Size, modification time, and contribution of each data file, keyed by label and then
+        # by path, in the same order as the data files in the collection. The contribution is
+        # None until the data file is parsed.
+        files: Dict[Label, Dict[str, list]] = defaultdict(dict)
+        pending = LabeledFileCollection()
+        pending_keys: List[str] = []
+        for label, path in data_files.iter_by_label():
+            key = file_id(path)
+            stat = file_stat(path)
+            entry = previous.get(label, {}).get(key)
+            if entry and entry[:2] == [stat.st_size, stat.st_mtime_ns]:
+                files[label][key] = entry
+            else:
+                files[label][key] = [stat.st_size, stat.st_mtime_ns, None]
+                pending.add(path, label)
+                pending_keys.append(key)
+
+        unchanged = sum(len(entries) for entries in files.values()) - len(pending)
+        removed = sum(key not in files.get(label, {})
+                      for label, entries in previous.items() for key in entries)
+        print(f"Parsing {len(pending)} new or changed data files "
+              f"({unchanged} unchanged, {removed} removed)...")
+
+        results = self.load_each(pending, jobs, listeners, prefetch)
+        for key, (label, totals) in zip(pending_keys, results):
+            files[label][key][2] = totals.to_list()
+
+        if self.cache:
+            self.cache.trim()
+
+        self._save_state(files)
+
+        # Merged in the same order as the data files, though the order does not matter
+        datasets: Dict[Label, BasicTotals] = {}
+        for label, entries in files.items():
+            datasets[label] = BasicTotals()
+            for _, _, contribution in entries.values():
+                datasets[label].merge(BasicTotals.from_list(contribution))
 
         return datasets
 
+    def load_datasets(self, data_files: LabeledFileCollection, jobs: int = 1,
+                      listeners: Sequence[LoadListener] = (),
+                      prefetch: int = 0) -> Iterator[Tuple[Label, BasicTotals]]:
+        # The state can only be saved once all data files are known: datasets are yielded
+        # only after all of them are loaded
+        yield from self.load(data_files, jobs, listeners, prefetch).items()
 
-class BasicDataProcessor(DataProcessor):
+    def _load_state(self) -> Dict[Label, Dict[str, list]]:
+        try:
+            with open(self.state_path) as file:
+                state = json.load(file)
+        except FileNotFoundError:
+            return {}
+        except ValueError:
+            print_error(f"ignoring invalid state file: {self.state_path}")
+            return {}
 
-    def __init__(self, printer: CSVPrinter):
-        self.printer = printer
+        if state.get("version") != self.STATE_VERSION:
+            return {}
+
+        return state["datasets"]
+
+    def _save_state(self, files: Dict[Label, Dict[str, list]]) -> None:
+        state = {"version": self.STATE_VERSION, "datasets": files}
+
+        # Write to a temporary file first to never leave a partial state file behind
+        temporary = self.state_path.with_name(self.state_path.name + ".tmp")
+        with open(temporary, 'w') as file:
+            json.dump(state, file)
+        os.replace(temporary, self.state_path)
+
+
+class BasicDataPartialWriter(DataProcessor):
+    """
+    Writes the partial result of a single shard of the data files: for each dataset, the
+    summary of the data files of the shard. Expects the summaries loaded with
+    StreamingBasicDataLoader.
+    """
+
+    def __init__(self, path: Path, selector: ShardFileSelector):
+        """
+        :param path:     path to the partial result file
+        :param selector: selector of the data files of the shard
+        """
+        self.path = path
+        self.selector = selector
+
+    def process(self, data: Dict[Label, BasicSummary]):
+        datasets = {}
+        for label, count in self.selector.file_counts.items():
+            summary = data.get(label, BasicSummary())
+            datasets[label] = {"files": count, "summary": summary.to_list()}
+
+        write_partial(self.path, TOOL_NAME, self.selector.shard, datasets)
+        print(f"Wrote the partial result of shard {self.selector.shard} to {self.path}")
 
-    def process(self, datasets: Dict[Label, List[DestinationData]]):
+
+def merge_partials(partials: List[dict]) -> Dict[Label, BasicSummary]:
+    """
+    Merges the partial results of all shards (see load_partials()) into the summary of each
+    dataset. The summaries of the shards are merged in shard order. The counts and statistics
+    are the same as those of a single run over all data files. Estimated percentiles may
+    differ slightly, within the error of the sketches, since the values are merged in a
+    different order.
+
+    :raise ProcessingError: if the data files of a dataset are not all covered exactly once
+    """
+    summaries: Dict[Label, BasicSummary] = {}
+    for label, count in file_counts(partials).items():
+        summary = BasicSummary.from_list(partials[0]["datasets"][label]["summary"])
+        for partial in partials[1:]:
+            summary.merge(BasicSummary.from_list(partial["datasets"][label]["summary"]))
+
+        if summary.destinations != count:
+            raise ProcessingError(f"partial results do not cover each data file of dataset "
+                                  f"'{label}' exactly once")
+
+        # Datasets without data files are left out, as in a single run
+        if count > 0:
+            summaries[label] = summary
+
+    return summaries
+
+
+# Quantiles reported for termination times and message counts, along with the maximum
+QUANTILES = [("Median", 0.5), ("P90", 0.9), ("P99", 0.99)]
+
+
+class BasicDataProcessor(DatasetProcessor):
+    """
+    Outputs a table with the basic statistics of each dataset. The row of each dataset is
+    written as soon as the dataset is processed.
+
+    Quantiles are estimated with the quantile sketches of each dataset's summary. In exact
+    mode, they are computed from all values instead, which requires the values of all samples
+    to be loaded: that is, datasets rather than summaries.
+
+    If the data files were sampled, the statistics of each dataset are estimated from its
+    sampled destinations: the counts are extrapolated to all destinations, and the number of
+    terminated destinations and the averages are reported along with their 95% confidence
+    intervals. This also requires datasets rather than summaries.
+
+    Optionally, the 95% confidence intervals of the averages are computed by bootstrapping the
+    destinations of each dataset, which also requires datasets. The resamples of each dataset
+    are seeded with the seed and the label of the dataset, so the intervals do not depend on
+    the other datasets. With multiple jobs, the datasets are bootstrapped in parallel by worker
+    processes, and rows are still written in the same order as the datasets.
+    """
+
+    def __init__(self, printer: CSVPrinter, exact: bool = False,
+                 sampler: SampleFileSelector = None, bootstrap: int = 0, seed: int = 0,
+                 jobs: int = 1, percentiles: bool = True):
+        """
+        :param printer:     printer to output the table
+        :param exact:       compute exact quantiles instead of estimating them
+        :param sampler:     selector which sampled the data files, if they were sampled
+        :param bootstrap:   number of bootstrap resamples of each dataset, 0 to disable it
+        :param seed:        seed of the bootstrap resamples
+        :param jobs:        number of worker processes to bootstrap datasets
+        :param percentiles: include the percentiles of the termination times and messages,
+                            which require datasets or summaries, not only totals
+        """
+        self.printer = printer
+        self.exact = exact
+        self.sampler = sampler
+        self.bootstrap = bootstrap
+        self.seed = seed
+        self.jobs = jobs
+        self.percentiles = percentiles
+
+    def process_each(self, datasets: Iterator[Tuple[Label, Union[BasicDataset, BasicSummary,
+                                                                 BasicTotals]]]):
+        executor = None
+        if self.bootstrap and self.jobs > 1:
+            executor = ProcessPoolExecutor(max_workers=self.jobs)
+
+        try:
+            self._process_each(datasets, executor)
+        finally:
+            if executor:
+                executor.shutdown()
+
+    def _process_each(self, datasets: Iterator[Tuple[Label, Union[BasicDataset, BasicSummary,
+                                                                  BasicTotals]]],
+                      executor: Optional[ProcessPoolExecutor]):
         with self.printer:
 
-            self.printer.set_headers([
+            percentiles = QUANTILES if self.percentiles else []
+            quantile_headers = [f"{metric} ({name})"
+                                for metric in ["Termination Times", "Messages"]
+                                for name, _ in percentiles + [("Max", 1.0)]]
+
+            headers = [
                     "Dataset",
                     "Samples",
                     "Destinations",
@@ -152,25 +750,171 @@ class BasicDataProcessor(DataProcessor):
                     "Termination Times (Avg.)",
                     "Messages (Avg.)",
                     "Deactivations (Avg.)",
-            ])
+                    "Termination Times (Std.)",
+                    "Messages (Std.)",
+                    "Deactivations (Std.)",
+            ] + quantile_headers
+
+            if self.sampler or self.bootstrap:
+                headers = _with_interval_headers(headers, sampled=self.sampler is not None)
+
+            self.printer.set_headers(headers)
+
+            # Rows waiting for the bootstrap intervals of their dataset, in order
+            pending: Deque[Tuple[dict, Future]] = deque()
+
+            for label, dataset in datasets:
+                if isinstance(dataset, (BasicSummary, BasicTotals)):
+                    if self.exact or self.sampler or self.bootstrap:
+                        raise ProcessingError("exact quantiles, sampling, and bootstrapping "
+                                              "require the values of all samples, which are "
+                                              "not kept in summaries")
+                    summary = dataset
+                else:
+                    summary = BasicSummary.of_dataset(dataset)
+
+                if isinstance(summary, BasicTotals):
+                    if self.percentiles:
+                        raise ProcessingError("percentiles cannot be computed from totals")
+                    quantiles = [_nan_if_none(summary.max_termination_time),
+                                 _nan_if_none(summary.max_messages)]
+                elif self.exact:
+                    quantiles = _exact_quantiles(dataset.termination_times, percentiles) + \
+                                _exact_quantiles(dataset.messages, percentiles)
+                else:
+                    quantiles = \
+                        _estimated_quantiles(summary.termination_time_quantiles, percentiles) + \
+                        _estimated_quantiles(summary.message_quantiles, percentiles)
+
+                row = {
+                    "Dataset": label,
+                    "Samples": summary.samples,
+                    "Destinations": summary.destinations,
+                    "Terminated": summary.terminated,
+                    "Non-Terminated": summary.destinations - summary.terminated,
+                    "Termination Times (Avg.)": summary.termination_times.mean,
+                    "Messages (Avg.)": summary.messages.mean,
+                    "Deactivations (Avg.)": summary.deactivations.mean,
+                    "Termination Times (Std.)": summary.termination_times.std,
+                    "Messages (Std.)": summary.messages.std,
+                    "Deactivations (Std.)": summary.deactivations.std,
+                }
+                row.update(zip(quantile_headers, quantiles))
+
+                if self.sampler:
+                    row.update(_sample_estimates(dataset, self.sampler.file_counts[label]))
+
+                future = Future()
+                if self.bootstrap:
+                    totals, counts = _destination_totals(dataset)
+                    seed = [self.seed, zlib.crc32(label.encode())]
+                    if executor:
+                        future = executor.submit(bootstrap_ratio_intervals, totals, counts,
+                                                 self.bootstrap, seed)
+                    else:
+                        future.set_result(bootstrap_ratio_intervals(totals, counts,
+                                                                    self.bootstrap, seed))
+                else:
+                    future.set_result(None)
+
+                pending.append((row, future))
+                while pending and pending[0][1].done():
+                    self._print_row(*pending.popleft())
+
+            while pending:
+                self._print_row(*pending.popleft())
+
+    def _print_row(self, row: dict, intervals: Future) -> None:
+        """ Prints a row, once the bootstrap intervals of its averages are computed """
+        if intervals.result() is not None:
+            for metric, (low, high) in zip(AVERAGED_METRICS, intervals.result()):
+                row[f"{metric} (Avg. CI Low)"] = low
+                row[f"{metric} (Avg. CI High)"] = high
+
+        self.printer.print_row(row)
+        self.printer.flush()
+
+
+# Metrics whose averages are reported with confidence intervals
+AVERAGED_METRICS = ["Termination Times", "Messages", "Deactivations"]
+
+
+def _with_interval_headers(headers: List[str], sampled: bool) -> List[str]:
+    """
+    Adds the headers of the columns with the confidence intervals of the averages and, if the
+    data files were sampled, the number of sampled destinations and the confidence interval of
+    the number of terminated destinations
+    """
+    with_intervals = []
+    for header in headers:
+        with_intervals.append(header)
+        if header == "Destinations" and sampled:
+            with_intervals.append("Sampled Destinations")
+        elif header == "Terminated" and sampled:
+            with_intervals.extend(["Terminated (CI Low)", "Terminated (CI High)"])
+        elif header.endswith(" (Avg.)"):
+            metric = header[:-len(" (Avg.)")]
+            with_intervals.extend([f"{metric} (Avg. CI Low)", f"{metric} (Avg. CI High)"])
 
-            for label, dataset in datasets.items():
-                destination_count = len(dataset)
-                terminated_count = sum(int(all(dst.terminations)) for dst in dataset)
+    return with_intervals
 
-                self.printer.print_row({
-                    "Dataset": label,
-                    "Samples": sum(data.sample_count for data in dataset),
-                    "Destinations": len(dataset),
-                    "Terminated": terminated_count,
-                    "Non-Terminated": destination_count - terminated_count,
-                    "Termination Times (Avg.)":
-                        np.average([value for dst in dataset for value in dst.termination_times]),
-                    "Messages (Avg.)":
-                        np.average([value for dst in dataset for value in dst.messages]),
-                    "Deactivations (Avg.)":
-                        np.average([value for dst in dataset for value in dst.deactivations]),
-                })
+
+def _destination_totals(dataset: BasicDataset) -> Tuple[List[np.ndarray], np.ndarray]:
+    """
+    Returns the sum of the values of the terminated samples of each destination, for each of
+    the averaged metrics, and the number of terminated samples of each destination
+    """
+    totals = []
+    for values in [dataset.termination_times, dataset.messages, dataset.deactivations]:
+        cumulative = np.concatenate(([0], np.cumsum(values, dtype=np.int64)))
+        totals.append(cumulative[dataset.offsets[1:]] - cumulative[dataset.offsets[:-1]])
+
+    return totals, np.diff(dataset.offsets)
+
+
+def _sample_estimates(dataset: BasicDataset, population: int) -> Dict[str, float]:
+    """
+    Estimates the statistics of all destinations of a dataset from the destinations of
+    *dataset*, a simple random sample of *population* destinations
+    """
+    sample_size = len(dataset)
+    scale = population / sample_size
+    proportion = np.count_nonzero(dataset.terminated) / sample_size
+    terminated = round(proportion * population)
+    low, high = proportion_interval(np.array([proportion]), sample_size, population)
+
+    estimates = {
+        "Samples": round(int(dataset.sample_counts.sum()) * scale),
+        "Destinations": population,
+        "Sampled Destinations": sample_size,
+        "Terminated": terminated,
+        "Terminated (CI Low)": round(float(low[0]) * population),
+        "Terminated (CI High)": round(float(high[0]) * population),
+        "Non-Terminated": population - terminated,
+    }
+
+    totals, counts = _destination_totals(dataset)
+    for metric, metric_totals in zip(AVERAGED_METRICS, totals):
+        low, high = ratio_interval(metric_totals, counts, population)
+        estimates[f"{metric} (Avg. CI Low)"] = low
+        estimates[f"{metric} (Avg. CI High)"] = high
+
+    return estimates
+
+
+def _estimated_quantiles(sketch: QuantileSketch,
+                         percentiles: List[Tuple[str, float]]) -> List[float]:
+    return [sketch.quantile(q) for _, q in percentiles] + [_nan_if_none(sketch.maximum)]
+
+
+def _exact_quantiles(values: np.ndarray, percentiles: List[Tuple[str, float]]) -> List[float]:
+    sorted_values = np.sort(values)
+    return [exact_quantile(sorted_values, q) for _, q in percentiles] + \
+           [exact_quantile(sorted_values, 1.0)]
+
+
+def _nan_if_none(value: Optional[int]) -> float:
+    return float('nan') if value is None else value
 
 
 if __name__ == '__main__':
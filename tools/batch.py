@@ -0,0 +1,316 @@
+"""
+SS-BGP Data Tools: Batch
+
+Computes the outputs of the basic-data and inv-cumsum tools for many configuration files in a
+single run. Each configuration file may be given directly, or through a directory, in which
+case all configuration files (.json) in that directory are included.
+
+Configuration files often share data directories, under the same or different labels. Each
+data directory is loaded only once, by a single pool of worker processes shared by all of
+them, and its data feeds the outputs of every configuration file including it. The outputs
+of each configuration file are written as soon as all of its data directories are loaded,
+and the data of each data directory is released once all configuration files including it
+are done, which bounds the memory used.
+
+The configuration files follow the format of the inv-cumsum tool. The data directory of each
+dataset may also be specified as in the basic-data tool. The outputs of the configuration
+file 'sweep.json' are written to 'sweep.basic-data.csv', 'sweep.inv-cumsum.csv', and
+'sweep.inv-cumsum.html', in the output directory.
+
+Usage:
+  batch <conf>... [options]
+  batch (-h | --help)
+
+Options:
+  -h --help               Show this screen.
+  --out-dir=<path>        Directory to write the outputs to. [Default: .]
+  --tools=<names>         Comma-separated list of the tools whose outputs are computed for each
+                          configuration file. [Default: basic-data,inv-cumsum]
+  --bin-width=<n>         Width of each bin of the inverse cumulative sum. [Default: 100]
+  --max-time=<n>          Maximum termination time covered by the bins. By default, the bins
+                          cover all termination times.
+  --exact                 Compute the inverse cumulative sum at each distinct termination time,
+                          and exact percentiles. Cannot be used with --streaming.
+  --webgl                 Render the plot with WebGL, which handles large plots better.
+  --shared-plotlyjs       Write the plotly.js library to a separate file, shared by all plots in
+                          the same directory, instead of including it in the HTML file.
+  --max-points=<n>        Maximum number of points of each trace in the plot, at least 4.
+  --no-plot               Output only the CSV tables, without plotting. Plotting libraries are
+                          never loaded, which makes the tool start faster.
+  --streaming             Keep only the aggregates of each dataset in memory for basic-data.
+  --recursive             Include data files in nested sub-directories of each data directory.
+  -j --jobs=<n>           Number of processes to load data files (0 to use all CPUs). [Default: 1]
+  --prefetch=<n>          Number of data files read ahead, by threads, while a single process
+                          loads data files, to hide the latency of the storage. [Default: 0]
+  --cache-dir=<path>      Directory to cache parsed data files. [Default: ~/.cache/ssbgp-data-tools]
+  --cache-size=<MB>       Maximum size of the cache in megabytes. [Default: 1024]
+  --cache-hash            Identify cached data files by their content instead of their size and
+                          modification time.
+  --no-cache              Do not use the cache. By default, parsed data files are cached.
+  --rebuild-cache         Parse all data files, replacing their cached data.
+  --no-index              Always list the data directories, instead of taking their files from
+                          the manifest index, stored in the cache directory, when they did not
+                          change since they were last listed.
+  --profile=<path>        Write a JSON report with the wall and CPU time of each stage, the
+                          number of files, bytes, and rows loaded, the peak memory, and the
+                          slowest data files.
+  --profile-top=<n>       Number of slowest data files in the profile report. [Default: 10]
+  --no-progress           Do not show a progress line while loading data files.
+
+"""
+import sys
+from collections import Counter
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Tuple
+
+from docopt import docopt
+
+from processing.application import Application
+from processing.composite import CompositeDataLoader
+from processing.concurrent_file_container import ConcurrentLabeledFileContainer
+from processing.csv_printer import CSVPrinter
+from processing.dataset_processor import DatasetProcessor
+from processing.extension_selector import ExtensionFileSelector
+from processing.file_container import FileContainer
+from processing.manifest_index import ManifestIndex
+from processing.plotter import Plotter, TraceLine
+from processing.types import Label
+from tools import basic_data, inv_cumsum
+from tools.utils import print_error, data_dir_exists, get_jobs, get_cache, get_index, \
+    get_max_points, get_positive_int, get_prefetch, get_profiler, show_progress
+
+# Tools whose outputs can be computed in a batch
+TOOLS = [basic_data.TOOL_NAME, inv_cumsum.TOOL_NAME]
+
+
+class BatchConf(NamedTuple):
+    """ A configuration file of a batch """
+    # Path of the outputs, without their extensions
+    output: str
+    # Key of the data directory of each dataset, see data_dir_key()
+    datasets: Dict[Label, Label]
+    # Line of the trace of each dataset
+    lines: Dict[Label, TraceLine]
+
+
+# Function writing an output of a configuration file, given the data of each of its datasets
+Writer = Callable[[BatchConf, Dict[Label, Any]], None]
+
+
+def main():
+    args = docopt(__doc__)
+    out_dir = Path(args['--out-dir'])
+    jobs = get_jobs(args)
+    cache = get_cache(args)
+    index = get_index(args)
+    profiler = get_profiler(args)
+    bin_width = get_positive_int(args, '--bin-width')
+    max_time = get_positive_int(args, '--max-time') if args['--max-time'] else None
+    max_points = get_max_points(args)
+
+    tools = [tool.strip() for tool in args['--tools'].split(',') if tool.strip()]
+    for tool in tools:
+        if tool not in TOOLS:
+            print_error(f"unknown tool '{tool}', the tools are: {', '.join(TOOLS)}")
+            sys.exit(1)
+
+    if args['--exact'] and args['--streaming']:
+        print_error("--exact cannot be used with --streaming")
+        sys.exit(1)
+
+    if not out_dir.is_dir():
+        print_error(f"output directory not found: {str(out_dir)}")
+        sys.exit(1)
+
+    conf_paths = find_confs([Path(path) for path in args['<conf>']])
+    stems = Counter(path.stem for path in conf_paths)
+    duplicates = [stem for stem, count in stems.items() if count > 1]
+    if duplicates:
+        print_error(f"configuration files with the same name would write the same outputs: "
+                    f"{', '.join(sorted(duplicates))}")
+        sys.exit(1)
+
+    confs: List[BatchConf] = []
+    containers: Dict[Label, FileContainer] = {}
+    for conf_path in conf_paths:
+        conf, conf_containers = load_conf(conf_path, out_dir, args['--recursive'], index)
+        confs.append(conf)
+        for key, container in conf_containers.items():
+            containers.setdefault(key, container)
+
+    for container in containers.values():
+        if not data_dir_exists(container.path):
+            print_error(f"data directory not found: {str(container.path)}")
+            sys.exit(1)
+
+    dataset_count = sum(len(conf.datasets) for conf in confs)
+    print(f"Found {len(containers)} distinct data directories in the {dataset_count} datasets "
+          f"of {len(confs)} configuration files")
+
+    loaders = []
+    writers: List[Writer] = []
+    if basic_data.TOOL_NAME in tools:
+        if args['--streaming']:
+            loaders.append(basic_data.StreamingBasicDataLoader())
+        else:
+            loaders.append(basic_data.BasicDataLoader())
+
+        def write_basic_data(conf: BatchConf, data: Dict[Label, Any]) -> None:
+            printer = CSVPrinter(Path(f"{conf.output}.{basic_data.TOOL_NAME}.csv"))
+            basic_data.BasicDataProcessor(printer=printer, exact=args['--exact']).process(data)
+
+        writers.append(write_basic_data)
+
+    if inv_cumsum.TOOL_NAME in tools:
+        loaders.append(inv_cumsum.TerminationTimesLoader())
+
+        def write_inv_cumsum(conf: BatchConf, data: Dict[Label, Any]) -> None:
+            output = f"{conf.output}.{inv_cumsum.TOOL_NAME}"
+            plotter = None
+            if not args['--no-plot']:
+                plotter = Plotter(
+                    trace_lines=conf.lines,
+                    output=Path(output + '.html'),
+                    webgl=args['--webgl'],
+                    shared_plotlyjs=args['--shared-plotlyjs'],
+                    max_points=max_points
+                )
+
+            inv_cumsum.TerminationTimesProcessor(
+                plotter=plotter,
+                printer=CSVPrinter(Path(output + '.csv')),
+                bin_width=bin_width,
+                max_time=max_time,
+                exact=args['--exact']
+            ).process(data)
+
+        writers.append(write_inv_cumsum)
+
+    # Setup the application
+    app = Application(
+        container=ConcurrentLabeledFileContainer(containers=containers),
+        selector=ExtensionFileSelector(extension=".basic.csv"),
+        loader=CompositeDataLoader(loaders, cache=cache),
+        processor=BatchProcessor(confs, writers, containers),
+        jobs=jobs,
+        profiler=profiler,
+        progress=show_progress(args),
+        prefetch=get_prefetch(args)
+    )
+
+    return app.run()
+
+
+def find_confs(paths: List[Path]) -> List[Path]:
+    """
+    Returns the configuration files in *paths*. Directories are replaced with the
+    configuration files (.json) they contain, sorted by name.
+    """
+    confs = []
+    for path in paths:
+        if path.is_dir():
+            confs.extend(sorted(path.glob("*.json")))
+        elif path.is_file():
+            confs.append(path)
+        else:
+            print_error(f"Configuration file was not found: {str(path)}")
+            sys.exit(1)
+
+    return confs
+
+
+def load_conf(path: Path, out_dir: Path, recursive: bool = False,
+              index: ManifestIndex = None) \
+        -> Tuple[BatchConf, Dict[Label, FileContainer]]:
+    """
+    Loads a configuration file of a batch, see load_traces() of the inv-cumsum tool.
+
+    :return: the configuration file and the container of each data directory, by its key
+    """
+    traces = inv_cumsum.load_traces(path, recursive=recursive, index=index)
+
+    containers = {data_dir_key(trace.data_dir): trace.data_dir for trace in traces}
+    conf = BatchConf(
+        output=str(out_dir / path.stem),
+        datasets={Label(trace.label): data_dir_key(trace.data_dir) for trace in traces},
+        lines={trace.label: trace.line for trace in traces}
+    )
+
+    return conf, containers
+
+
+def data_dir_key(container: FileContainer) -> Label:
+    """
+    Returns the key identifying a data directory: its absolute path, with all symbolic links
+    resolved, so that the same data directory has the same key in all configuration files
+    """
+    return Label(str(container.path.resolve()))
+
+
+class BatchProcessor(DatasetProcessor):
+    """
+    Writes the outputs of every configuration file of a batch. Expects the data of each data
+    directory, labeled with its key, as loaded by a composite loader with a loader for each
+    writer: the i-th writer takes the data loaded by the i-th loader.
+
+    The outputs of each configuration file are written as soon as all of its data directories
+    are loaded. The data of each data directory is kept only until the outputs of all of the
+    configuration files including it are written. Data directories without any data files are
+    never loaded: configuration files including them are done once all data directories are
+    loaded, and their datasets are left out of their outputs, as in the other tools.
+
+    The container of each data directory is released as soon as the data directory is loaded,
+    so that containers holding data in memory, such as compacted datasets, do not keep it
+    until the end of the batch.
+    """
+
+    def __init__(self, confs: List[BatchConf], writers: List[Writer],
+                 containers: Dict[Label, FileContainer]):
+        """
+        :param confs:      configuration files of the batch
+        :param writers:    functions writing each output of a configuration file
+        :param containers: container of each data directory, by its key
+        """
+        self.confs = confs
+        self.writers = writers
+        self.containers = containers
+
+    def process_each(self, datasets: Iterator[Tuple[Label, List[Any]]]):
+        # Number of configuration files still to be written that include each data directory
+        consumers = Counter(key for conf in self.confs for key in set(conf.datasets.values()))
+        pending = list(self.confs)
+        loaded: Dict[Label, List[Any]] = {}
+        max_loaded = 0
+
+        for key, data in datasets:
+            self.containers[key].release()
+            loaded[key] = data
+            max_loaded = max(max_loaded, len(loaded))
+
+            done = [conf for conf in pending
+                    if all(other in loaded for other in conf.datasets.values())]
+            for conf in done:
+                pending.remove(conf)
+                self._write(conf, loaded, consumers)
+
+        for conf in pending:
+            self._write(conf, loaded, consumers)
+
+        print(f"Wrote the outputs of {len(self.confs)} configuration files, keeping the data of "
+              f"up to {max_loaded} data directories in memory at once")
+
+    def _write(self, conf: BatchConf, loaded: Dict[Label, List[Any]],
+               consumers: Dict[Label, int]) -> None:
+        """ Writes the outputs of *conf* and releases the data no other conf needs """
+        for i, writer in enumerate(self.writers):
+            writer(conf, {label: loaded[key][i] for label, key in conf.datasets.items()
+                          if key in loaded})
+
+        for key in set(conf.datasets.values()):
+            consumers[key] -= 1
+            if consumers[key] == 0:
+                loaded.pop(key, None)
+
+
+if __name__ == '__main__':
+    main()
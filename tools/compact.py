@@ -0,0 +1,164 @@
+"""
+SS-BGP Data Tools: Compact
+
+Compacts a dataset into a single columnar file. The data files (.basic.csv) of the data
+directory, one for each destination, are parsed once and their samples are stored together,
+column by column, along with the id of each destination, taken from the path of its data file
+relative to the data directory.
+
+The compacted dataset can be used in the configuration file of any other tool in place of the
+data directory, with identical results. Loading it takes a single sequential read, instead of
+opening and parsing every data file.
+
+The format is chosen by the extension of the output path: a NumPy archive (.npz) or a Parquet
+file (.parquet), which requires the pyarrow package. If the output path has neither extension,
+the Parquet format is used when pyarrow is installed.
+
+Usage:
+  compact <data-dir> <output> [options]
+  compact (-h | --help)
+
+Options:
+  -h --help               Show this screen.
+  --recursive             Include data files in nested sub-directories of the data directory.
+  -j --jobs=<n>           Number of processes to load data files (0 to use all CPUs). [Default: 1]
+  --prefetch=<n>          Number of data files read ahead, by threads, while a single process
+                          loads data files, to hide the latency of the storage. [Default: 0]
+  --no-progress           Do not show a progress line while loading data files.
+
+"""
+import sys
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+from docopt import docopt
+
+from processing.application import Application
+from processing.compact_container import CompactDataset, NPZ_EXTENSION, PARQUET_EXTENSION, \
+    COMPACT_EXTENSIONS, parquet_available, write_compact
+from processing.concurrent_file_container import ConcurrentLabeledFileContainer
+from processing.data_processor import DataProcessor
+from processing.extension_selector import ExtensionFileSelector
+from processing.file_data_loader import FileDataLoader
+from processing.types import Label
+from processing.utils import BOOLEAN_COLUMNS, compression_extensions, relative_path
+from tools.basic_data import BasicDataLoader
+from tools.inv_cumsum import TerminationTimesLoader
+from tools.utils import print_error, data_dir_exists, get_container, get_jobs, get_prefetch, \
+    show_progress
+
+# Extension of the data files
+DATA_EXTENSION = ".basic.csv"
+
+
+def main():
+    args = docopt(__doc__)
+    data_dir = Path(args['<data-dir>'])
+    output_path = Path(args['<output>'])
+    jobs = get_jobs(args)
+
+    if not data_dir_exists(data_dir):
+        print_error(f"data directory not found: {str(data_dir)}")
+        sys.exit(1)
+
+    if not output_path.name.endswith(COMPACT_EXTENSIONS):
+        extension = PARQUET_EXTENSION if parquet_available() else NPZ_EXTENSION
+        output_path = output_path.with_name(output_path.name + extension)
+
+    if output_path.name.endswith(PARQUET_EXTENSION) and not parquet_available():
+        print_error("the Parquet format requires the pyarrow package")
+        sys.exit(1)
+
+    # Setup the application
+    app = Application(
+        container=ConcurrentLabeledFileContainer(
+            containers={str(data_dir): get_container(data_dir, recursive=args['--recursive'])}
+        ),
+        selector=ExtensionFileSelector(extension=DATA_EXTENSION),
+        loader=CompactLoader(data_dir),
+        processor=CompactWriter(output_path),
+        jobs=jobs,
+        progress=show_progress(args),
+        prefetch=get_prefetch(args)
+    )
+
+    return app.run()
+
+
+def destination_id(name: str) -> str:
+    """
+    Returns the id of the destination of a data file, given the name of the data file, or its
+    path relative to the data directory, without the extension of data files.
+    """
+    for compression in compression_extensions():
+        if name.endswith(compression):
+            name = name[:-len(compression)]
+            break
+
+    return name[:-len(DATA_EXTENSION)] if name.endswith(DATA_EXTENSION) else name
+
+
+class CompactLoader(FileDataLoader):
+    """
+    Loads the samples of each data file, keeping only the columns read by the other tools. All
+    data files are collected into a single compacted dataset.
+
+    Each data file is identified by its path relative to the data directory, which is unique
+    even when data files in different sub-directories have the same name.
+    """
+
+    columns = BasicDataLoader.columns + [column for column in TerminationTimesLoader.columns
+                                         if column not in BasicDataLoader.columns]
+
+    def __init__(self, data_dir: Path) -> None:
+        """
+        :param data_dir: path to the data directory being compacted
+        """
+        super().__init__()
+        self.data_dir = data_dir
+
+    def load_file(self, path: Path) -> Tuple[str, Dict[str, np.ndarray]]:
+        return destination_id(relative_path(path, self.data_dir)), super().load_file(path)
+
+    def load_columns(self, columns: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        return columns
+
+    def collect(self, results: Iterator[Tuple[Label, Tuple[str, Dict[str, np.ndarray]]]]) \
+            -> CompactDataset:
+
+        destinations: List[str] = []
+        values: Dict[str, List[np.ndarray]] = {column: [] for column in self.columns}
+        for _, (destination, columns) in results:
+            destinations.append(destination)
+            for column in self.columns:
+                values[column].append(columns[column])
+
+        row_counts = [len(column_values) for column_values in values[self.columns[0]]]
+        offsets = np.zeros(len(destinations) + 1, dtype=np.int64)
+        np.cumsum(row_counts, out=offsets[1:])
+
+        return CompactDataset(
+            destinations=destinations,
+            offsets=offsets,
+            columns={column: np.concatenate(column_values) if column_values
+                     else np.empty(0, dtype=bool if column in BOOLEAN_COLUMNS else np.int64)
+                     for column, column_values in values.items()},
+            extension=DATA_EXTENSION,
+        )
+
+
+class CompactWriter(DataProcessor):
+    """ Writes a compacted dataset to a file """
+
+    def __init__(self, output_path: Path) -> None:
+        self.output_path = output_path
+
+    def process(self, data: CompactDataset):
+        write_compact(self.output_path, data)
+        print(f"Compacted {len(data.destinations)} data files ({int(data.offsets[-1])} samples) "
+              f"into {self.output_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+SS-BGP Data Tools: Generate Data
+
+Generates synthetic data files, similar to those output by the simulator. It creates one data
+directory for each dataset, containing one data file (.basic.csv) for each destination. Each
+data file contains one sample for each seed.
+
+It also writes a configuration file, called conf.json, including all generated datasets, which
+can be used with any of the other tools.
+
+Usage:
+  generate-data <output-dir> [options]
+  generate-data (-h | --help)
+
+Options:
+  -h --help                  Show this screen.
+  --datasets=<n>             Number of datasets. [Default: 2]
+  --destinations=<n>         Number of destinations (data files) in each dataset. [Default: 100]
+  --seeds=<n>                Number of seeds (samples) in each data file. [Default: 10]
+  --non-termination=<rates>  Comma separated list with the fraction of samples that do not
+                             terminate in each dataset. The list is repeated if there are more
+                             datasets than rates. [Default: 0.01]
+  --random-seed=<n>          Seed of the random number generator. [Default: 0]
+
+"""
+import json
+import sys
+from pathlib import Path
+from typing import List
+
+import numpy as np
+from docopt import docopt
+
+from tools.utils import print_error, get_positive_int
+
+HEADERS = [
+    "Seed",
+    "Terminated",
+    "Termination Time (Total)",
+    "Termination Time (Avg.)",
+    "Message Count",
+    "Detection Count",
+]
+
+# Termination time assigned to samples that did not terminate (the simulation threshold)
+THRESHOLD = 1000000
+
+
+def main():
+    args = docopt(__doc__)
+    output_dir = Path(args['<output-dir>'])
+    dataset_count = get_positive_int(args, '--datasets')
+    destination_count = get_positive_int(args, '--destinations')
+    seed_count = get_positive_int(args, '--seeds')
+
+    try:
+        rates = [float(rate) for rate in args['--non-termination'].split(',')]
+        random_seed = int(args['--random-seed'])
+    except ValueError:
+        print_error("non-termination rates must be numbers and the random seed an integer")
+        sys.exit(1)
+
+    if any(rate < 0 or rate > 1 for rate in rates):
+        print_error("non-termination rates must be between 0 and 1")
+        sys.exit(1)
+
+    generate_datasets(output_dir, dataset_count, destination_count, seed_count, rates,
+                      random_seed)
+
+
+def generate_datasets(output_dir: Path, dataset_count: int, destination_count: int,
+                      seed_count: int, non_termination_rates: List[float],
+                      random_seed: int = 0) -> Path:
+    """
+    Generates *dataset_count* datasets in *output_dir*, along with a configuration file
+    including all of them.
+
+    :return: the path to the configuration file
+    """
+    random = np.random.RandomState(random_seed)
+
+    datasets = {}
+    for i in range(dataset_count):
+        label = f"dataset-{i}"
+        data_dir = output_dir / label
+        data_dir.mkdir(parents=True, exist_ok=True)
+
+        rate = non_termination_rates[i % len(non_termination_rates)]
+        for destination in range(destination_count):
+            write_data_file(data_dir / f"{destination}.basic.csv", seed_count, rate, random)
+
+        datasets[label] = str(data_dir.absolute())
+
+    conf_path = output_dir / "conf.json"
+    with open(conf_path, 'w') as file:
+        json.dump(datasets, file, indent=4)
+
+    return conf_path
+
+
+def write_data_file(path: Path, seed_count: int, non_termination_rate: float,
+                    random: np.random.RandomState) -> None:
+    """ Writes a single data file with *seed_count* random samples """
+    seeds = random.randint(0, 2 ** 31, size=seed_count)
+    terminated = random.random_sample(seed_count) >= non_termination_rate
+
+    # Termination times are heavy tailed: most destinations terminate quickly, some take long
+    termination_times = np.minimum(random.lognormal(10, 1, seed_count), THRESHOLD).astype(np.int64)
+    termination_times[~terminated] = THRESHOLD
+    average_times = termination_times // random.randint(1, 50, size=seed_count)
+    messages = (termination_times * random.uniform(0.5, 2.0, seed_count)).astype(np.int64)
+    detections = random.poisson(2, seed_count)
+
+    with open(path, 'w') as file:
+        file.write(";".join(HEADERS) + "\n")
+        file.writelines(
+            f"{seed};{'Yes' if term else 'No'};{time};{average};{message};{detection}\n"
+            for seed, term, time, average, message, detection in zip(
+                seeds.tolist(), terminated.tolist(), termination_times.tolist(),
+                average_times.tolist(), messages.tolist(), detections.tolist()
+            )
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -6,65 +6,169 @@ Computes the inverse cumulative sum of the destinations' termination time for mu
 The termination time of a destination corresponds to the highest termination time among all of
 its samples.
 
+By default, the termination times are grouped in bins with a fixed width, covering all
+termination times. With the --exact option, the inverse cumulative sum is computed at each
+distinct termination time instead.
+
+With --shard=i/N, only the i-th of N disjoint shards of the data files of each dataset is
+processed, and the termination times of the destinations are written to a partial result file,
+<out>.shard-i-of-N.json, instead of the table and the plot. The merge tool combines the partial
+results of all shards into the outputs of a single run over all data files.
+
+With --sample, only a random sample of the destinations (data files) of each dataset is
+processed, for a quick preview. Each trace is estimated from the sample and is output and
+plotted along with its 95% confidence band. The sample is reproducible: the same seed always
+selects the same data files.
+
 Usage:
-  inv-cumsum <conf-file> [ --out=<path> ]
+  inv-cumsum <conf-file> [options]
   inv-cumsum (-h | --help)
 
 Options:
-  -h --help      Show this screen.
-  -V --version   Show version.
-  --out=<path>   Specify a custom output path. [Default: inv-cumsum]
+  -h --help               Show this screen.
+  -V --version            Show version.
+  --out=<path>            Specify a custom output path. [Default: inv-cumsum]
+  --bin-width=<n>         Width of each bin. [Default: 100]
+  --max-time=<n>          Maximum termination time covered by the bins. By default, the bins
+                          cover all termination times.
+  --exact                 Compute the inverse cumulative sum at each distinct termination time.
+  --webgl                 Render the plot with WebGL, which handles large plots better.
+  --shared-plotlyjs       Write the plotly.js library to a separate file, shared by all plots in
+                          the same directory, instead of including it in the HTML file.
+  --max-points=<n>        Maximum number of points of each trace in the plot, at least 4.
+  --no-plot               Output only the CSV table, without plotting. Plotting libraries are
+                          never loaded, which makes the tool start faster.
+  --recursive             Include data files in nested sub-directories of each data directory.
+  -j --jobs=<n>           Number of processes to load data files (0 to use all CPUs). [Default: 1]
+  --prefetch=<n>          Number of data files read ahead, by threads, while a single process
+                          loads data files, to hide the latency of the storage. [Default: 0]
+  --cache-dir=<path>      Directory to cache parsed data files. [Default: ~/.cache/ssbgp-data-tools]
+  --cache-size=<MB>       Maximum size of the cache in megabytes. [Default: 1024]
+  --cache-hash            Identify cached data files by their content instead of their size and
+                          modification time.
+  --no-cache              Do not use the cache. By default, parsed data files are cached.
+  --rebuild-cache         Parse all data files, replacing their cached data.
+  --no-index              Always list the data directories, instead of taking their files from
+                          the manifest index, stored in the cache directory, when they did not
+                          change since they were last listed.
+  --profile=<path>        Write a JSON report with the wall and CPU time of each stage, the
+                          number of files, bytes, and rows loaded, the peak memory, and the
+                          slowest data files.
+  --profile-top=<n>       Number of slowest data files in the profile report. [Default: 10]
+  --profile-load=<path>   Write a cProfile (pstats) file of the load stage. Only the main process
+                          is profiled: use --jobs=1 to include the parsing of data files.
+  --no-progress           Do not show a progress line while loading data files.
+  --shard=<i/N>           Process only the i-th of N shards of the data files of each dataset,
+                          writing a partial result to be combined with the merge tool.
+  --sample=<size>         Process only a random sample of the data files of each dataset: a
+                          fraction, such as 0.05, or a number of data files, such as 500.
+  --seed=<n>              Seed of the random sample. [Default: 0]
 
 """
 import json
 import sys
 from pathlib import Path
-from typing import List, Dict, NamedTuple
+from typing import List, Dict, NamedTuple, Iterator, Iterable, Tuple
 
 import numpy as np
 from collections import defaultdict
 from docopt import docopt
 
 from processing.application import Application
+from processing.concurrent_file_container import ConcurrentLabeledFileContainer
 from processing.csv_printer import CSVPrinter
-from processing.data_loader import DataLoader
 from processing.data_processor import DataProcessor
-from processing.directory import Directory
+from processing.errors import ProcessingError
 from processing.extension_selector import ExtensionFileSelector
-from processing.labeled_file_collection import LabeledFileCollection
-from processing.labeled_file_container import LabeledFileContainer
+from processing.file_container import FileContainer
+from processing.file_data_loader import FileDataLoader
+from processing.manifest_index import ManifestIndex
+from processing.partial_result import file_counts, partial_path, write_partial
 from processing.plotter import Plotter, TraceLine, TraceData
+from processing.profiler import Profiler, profile
+from processing.sample_selector import SampleFileSelector
+from processing.shard_selector import ShardFileSelector
+from processing.statistics import proportion_interval
 from processing.types import Label
-from processing.utils import open_csv
-from tools.utils import print_error
+from tools.utils import print_error, data_dir_exists, get_container, get_jobs, get_cache, \
+    get_index, get_max_points, get_positive_int, get_prefetch, get_profiler, get_sample, \
+    get_seed, get_shard, show_progress
+
+# Name of the tool, stored in its partial results
+TOOL_NAME = "inv-cumsum"
 
 
 def main():
     args = docopt(__doc__, version="Plot Times v0.1")
     output_path = args['--out']
-
-    traces = load_traces(args['<conf-file>'])
+    jobs = get_jobs(args)
+    cache = get_cache(args)
+    profiler = get_profiler(args)
+    bin_width = get_positive_int(args, '--bin-width')
+    max_time = get_positive_int(args, '--max-time') if args['--max-time'] else None
+    max_points = get_max_points(args)
+    shard = get_shard(args)
+    sample = get_sample(args)
+
+    traces = load_traces(args['<conf-file>'], recursive=args['--recursive'],
+                         index=get_index(args))
 
     # Check if all data directories actually exist
     for trace in traces:
-        if not trace.data_dir.path.is_dir():
+        if not data_dir_exists(trace.data_dir.path):
             print_error(f"data directory not found: {str(trace.data_dir)}")
             sys.exit(1)
 
+    plotter = None
+    if not args['--no-plot'] and not shard:
+        plotter = Plotter(
+            trace_lines={trace.label: trace.line for trace in traces},
+            output=Path(output_path + '.html'),
+            webgl=args['--webgl'],
+            shared_plotlyjs=args['--shared-plotlyjs'],
+            max_points=max_points
+        )
+
+    if sample and shard:
+        print_error("--sample cannot be used with --shard")
+        sys.exit(1)
+
+    selector = ExtensionFileSelector(extension=".basic.csv")
+    sampler = None
+    if sample:
+        selector = sampler = SampleFileSelector(selector, sample, seed=get_seed(args))
+
+    if shard:
+        selector = ShardFileSelector(selector, shard)
+        processor = TerminationTimesPartialWriter(
+            path=partial_path(output_path, shard),
+            selector=selector,
+            trace_lines={trace.label: trace.line for trace in traces}
+        )
+    else:
+        processor = TerminationTimesProcessor(
+            plotter=plotter,
+            printer=CSVPrinter(Path(output_path + '.csv')),
+            bin_width=bin_width,
+            max_time=max_time,
+            exact=args['--exact'],
+            profiler=profiler,
+            sampler=sampler
+        )
+
     # Setup the application
     app = Application(
-        container=LabeledFileContainer(
+        container=ConcurrentLabeledFileContainer(
             containers={trace.label: trace.data_dir for trace in traces}
         ),
-        selector=ExtensionFileSelector(extension=".basic.csv"),
-        loader=TerminationTimesLoader(),
-        processor=TerminationTimesProcessor(
-            plotter=Plotter(
-                trace_lines={trace.label: trace.line for trace in traces},
-                output=Path(output_path + '.html')
-            ),
-            printer=CSVPrinter(Path(output_path + '.csv'))
-        )
+        selector=selector,
+        loader=TerminationTimesLoader(cache=cache),
+        processor=processor,
+        jobs=jobs,
+        profiler=profiler,
+        progress=show_progress(args),
+        load_profile=args['--profile-load'],
+        prefetch=get_prefetch(args)
     )
 
     return app.run()
@@ -72,11 +176,12 @@ def main():
 
 class Trace(NamedTuple):
     label: str
-    data_dir: Directory
+    data_dir: FileContainer
     line: TraceLine = {}
 
 
-def load_traces(path: Path) -> List[Trace]:
+def load_traces(path: Path, recursive: bool = False,
+                index: ManifestIndex = None) -> List[Trace]:
     """
     Loads traces from a trace file. The trace file is a JSON file that specifies some
     configurations for each trace. For example,
@@ -94,14 +199,22 @@ def load_traces(path: Path) -> List[Trace]:
         - data: corresponds to the data directory (its value is '/path/to/data' in the example)
         - line: specifies a set of attributes to describe how the line is displayed
 
-    A trace file may have multiple traces.
+    A trace file may have multiple traces. The specification of a trace may also be just the
+    path to its data directory, as in the configuration files of the basic-data tool. A data
+    directory may also be a tar or zip archive, or a directory inside one.
+
+    If *recursive* is set, the data files in nested sub-directories of each data directory are
+    included as well. Data directories are listed through the manifest *index*, if one is given.
 
     """
     with open(path) as file:
         traces: List[Trace] = []
         for label, specs in json.load(file).items():
+            if isinstance(specs, str):
+                specs = {'data': specs}
+
             line = specs['line'] if 'line' in specs else {}
-            trace = Trace(label, Directory(Path(specs['data'])), line)
+            trace = Trace(label, get_container(Path(specs['data']), recursive, index), line)
             traces.append(trace)
 
         return traces
@@ -122,12 +235,12 @@ def parse_traces(trace_pairs: List[str]) -> List[Trace]:
     traces: List[Trace] = []
     for pair in trace_pairs:
         label, data_dir = pair.split('=', maxsplit=1)
-        traces.append(Trace(label, Directory(Path(data_dir))))
+        traces.append(Trace(label, get_container(Path(data_dir))))
 
     return traces
 
 
-class TerminationTimesLoader(DataLoader):
+class TerminationTimesLoader(FileDataLoader):
     """
     Loads the termination times from each data file in collection *data_files*. For each data
     file it considers only the maximum of all termination times among all samples (seeds).
@@ -136,71 +249,216 @@ class TerminationTimesLoader(DataLoader):
     It includes termination times from simulations that did not terminate.
     """
 
-    def load(self, data_files: LabeledFileCollection) -> Dict[str, List[int]]:
+    columns = ["Termination Time (Total)"]
+
+    def load_columns(self, columns: Dict[str, np.ndarray]) -> int:
+        termination_times = columns["Termination Time (Total)"]
+        return max(0, int(termination_times.max())) if len(termination_times) else 0
+
+    def collect(self, results: Iterator[Tuple[Label, int]]) -> Dict[str, np.ndarray]:
         # Container to hold the loaded data
         termination_times: Dict[str, List[int]] = defaultdict(list)
 
-        for label, data_file in data_files.iter_by_label():
-            # Load termination time from data file
-            max_termination_time = 0
-            with open_csv(data_file) as file:
-                for row in file:
-                    termination_time = int(row["Termination Time (Total)"])
-                    max_termination_time = max(max_termination_time, termination_time)
-
+        for label, max_termination_time in results:
             termination_times[label].append(max_termination_time)
 
-        return termination_times
+        return {label: np.array(values, dtype=np.int64)
+                for label, values in termination_times.items()}
 
 
 class TerminationTimesProcessor(DataProcessor):
     """
-    Expects a list of termination times (integer values) for each label.
-    For each label, it computes the cumulative sum and plots it using the specified plotter.
+    Expects an array of termination times (integer values) for each label.
+    For each label, it computes the inverse cumulative sum and plots it using the specified
+    plotter.
+
+    By default, the termination times are binned. The bins have a fixed width and cover all
+    termination times, unless the maximum time is set. In exact mode, the inverse cumulative
+    sum is computed at each distinct termination time, without any binning.
+
+    If the data files were sampled, each trace is estimated from the sampled destinations of
+    its dataset, and it is plotted and output along with its 95% confidence band.
     """
 
-    def __init__(self, plotter: Plotter = None, printer: CSVPrinter = None):
+    def __init__(self, plotter: Plotter = None, printer: CSVPrinter = None,
+                 bin_width: int = 100, max_time: int = None, exact: bool = False,
+                 profiler: Profiler = None, sampler: SampleFileSelector = None):
+        """
+        :param profiler: profiler to record the time taken to plot and to write the table
+        :param sampler:  selector which sampled the data files, if they were sampled
+        """
         self._plotter = plotter
+        self._profiler = profiler
+        self._sampler = sampler
         self._printer = printer
+        self._bin_width = bin_width
+        self._max_time = max_time
+        self._exact = exact
 
-    def process(self, data: Dict[str, List[int]]):
+    def process(self, data: Dict[str, np.ndarray]):
 
         #
         # Compute the traces for each data input
         #
-        traces: Dict[Label, List[float]] = {}
-        x = list(range(0, 2001000, 100))
-        for label, values in data.items():
-            count = len(values)
-            hist, bin_edges = np.histogram(values, bins=x)
-            cumulative_sum = np.cumsum(hist)
-            # Convert the cumulative sum to a relative cumulative sum
-            cumulative_sum = [(count - value) / count for value in cumulative_sum]
-
-            traces[label] = cumulative_sum
+        sorted_values = {label: np.sort(values) for label, values in data.items()}
+        if self._exact:
+            x = exact_points(sorted_values.values())
+            traces = {label: inverse_cumsum(values, x, side='right')
+                      for label, values in sorted_values.items()}
+            # There is a value for each point
+            trace_x = x
+        else:
+            x = bin_edges(sorted_values.values(), self._bin_width, self._max_time)
+            traces = {label: binned_inverse_cumsum(values, x)
+                      for label, values in sorted_values.items()}
+            # There is a value for each bin, starting at its left edge
+            trace_x = x[:-1]
+
+        # Each value of a trace is the proportion of the destinations above some time
+        bands = {}
+        if self._sampler:
+            bands = {label: proportion_interval(traces[label], len(sorted_values[label]),
+                                                self._sampler.file_counts[label])
+                     for label in traces}
 
         #
         # Plot all traces
         #
         if self._plotter:
-            self._plotter.plot(traces=[TraceData(label, x, y) for label, y in traces.items()])
+            with profile(self._profiler, "plot"):
+                self._plotter.plot(
+                    traces=[TraceData(label, trace_x, y, *bands.get(label, (None, None)))
+                            for label, y in traces.items()])
 
         #
         # Output trace values to a table
         #
         if self._printer:
-            with self._printer:
-                labels = list(traces.keys())
+            with profile(self._profiler, "write"), self._printer:
                 bins_label = "Bins (x)"
-                self._printer.set_headers(headers=[bins_label] + labels)
+                headers = [bins_label]
+                columns = [trace_x.tolist()]
+                for label, y in traces.items():
+                    headers.append(label)
+                    columns.append(y.tolist())
+                    if label in bands:
+                        headers.extend([f"{label} (CI Low)", f"{label} (CI High)"])
+                        columns.extend(bound.tolist() for bound in bands[label])
+
+                self._printer.set_headers(headers=headers)
+                self._printer.print_rows(zip(*columns))
+
+                if not self._exact:
+                    # The last value in 'x' is the last edge, for which there is not value
+                    self._printer.print_row({bins_label: int(x[-1])})
+
+
+class TerminationTimesPartialWriter(DataProcessor):
+    """
+    Writes the partial result of a single shard of the data files: for each dataset, the
+    termination times of the destinations of the shard, sorted in ascending order, along with
+    the line of its trace. Expects an array of termination times for each label.
+    """
+
+    def __init__(self, path: Path, selector: ShardFileSelector,
+                 trace_lines: Dict[str, TraceLine]):
+        """
+        :param path:        path to the partial result file
+        :param selector:    selector of the data files of the shard
+        :param trace_lines: line of the trace of each dataset
+        """
+        self.path = path
+        self.selector = selector
+        self.trace_lines = trace_lines
+
+    def process(self, data: Dict[str, np.ndarray]):
+        datasets = {}
+        for label, count in self.selector.file_counts.items():
+            termination_times = data.get(label, np.empty(0, dtype=np.int64))
+            datasets[label] = {
+                "files": count,
+                "line": self.trace_lines.get(label, {}),
+                "termination_times": np.sort(termination_times).tolist(),
+            }
+
+        write_partial(self.path, TOOL_NAME, self.selector.shard, datasets)
+        print(f"Wrote the partial result of shard {self.selector.shard} to {self.path}")
+
+
+def merge_partials(partials: List[dict]) -> Tuple[Dict[str, np.ndarray], Dict[str, TraceLine]]:
+    """
+    Merges the partial results of all shards (see load_partials()) into the termination times
+    of each dataset, which are the same as those loaded by a single run over all data files,
+    up to their order, and into the line of the trace of each dataset.
+
+    :raise ProcessingError: if the data files of a dataset are not all covered exactly once
+    """
+    termination_times: Dict[str, np.ndarray] = {}
+    for label, count in file_counts(partials).items():
+        values = [partial["datasets"][label]["termination_times"] for partial in partials]
+        termination_times[label] = np.sort(np.concatenate(
+            [np.array(shard_values, dtype=np.int64) for shard_values in values]))
+
+        if len(termination_times[label]) != count:
+            raise ProcessingError(f"partial results do not cover each data file of dataset "
+                                  f"'{label}' exactly once")
+
+    trace_lines = {label: entry["line"] for label, entry in partials[0]["datasets"].items()}
+
+    return termination_times, trace_lines
+
+
+def bin_edges(sorted_values: Iterable[np.ndarray], bin_width: int,
+              max_time: int = None) -> np.ndarray:
+    """
+    Returns the edges of bins of width *bin_width*, starting at 0. The last edge is the highest
+    multiple of the bin width not higher than *max_time*. If *max_time* is not specified, the
+    last edge is the lowest multiple of the bin width higher than all values.
 
-                for i, value in enumerate(x[:-1]):
-                    row = {label: traces[label][i] for label in labels}
-                    row[bins_label] = value
-                    self._printer.print_row(row)
+    :param sorted_values: arrays of values sorted in ascending order
+    :param bin_width:     width of each bin
+    :param max_time:      maximum value covered by the bins
+    """
+    if max_time is None:
+        max_value = max((int(values[-1]) for values in sorted_values if len(values)), default=0)
+        max_time = (max_value // bin_width + 1) * bin_width
+
+    edges = np.arange(0, max_time + 1, bin_width, dtype=np.int64)
+    if len(edges) < 2:
+        raise ProcessingError(f"maximum time {max_time} is lower than the bin width {bin_width}")
+
+    return edges
+
+
+def exact_points(sorted_values: Iterable[np.ndarray]) -> np.ndarray:
+    """ Returns all distinct values, in ascending order, starting at 0 """
+    return np.union1d(np.zeros(1, dtype=np.int64), np.concatenate(list(sorted_values)))
+
+
+def inverse_cumsum(sorted_values: np.ndarray, x: np.ndarray, side: str = 'right') -> np.ndarray:
+    """
+    Computes the relative inverse cumulative sum of *sorted_values* at each point in *x*: the
+    fraction of the values higher than each point, if *side* is 'right', or higher or equal
+    to each point, if *side* is 'left'.
+    """
+    count = len(sorted_values)
+    return (count - np.searchsorted(sorted_values, x, side=side)) / count
+
+
+def binned_inverse_cumsum(sorted_values: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """
+    Computes the relative inverse cumulative sum of *sorted_values* over the bins defined by
+    *edges*: the fraction of the values that are not in the bins up to each bin. The last bin
+    includes its right edge. Values outside all bins, lower than the first edge or higher than
+    the last edge, are excluded from every bin, as with np.histogram(): they are never counted
+    as being in the bins up to any bin.
+    """
+    count = len(sorted_values)
+    cumulative_counts = np.searchsorted(sorted_values, edges[1:], side='left')
+    cumulative_counts[-1] = np.searchsorted(sorted_values, edges[-1], side='right')
+    cumulative_counts -= np.searchsorted(sorted_values, edges[0], side='left')
 
-                # The last value in 'x' is the last edge, for which there is not value
-                self._printer.print_row({bins_label: x[-1]})
+    return (count - cumulative_counts) / count
 
 
 if __name__ == '__main__':
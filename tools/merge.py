@@ -0,0 +1,104 @@
+"""
+SS-BGP Data Tools: Merge
+
+Merges the partial results written by the shards of a run of the basic-data or inv-cumsum
+tools, with their --shard option, into the outputs of a single run over all data files. The
+partial results of all shards must be given, each exactly once. The tool which wrote them is
+read from the partial results.
+
+The outputs of basic-data are those of a single run, except for the estimated percentiles,
+which may differ slightly, within the error of the sketches. The outputs of inv-cumsum are
+those of a single run with the same options: the options below, which apply only to
+inv-cumsum, are those of the inv-cumsum tool.
+
+Usage:
+  merge <partial>... [options]
+  merge (-h | --help)
+
+Options:
+  -h --help               Show this screen.
+  --out=<path>            Specify a custom output path. By default, the default output path of
+                          the tool which wrote the partial results is used.
+  --bin-width=<n>         Width of each bin. [Default: 100]
+  --max-time=<n>          Maximum termination time covered by the bins. By default, the bins
+                          cover all termination times.
+  --exact                 Compute the inverse cumulative sum at each distinct termination time.
+  --webgl                 Render the plot with WebGL, which handles large plots better.
+  --shared-plotlyjs       Write the plotly.js library to a separate file, shared by all plots in
+                          the same directory, instead of including it in the HTML file.
+  --max-points=<n>        Maximum number of points of each trace in the plot, at least 4.
+  --no-plot               Output only the CSV table, without plotting.
+
+"""
+import sys
+from pathlib import Path
+from typing import List
+
+from docopt import docopt
+
+from processing.csv_printer import CSVPrinter
+from processing.errors import ProcessingError
+from processing.partial_result import load_partials
+from processing.plotter import Plotter
+from tools import basic_data, inv_cumsum
+from tools.utils import print_error, get_max_points, get_positive_int
+
+
+def main():
+    args = docopt(__doc__)
+    bin_width = get_positive_int(args, '--bin-width')
+    max_time = get_positive_int(args, '--max-time') if args['--max-time'] else None
+    max_points = get_max_points(args)
+
+    try:
+        partials = load_partials([Path(path) for path in args['<partial>']])
+        tool = partials[0]["tool"]
+        output_path = args['--out'] or tool
+
+        print(f"Merging the partial results of {len(partials)} shards of {tool}...")
+        if tool == basic_data.TOOL_NAME:
+            merge_basic_data(partials, output_path)
+        elif tool == inv_cumsum.TOOL_NAME:
+            merge_inv_cumsum(partials, output_path, args, bin_width, max_time, max_points)
+        else:
+            raise ProcessingError(f"partial results of an unknown tool: {tool}")
+
+    except ProcessingError as e:
+        print_error(str(e))
+        print("Failed!")
+        sys.exit(1)
+
+    print("Completed successfully!")
+
+
+def merge_basic_data(partials: List[dict], output_path: str) -> None:
+    processor = basic_data.BasicDataProcessor(printer=CSVPrinter(Path(output_path + ".csv")))
+    processor.process(basic_data.merge_partials(partials))
+
+
+def merge_inv_cumsum(partials: List[dict], output_path: str, args: dict, bin_width: int,
+                     max_time: int, max_points: int) -> None:
+    termination_times, trace_lines = inv_cumsum.merge_partials(partials)
+
+    plotter = None
+    if not args['--no-plot']:
+        plotter = Plotter(
+            trace_lines=trace_lines,
+            output=Path(output_path + '.html'),
+            webgl=args['--webgl'],
+            shared_plotlyjs=args['--shared-plotlyjs'],
+            max_points=max_points
+        )
+
+    processor = inv_cumsum.TerminationTimesProcessor(
+        plotter=plotter,
+        printer=CSVPrinter(Path(output_path + '.csv')),
+        bin_width=bin_width,
+        max_time=max_time,
+        exact=args['--exact']
+    )
+    processor.process(termination_times)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,19 @@
+import os
 import sys
 from pathlib import Path
+from typing import Optional, Union
 
+from processing.archive_container import ArchiveContainer, split_archive_path
+from processing.compact_container import CompactContainer, is_compact
 from processing.directory import Directory, EmptyDirectory
+from processing.file_container import FileContainer
+from processing.indexed_directory import IndexedDirectory
+from processing.manifest_index import ManifestIndex, INDEX_FILENAME
+from processing.parse_cache import ParseCache
+from processing.plotter import MIN_MAX_POINTS
+from processing.profiler import Profiler
+from processing.scan_directory import ScanDirectory
+from processing.shard import Shard
 
 
 def print_error(*values, sep=' ', end='\n', file=None) -> None:
@@ -20,3 +32,198 @@ def get_directory(args: dict, key: str) -> Directory:
             sys.exit(1)
 
     return directory
+
+
+def get_container(path: Path, recursive: bool = False,
+                  index: ManifestIndex = None) -> FileContainer:
+    """
+    Creates the container for a data directory. The data directory may also be a tar or zip
+    archive, or a directory inside one (e.g. results.tar.gz/data/BGP), in which case the data
+    files are read from the archive without extracting them, or a compacted dataset (.npz or
+    .parquet) created with the compact tool. Plain data directories are listed through the
+    manifest *index*, if one is given.
+    """
+    if is_compact(path):
+        return CompactContainer(path)
+
+    archive = split_archive_path(path)
+    if archive is not None:
+        archive_path, directory = archive
+        return ArchiveContainer(archive_path, directory, recursive=recursive)
+
+    if index is not None:
+        return IndexedDirectory(path, index, recursive=recursive)
+
+    return ScanDirectory(path, recursive=recursive)
+
+
+def data_dir_exists(path: Path) -> bool:
+    """
+    Checks whether or not a data directory, which may be inside an archive or a compacted
+    dataset, exists
+    """
+    if is_compact(path):
+        return path.is_file()
+
+    return path.is_dir() or split_archive_path(path) is not None
+
+
+def get_index(args: dict) -> Optional[ManifestIndex]:
+    """
+    Creates the manifest index of data directories, stored in the cache directory. Returns
+    None if the index is disabled.
+    """
+    if args['--no-index']:
+        return None
+
+    return ManifestIndex(Path(args['--cache-dir']).expanduser() / INDEX_FILENAME)
+
+
+def get_jobs(args: dict, key: str = '--jobs') -> int:
+    """
+    Parses the number of worker processes from the command line arguments. A value of 0
+    corresponds to the number of CPUs available in the system.
+    """
+    try:
+        jobs = int(args[key])
+    except ValueError:
+        print_error(f"number of jobs must be an integer: {args[key]}")
+        sys.exit(1)
+
+    if jobs < 0:
+        print_error(f"number of jobs must not be negative: {jobs}")
+        sys.exit(1)
+
+    return jobs if jobs > 0 else os.cpu_count() or 1
+
+
+def get_cache(args: dict) -> Optional[ParseCache]:
+    """
+    Creates the parse cache configured by the command line arguments. Returns None if the
+    cache is disabled.
+    """
+    if args['--no-cache']:
+        return None
+
+    try:
+        max_size = int(args['--cache-size'])
+    except ValueError:
+        print_error(f"cache size must be an integer: {args['--cache-size']}")
+        sys.exit(1)
+
+    return ParseCache(
+        directory=Path(args['--cache-dir']).expanduser(),
+        max_size=max_size * 1024 * 1024,
+        content_hash=args['--cache-hash'],
+        rebuild=args['--rebuild-cache']
+    )
+
+
+def get_prefetch(args: dict) -> int:
+    """ Parses the number of data files to read ahead from the command line arguments """
+    try:
+        prefetch = int(args['--prefetch'])
+    except ValueError:
+        prefetch = -1
+
+    if prefetch < 0:
+        print_error(f"--prefetch must be a non-negative integer: {args['--prefetch']}")
+        sys.exit(1)
+
+    return prefetch
+
+
+def get_positive_int(args: dict, key: str) -> int:
+    """ Parses a positive integer from the command line arguments """
+    try:
+        value = int(args[key])
+    except ValueError:
+        value = 0
+
+    if value <= 0:
+        print_error(f"{key} must be a positive integer: {args[key]}")
+        sys.exit(1)
+
+    return value
+
+
+def get_max_points(args: dict) -> Optional[int]:
+    """
+    Parses the maximum number of points of each trace from the command line arguments. Returns
+    None if the number of points is not limited.
+    """
+    if not args['--max-points']:
+        return None
+
+    max_points = get_positive_int(args, '--max-points')
+    if max_points < MIN_MAX_POINTS:
+        print_error(f"--max-points must be at least {MIN_MAX_POINTS}: {max_points}")
+        sys.exit(1)
+
+    return max_points
+
+
+def get_profiler(args: dict) -> Optional[Profiler]:
+    """
+    Creates the profiler configured by the command line arguments. Returns None if profiling
+    is disabled.
+    """
+    if not args['--profile']:
+        return None
+
+    return Profiler(Path(args['--profile']), slowest_count=get_positive_int(args, '--profile-top'))
+
+
+def show_progress(args: dict) -> bool:
+    """ Returns True if the progress line should be shown: only if stderr is a terminal """
+    return not args['--no-progress'] and sys.stderr.isatty()
+
+
+def get_shard(args: dict) -> Optional[Shard]:
+    """
+    Parses the shard to process from the command line arguments. Returns None if all data
+    files are processed.
+    """
+    if not args['--shard']:
+        return None
+
+    try:
+        return Shard.parse(args['--shard'])
+    except ValueError as error:
+        print_error(str(error))
+        sys.exit(1)
+
+
+def get_sample(args: dict) -> Optional[Union[int, float]]:
+    """
+    Parses the size of the sample of each dataset from the command line arguments: a fraction
+    of the data files of each dataset, if it includes a decimal point, or a number of data
+    files otherwise. Returns None if all data files are processed.
+    """
+    text = args['--sample']
+    if not text:
+        return None
+
+    try:
+        size = float(text) if '.' in text else int(text)
+    except ValueError:
+        size = 0
+
+    if isinstance(size, float) and not 0 < size <= 1:
+        print_error(f"--sample must be a fraction between 0 and 1: {text}")
+        sys.exit(1)
+
+    if size <= 0:
+        print_error(f"--sample must be a fraction or a positive number of data files: {text}")
+        sys.exit(1)
+
+    return size
+
+
+def get_seed(args: dict) -> int:
+    """ Parses the seed of random samples from the command line arguments """
+    try:
+        return int(args['--seed'])
+    except ValueError:
+        print_error(f"--seed must be an integer: {args['--seed']}")
+        sys.exit(1)